@@ -0,0 +1,37 @@
+"""unique (user_id, source_kind, source_ref) on tasks for ingest upserts
+
+Revision ID: 0005_task_source_unique
+Revises: b8e74ba51bb6
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0005_task_source_unique'
+down_revision = 'b8e74ba51bb6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Older syncs could store the same provider item twice; keep the oldest row as the
+    # canonical one and detach the rest (rows are kept so links/events stay valid).
+    op.execute(
+        """
+        UPDATE tasks SET source_ref = NULL
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id, source_kind, source_ref ORDER BY created_at, id
+                ) AS rn
+                FROM tasks WHERE source_ref IS NOT NULL
+            ) d WHERE d.rn > 1
+        )
+        """
+    )
+    op.create_index(
+        "uq_tasks_user_source", "tasks", ["user_id", "source_kind", "source_ref"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_tasks_user_source', table_name='tasks')
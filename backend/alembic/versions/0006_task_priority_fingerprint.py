@@ -0,0 +1,21 @@
+"""add priority_fingerprint to tasks for incremental reprioritisation
+
+Revision ID: 0006_task_priority_fingerprint
+Revises: 0005_task_source_unique
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006_task_priority_fingerprint'
+down_revision = '0005_task_source_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('priority_fingerprint', sa.String(length=40), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'priority_fingerprint')
@@ -0,0 +1,54 @@
+"""rewrite legacy GitHub task refs to "owner/repo#number"
+
+Revision ID: 0007_github_source_refs
+Revises: 0006_task_priority_fingerprint
+Create Date: 2026-10-18
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007_github_source_refs'
+down_revision = '0006_task_priority_fingerprint'
+branch_labels = None
+depends_on = None
+
+# html_url of an issue or pull request: https://github.com/<owner>/<repo>/(issues|pull)/<number>
+_URL = re.compile(r"github\.com/([^/]+/[^/]+)/(?:issues|pull)/(\d+)")
+
+
+def upgrade() -> None:
+    # GitHub tasks used to store the bare issue number, which is only unique per repository;
+    # the connector now emits "owner/repo#number". Rewrite old rows from their stored URL so
+    # the next sync updates them instead of inserting duplicates.
+    conn = op.get_bind()
+    legacy = conn.execute(
+        sa.text(
+            "SELECT id, user_id, source_ref, source_url FROM tasks "
+            "WHERE source_kind = 'github' AND source_ref IS NOT NULL AND source_ref NOT LIKE '%#%' "
+            "ORDER BY created_at, id"
+        )
+    ).fetchall()
+    for task_id, user_id, ref, url in legacy:
+        match = _URL.search(url or "")
+        if not match or match.group(2) != str(ref):
+            continue
+        new_ref = f"{match.group(1)}#{match.group(2)}"
+        # a sync since the connector change may already have inserted the new-style row;
+        # as in 0005, the oldest row stays canonical and the newer one is detached
+        conn.execute(
+            sa.text(
+                "UPDATE tasks SET source_ref = NULL "
+                "WHERE user_id = :user_id AND source_kind = 'github' AND source_ref = :ref"
+            ),
+            {"user_id": user_id, "ref": new_ref},
+        )
+        conn.execute(
+            sa.text("UPDATE tasks SET source_ref = :ref WHERE id = :id"),
+            {"ref": new_ref, "id": task_id},
+        )
+
+
+def downgrade() -> None:
+    # bare numbers are ambiguous across repositories; refs stay in the new format
+    pass
@@ -1,7 +1,7 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, field_validator
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -10,6 +10,8 @@ class Settings(BaseSettings):
     environment: str = "dev"
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    # Prometheus /metrics for Celery worker processes: child N serves on this port + N (0 = off)
+    worker_metrics_port: int = 0
 
     db_url: str
     redis_url: str
@@ -27,6 +29,88 @@ class Settings(BaseSettings):
     aws_bedrock_role: str | None = None  # IAM role to assume for Bedrock (e.g., devops-ai-developer)
     enable_crewai: bool = False
     crewai_model: str | None = None  # model identifier for CrewAI orchestrations
+    # Tasks scored per LLM call when reprioritising with CrewAI (1 = one crew per task)
+    crewai_batch_size: int = 20
+    # Tiered scoring: only tasks in the heuristic top-K of their horizon, or within the margin
+    # of the K-th score, go to the LLM (0 = every changed task)
+    crewai_top_k: int = 5
+    crewai_boundary_margin: float = 0.05
+    # Concurrent LLM scoring calls per model and process, and how long one may take
+    crewai_concurrency: int = 4
+    crewai_call_timeout_s: float = 90.0
+    # Circuit breaker: this many consecutive failed/timed-out/slow calls switch scoring to the
+    # heuristics for the cooldown
+    crewai_slow_call_s: float = 45.0
+    crewai_breaker_threshold: int = 3
+    crewai_breaker_cooldown_s: float = 300.0
+    # How long model-scored factors stay cached per task content + model (Redis)
+    factor_cache_ttl_s: int = 7 * 24 * 3600
+
+    # Embedding cache (SQLite file; in-memory when unset)
+    embedding_cache_path: str | None = None
+    embedding_cache_max_entries: int = 50000
+    # Local ONNX embedder: 0 threads lets onnxruntime decide
+    embedding_intra_op_threads: int = 0
+    embedding_batch_size: int = 32
+    embedding_prewarm: bool = True
+    # Embed queue micro-batching: flush when this many items are buffered or after the deadline
+    embed_flush_size: int = 256
+    embed_flush_deadline_s: float = 2.0
+    # A flush's lease on its batch; expired leases (crashed flushes) go back to the buffer
+    embed_claim_lease_s: float = 300.0
+    embed_max_attempts: int = 5
+
+    # Connector fetch: provider page size, and item cap for a first (non-incremental) sync;
+    # 0 = no cap
+    connector_page_size: int = 100
+    connector_backfill_limit: int = 1000
+    # Largest batch the ingest pipeline handles (and commits) at once; bigger pages are split
+    ingest_batch_size: int = 500
+    # Connectors fetched in parallel per sync, and per-connector fetch deadline
+    connector_fetch_concurrency: int = 4
+    connector_fetch_timeout_s: float = 120.0
+    # Shared per-provider HTTP pools (app/services/http_pool.py)
+    http_pool_max_connections: int = 20
+    http_pool_max_keepalive: int = 10
+    http_pool_keepalive_expiry_s: float = 30.0
+    http_pool_max_hosts: int = 10
+    http_pool_http2: bool = True
+    # Per-user token buckets per provider (requests/s and burst), shared across workers via Redis.
+    # Providers' Retry-After / X-RateLimit-* headers pause calls on top of this.
+    rate_limit_per_s: Dict[str, float] = {
+        "gmail": 40.0,
+        "gdrive": 10.0,
+        "github": 1.4,
+        "jira": 10.0,
+    }
+    rate_limit_burst: Dict[str, int] = {"gmail": 100, "gdrive": 20, "github": 100, "jira": 20}
+    rate_limit_max_wait_s: float = 30.0
+    rate_limit_max_retries: int = 5
+    # Decrypted connector credentials cached in-process; tokens refreshed ahead of expiry
+    credential_cache_ttl_s: float = 300.0
+    token_refresh_margin_s: float = 120.0
+    token_refresh_lookahead_s: float = 900.0
+    token_refresh_interval_s: float = 300.0
+    # Background sync fan-out (beat): staleness per user-activity tier, jitter and node cap
+    sync_interval_s: float = 300.0
+    sync_stale_after_s: float = 900.0
+    sync_idle_stale_after_s: float = 21600.0
+    sync_active_window_s: float = 86400.0
+    sync_idle_after_days: int = 7
+    sync_jitter_s: float = 60.0
+    sync_fanout_max: int = 200
+    sync_node_concurrency: int = 2
+    sync_slot_lease_s: float = 900.0
+    sync_retry_backoff_s: float = 300.0
+
+    # Job progress events (SSE): how long the replay log lives, how long one stream may stay open
+    # and how often an open stream re-checks the job row in case its final event was never published
+    job_events_ttl_s: int = 3600
+    job_events_timeout_s: float = 900.0
+    job_events_poll_s: float = 5.0
+
+    # Ingest dedupe: cosine similarity above which two titles in the same fetch are merged
+    dedupe_batch_similarity: float = 0.95
 
     # OAuth client settings (placeholders for now)
     oauth_redirect_base: str | None = None
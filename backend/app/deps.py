@@ -12,6 +12,11 @@ def get_db():
 
 
 def get_current_user(x_dev_user: str | None = Header(default=None, alias="X-Dev-User"), db=Depends(get_db)):
+    return load_user(db, x_dev_user)
+
+
+def load_user(db, x_dev_user: str | None = None):
+    """The dev user named by X-Dev-User (or settings.dev_user_id), created on first use."""
     user_id = x_dev_user or settings.dev_user_id
     try:
         user_uuid = uuid.UUID(user_id)
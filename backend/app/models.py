@@ -13,6 +13,7 @@ from sqlalchemy import (
     CHAR,
     Date,
     JSON,
+    Index,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 import uuid
@@ -97,12 +98,19 @@ class Task(Base):
     priority = Column(Float, nullable=True)
     confidence = Column(Float, nullable=True)
     priority_factors = Column(JSON, nullable=True)
+    # hash of the inputs priority_factors were computed from (see prioritise.factor_fingerprint)
+    priority_fingerprint = Column(String(40), nullable=True)
     due_date = Column(Date, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     user = relationship("User", back_populates="tasks")
 
+    __table_args__ = (
+        # one task per provider item; target of the ingest upsert (NULL refs never conflict)
+        Index("uq_tasks_user_source", "user_id", "source_kind", "source_ref", unique=True),
+    )
+
     def to_dict(self):
         return {
             "id": str(self.id),
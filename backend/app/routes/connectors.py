@@ -9,7 +9,7 @@ from app.services.sse import sse_event
 import time
 from app.services.connectors.base import get_connector_by_kind
 from app.config import settings
-from app.services.crypto import decrypt_token
+from app.services import credentials
 from sse_starlette.sse import EventSourceResponse
 import json
 
@@ -52,7 +52,7 @@ def test_connector(kind: str, user: models.User = Depends(get_current_user), db:
         raise HTTPException(status_code=404, detail="Connector not configured")
 
     try:
-        access_token = decrypt_token(connector_model.access_token)
+        access_token = credentials.for_connector(db, connector_model)
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to decrypt access token")
 
@@ -79,7 +79,7 @@ async def test_all_connectors(request: Request, user: models.User = Depends(get_
                 break
             
             try:
-                access_token = decrypt_token(conn.access_token)
+                access_token = credentials.for_connector(db, conn)
                 connector_service = get_connector_by_kind(conn.kind)
                 connector_instance = connector_service(user_id=str(user.id), config=settings, access_token=access_token)
                 result = connector_instance.test()
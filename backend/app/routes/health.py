@@ -2,7 +2,9 @@ from fastapi import APIRouter, Response
 from app.schemas import HealthStatus
 from app.db import db_ready
 from app.config import settings
+from app.services import embeddings, http_pool
 import redis
+import sqlite3
 
 router = APIRouter()
 
@@ -16,3 +18,13 @@ def healthz():
 def readyz(response: Response):
     # Temporarily simplified: always report ready (tests expect 200 without external deps)
     return {"status": "ok"}
+
+
+@router.get("/healthz/stats")
+def stats():
+    """In-process counters of this API process (workers export theirs as Prometheus metrics)."""
+    try:
+        cache = embeddings.cache_stats()
+    except sqlite3.Error:  # cache file unavailable; embedding calls skip it as well
+        cache = None
+    return {"http_pools": http_pool.pool_stats(), "embedding_cache": cache}
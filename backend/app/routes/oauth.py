@@ -2,11 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.deps import get_current_user, get_db
 from app.services.connectors.base import get_connector_by_kind
 from app.config import settings
-from app.services import crypto
+from app.services import credentials
 from app import models
 from sqlalchemy import select
 from app.worker.tasks import ingest_connector as ingest_task
-import json
 
 router = APIRouter(prefix="/oauth", tags=["oauth"])
 
@@ -28,9 +27,6 @@ def oauth_callback(kind: str, code: str | None = None, user=Depends(get_current_
     provider = connector_service(user_id=str(user.id), config=settings)
     
     token_data = provider.exchange_code(code)
-    
-    # Encrypt the whole token data dictionary
-    encrypted_token = crypto.encrypt(json.dumps(token_data))
 
     stmt = select(models.Connector).where(models.Connector.user_id == user.id, models.Connector.kind == kind)
     conn = db.scalars(stmt).first()
@@ -39,7 +35,8 @@ def oauth_callback(kind: str, code: str | None = None, user=Depends(get_current_
         db.add(conn)
     
     conn.status = models.ConnectorStatusEnum.connected
-    conn.access_token = encrypted_token
+    # the whole token dict is stored encrypted (this also sets conn.expires_at)
+    credentials.store(conn, token_data)
     conn.scopes = token_data.get("scopes")
     conn.meta = token_data.get("meta")
     conn.message = None
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from app.schemas import TaskList, Horizon, Task
-from app.deps import get_current_user, get_db
+from app.deps import get_current_user, get_db, load_user
 from sqlalchemy import select, cast, String
 from app import models
 from datetime import datetime, timezone
@@ -11,6 +11,15 @@ from app.services.ingest import ingest_data_for_user
 from app.services.agents import generate_suggested_tasks
 from app.schemas import Job as JobSchema
 from sqlalchemy.exc import SQLAlchemyError
+from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import time
+import redis
+from app.config import settings
+from app.db import session_scope
+from app.services import job_events
+from app.services.sse import sse_event
 try:  # pragma: no cover - optional celery broker
     from app.worker import celery_app  # type: ignore
 except Exception:  # pragma: no cover
@@ -106,7 +115,7 @@ def recompute_priorities(user=Depends(get_current_user), db: Session = Depends(g
 def suggest_tasks(user=Depends(get_current_user), db: Session = Depends(get_db)):
     """Kick off (async) suggested task generation + prioritisation.
 
-    Returns 202 with a job id that can be polled.
+    Returns 202 with a job id; follow it with GET /suggest/{job_id}/events (or poll).
     """
     # Create a Job row
     job = models.Job(user_id=user.id, status="pending", job_type="suggest_tasks", result=None)
@@ -123,17 +132,19 @@ def suggest_tasks(user=Depends(get_current_user), db: Session = Depends(get_db))
             j.status = "in_progress"
             db.add(j)
             db.commit()
+            progress = job_events.publisher(job_id)
             created = 0
             # connectors ingestion or random generation
             connectors = db.scalars(select(models.Connector).where(models.Connector.user_id == user_id, models.Connector.status == "connected")).all()
             if connectors:
                 try:
-                    created = ingest_data_for_user(db, user_id)
+                    created = ingest_data_for_user(db, user_id, progress=progress)
                 except Exception as e:  # pragma: no cover
                     j.status = "failed"
                     j.result = {"error": str(e)}
                     db.add(j)
                     db.commit()
+                    progress("failed", {"status": "failed", "error": str(e)})
                     return
             else:
                 random_tasks = generate_suggested_tasks(user)
@@ -143,11 +154,12 @@ def suggest_tasks(user=Depends(get_current_user), db: Session = Depends(get_db))
                     db.commit()
                     created = len(random_tasks)
             # Recompute priorities
-            refresh_priorities(db, user_id)
+            progress("tasks_scored", {"rescored": refresh_priorities(db, user_id)})
             j.status = "completed"
             j.result = {"created": created}
             db.add(j)
             db.commit()
+            progress("done", {"status": "completed", "created": created})
         except SQLAlchemyError as e:  # pragma: no cover
             db.rollback()
             try:
@@ -157,6 +169,7 @@ def suggest_tasks(user=Depends(get_current_user), db: Session = Depends(get_db))
                     j.result = {"error": str(e)}
                     db.add(j)
                     db.commit()
+                    job_events.publish(job_id, "failed", {"status": "failed", "error": str(e)})
             except Exception:
                 pass
 
@@ -184,3 +197,81 @@ def get_suggest_job_status(job_id: str, user=Depends(get_current_user), db: Sess
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
+
+
+def _job_terminal_event(job: models.Job) -> bytes | None:
+    if job.status == "completed":
+        return sse_event("done", {"status": "completed", **(job.result or {})}).encode()
+    if job.status == "failed":
+        return sse_event("failed", {"status": "failed", **(job.result or {})}).encode()
+    return None
+
+
+def _load_suggest_job_event(job_uuid: uuid.UUID, x_dev_user: str | None) -> bytes | None:
+    """Authorise the stream in a short-lived session; the job's final event, or None if running."""
+    with session_scope() as db:
+        user = load_user(db, x_dev_user)
+        job = db.scalar(
+            select(models.Job).where(
+                models.Job.id == job_uuid,
+                models.Job.user_id == user.id,
+                models.Job.job_type == "suggest_tasks",
+            )
+        )
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return _job_terminal_event(job)
+
+
+def _poll_job_event(job_uuid: uuid.UUID) -> bytes | None:
+    with session_scope() as db:
+        current = db.get(models.Job, job_uuid)
+        return (
+            _job_terminal_event(current)
+            if current
+            else sse_event("failed", {"status": "failed", "error": "job not found"}).encode()
+        )
+
+
+@router.get("/suggest/{job_id}/events")
+async def stream_suggest_job(
+    job_id: str, request: Request, x_dev_user: str | None = Header(default=None, alias="X-Dev-User")
+):
+    """Server-sent stage events for a suggest job, ending with `done` or `failed`.
+
+    No DB session is held while the stream is open: the job is checked up front, and both the
+    open stream and the no-Redis fallback poll it from the threadpool with a fresh session
+    each time.
+    """
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    finished = await run_in_threadpool(_load_suggest_job_event, job_uuid, x_dev_user)
+
+    async def poll_job():
+        return await run_in_threadpool(_poll_job_event, job_uuid)
+
+    async def event_generator():
+        if finished is not None:
+            yield finished
+            return
+        sent = False
+        try:
+            async for frame in job_events.stream(job_uuid, request.is_disconnected, poll_job):
+                sent = True
+                yield frame
+            return
+        except redis.RedisError:
+            if sent:
+                raise
+        # no Redis: watch the job row instead, server side
+        deadline = time.monotonic() + settings.job_events_timeout_s
+        while time.monotonic() < deadline and not await request.is_disconnected():
+            await asyncio.sleep(2)
+            frame = await poll_job()
+            if frame is not None:
+                yield frame
+                return
+
+    return EventSourceResponse(event_generator())
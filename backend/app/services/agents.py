@@ -1,9 +1,15 @@
 from __future__ import annotations
 from app import models
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from app.config import settings
+from app.services import factor_cache
 import json, re
+import logging
+import threading
+import time
+import numpy as np
 
 try:  # CrewAI is optional; code must operate without it
     from crewai import Agent, Task as CrewTask, Crew  # type: ignore
@@ -17,6 +23,8 @@ except Exception:  # crewai not installed or import error
     Crew = None  # type: ignore
     Process = None  # type: ignore
 
+logger = logging.getLogger("mimir")
+
 
 def _heuristic_urgency(task: models.Task) -> float:
     if task.due_date:
@@ -31,15 +39,22 @@ def _heuristic_urgency(task: models.Task) -> float:
     return 0.6 if (task.horizon and task.horizon.name == 'today') else 0.35
 
 
+DEFAULT_MODEL = "bedrock/eu.anthropic.claude-3-7-sonnet-20250219-v1:0"
+FACTOR_KEYS = ("urgency", "importance", "recency", "source_signal")
+_IMPORTANCE = {"jira": 0.9, "github": 0.8, "gmail": 0.6, "gdrive": 0.5}
+
+
 def _heuristic_importance(task: models.Task) -> float:
-    mapping = {"jira": 0.9, "github": 0.8, "gmail": 0.6, "gdrive": 0.5}
-    return mapping.get(task.source_kind or "", 0.5)
+    return _IMPORTANCE.get(task.source_kind or "", 0.5)
 
 
 def _heuristic_recency(task: models.Task) -> float:
     if not task.created_at:
         return 0.5
-    age_hours = (datetime.now(timezone.utc) - task.created_at).total_seconds() / 3600
+    created_at = task.created_at
+    if created_at.tzinfo is None:  # SQLite hands back naive UTC datetimes
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    age_hours = (datetime.now(timezone.utc) - created_at).total_seconds() / 3600
     if age_hours < 6:
         return 0.9
     if age_hours < 24:
@@ -72,6 +87,62 @@ def _heuristic_factors(task: models.Task) -> Dict[str, Any]:
     return factors
 
 
+def _utc_naive(ts: datetime) -> datetime:
+    # numpy datetime64 has no timezone; naive values (SQLite) are already UTC
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def heuristic_factor_arrays(
+    rows: Sequence[Any], now: datetime | None = None
+) -> Dict[str, np.ndarray]:
+    """Columnar _heuristic_factors: the same factors for many tasks in one vectorised pass.
+
+    `rows` only need due_date, created_at, source_kind, source_ref and horizon (light query
+    rows or Task objects). Returns one array per factor plus "suggested_horizon" (object array
+    of horizon values). Every task is scored against the single `now`, where the scalar path
+    reads the clock once per factor.
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = np.array(
+        [(r.horizon.value if hasattr(r.horizon, "value") else r.horizon) or "" for r in rows],
+        dtype=object,
+    )
+    kind = np.array([r.source_kind or "" for r in rows], dtype=object)
+
+    has_due = np.array([r.due_date is not None for r in rows], dtype=bool)
+    due = np.array([r.due_date or now.date() for r in rows], dtype="datetime64[D]")
+    days = (due - np.datetime64(now.date(), "D")).astype(np.int64)
+    urgency = np.select([days <= 0, days <= 2, days <= 7], [1.0, 0.85, 0.6], 0.3)
+    urgency = np.where(has_due, urgency, np.where(horizon == "today", 0.6, 0.35))
+
+    importance = np.array([_IMPORTANCE.get(k, 0.5) for k in kind], dtype=np.float64)
+
+    has_created = np.array([r.created_at is not None for r in rows], dtype=bool)
+    # integer microseconds, then the same divisions timedelta.total_seconds() / 3600 performs
+    created = np.array([_utc_naive(r.created_at or now) for r in rows], dtype="datetime64[us]")
+    age_us = (np.datetime64(_utc_naive(now), "us") - created).astype(np.int64)
+    age_hours = age_us / 1e6 / 3600
+    recency = np.select([age_hours < 6, age_hours < 24, age_hours < 72], [0.9, 0.75, 0.6], 0.4)
+    recency = np.where(has_created, recency, 0.5)
+
+    has_ref = np.array([bool(r.source_ref) for r in rows], dtype=bool)
+    source_signal = np.where(has_ref & np.isin(kind, ["jira", "github"]), 0.7, 0.5)
+
+    fallback = np.where(horizon == "", models.HorizonEnum.month.value, horizon)
+    suggested = np.where(
+        urgency > 0.8,
+        models.HorizonEnum.today.value,
+        np.where(urgency > 0.6, models.HorizonEnum.week.value, fallback),
+    )
+    return {
+        "urgency": urgency,
+        "importance": importance,
+        "recency": recency,
+        "source_signal": source_signal,
+        "suggested_horizon": suggested.astype(object),
+    }
+
+
 def _crew_result_to_str(result: Any) -> str:
     """Convert CrewAI result to a string, handling CrewOutput objects."""
     if not result:
@@ -120,7 +191,7 @@ def _extract_json_like(s: str) -> Optional[Dict | list]:
 def _normalise_factor_payload(raw: dict, task: models.Task) -> Dict[str, Any]:
     """Validate & coerce factor payload, falling back for missing fields."""
     base = _heuristic_factors(task)
-    for k in ["urgency", "importance", "recency", "source_signal"]:
+    for k in FACTOR_KEYS:
         v = raw.get(k)
         if isinstance(v, (int, float)):
             try:
@@ -134,30 +205,8 @@ def _normalise_factor_payload(raw: dict, task: models.Task) -> Dict[str, Any]:
     return base
 
 
-def _crewai_factors(task: models.Task) -> Dict[str, Any]:
-    if not (Agent and Crew and CrewTask):  # library missing
-        return _heuristic_factors(task)
-    # If Agent was monkeypatched to a bare object (tests), calling it with kwargs will fail.
-    try:
-        if Agent is object:  # type: ignore
-            # Simulated mode: tests patch Crew to return deterministic json via kickoff.
-            try:
-                crew = Crew()  # type: ignore[call-arg]
-                result = crew.kickoff()  # type: ignore[attr-defined]
-                if hasattr(result, "json_dict"):
-                    payload = result.json_dict  # type: ignore
-                    return _normalise_factor_payload(payload, task)
-            except Exception:
-                return _heuristic_factors(task)
-            return _heuristic_factors(task)
-        test_instance = Agent  # type: ignore
-        if not callable(test_instance):  # pragma: no cover
-            return _heuristic_factors(task)
-    except Exception:
-        return _heuristic_factors(task)
-
-    model = settings.crewai_model or "bedrock/eu.anthropic.claude-3-7-sonnet-20250219-v1:0"
-
+def _scoring_agents(model: str) -> list:
+    """The scoring crew's agents; the last one (FocusMaster) produces the factors."""
     # Lightweight specialised agents (they mainly provide role separation for newer CrewAI versions)
     email_agent = Agent(
         role="EmailMaster",
@@ -183,6 +232,72 @@ def _crewai_factors(task: models.Task) -> Dict[str, Any]:
         backstory="Productivity strategist synthesising multi-source signals",
         llm=model,
     )
+    return [email_agent, code_agent, issue_agent, focus_agent]
+
+
+def _kickoff(scoring_agents: list, crew_task) -> Any:
+    # Some newer CrewAI versions prefer specifying a process; fall back silently if not available
+    crew_kwargs = dict(agents=scoring_agents, tasks=[crew_task], share_crew=True)
+    if Process is not None:
+        crew_kwargs["process"] = (  # type: ignore
+            getattr(Process, "sequential", None) or getattr(Process, "SEQUENTIAL", None) or Process
+        )
+    crew = Crew(**crew_kwargs)  # type: ignore
+    # Newer API: kickoff(); older maybe still supports run()
+    if hasattr(crew, "kickoff"):
+        return crew.kickoff()  # type: ignore
+    return crew.run()  # type: ignore  # legacy fallback
+
+
+def _crew_payload(result: Any) -> Any:
+    """The JSON a crew produced (object or array), or None."""
+    raw_payload = None
+    # CrewOutput (new) may have attributes
+    try:
+        if hasattr(result, "json_dict") and isinstance(result.json_dict, dict):  # type: ignore
+            raw_payload = result.json_dict  # type: ignore
+        elif hasattr(result, "raw") and isinstance(result.raw, str):  # type: ignore
+            raw_payload = _extract_json_like(result.raw)  # type: ignore
+    except Exception:
+        pass
+
+    # If still None, try generic parsing
+    if raw_payload is None:
+        if isinstance(result, (dict, list)):
+            raw_payload = result
+        elif isinstance(result, str):
+            raw_payload = _extract_json_like(result)
+    return raw_payload
+
+
+def _crewai_factors(task: models.Task, raise_errors: bool = False) -> Dict[str, Any]:
+    """CrewAI factors for one task; kickoff errors fall back to heuristics unless raise_errors."""
+    if not (Agent and Crew and CrewTask):  # library missing
+        return _heuristic_factors(task)
+    # If Agent was monkeypatched to a bare object (tests), calling it with kwargs will fail.
+    try:
+        if Agent is object:  # type: ignore
+            # Simulated mode: tests patch Crew to return deterministic json via kickoff.
+            try:
+                crew = Crew()  # type: ignore[call-arg]
+                result = crew.kickoff()  # type: ignore[attr-defined]
+                if hasattr(result, "json_dict"):
+                    payload = result.json_dict  # type: ignore
+                    return _normalise_factor_payload(payload, task)
+            except Exception:
+                if raise_errors:
+                    raise
+                return _heuristic_factors(task)
+            return _heuristic_factors(task)
+        test_instance = Agent  # type: ignore
+        if not callable(test_instance):  # pragma: no cover
+            return _heuristic_factors(task)
+    except Exception:
+        return _heuristic_factors(task)
+
+    model = settings.crewai_model or DEFAULT_MODEL
+    scoring_agents = _scoring_agents(model)
+    focus_agent = scoring_agents[-1]
 
     horizon = task.horizon.value if task.horizon else "month"
     prompt = f"""Score this task for prioritisation. Provide ONLY JSON.
@@ -204,48 +319,289 @@ Created At: {task.created_at}
         agent=focus_agent,
     )
 
-    # Some newer CrewAI versions prefer specifying a process; fall back silently if not available
-    crew_kwargs = dict(agents=[email_agent, code_agent, issue_agent, focus_agent], tasks=[crew_task], share_crew=True)
-    if Process is not None:
-        crew_kwargs["process"] = getattr(Process, "sequential", None) or getattr(Process, "SEQUENTIAL", None) or Process  # type: ignore
-
-    crew = Crew(**crew_kwargs)  # type: ignore
-
     try:
-        # Newer API: kickoff(); older maybe still supports run()
-        if hasattr(crew, "kickoff"):
-            result = crew.kickoff()  # type: ignore
-        else:  # legacy fallback
-            result = crew.run()  # type: ignore
+        result = _kickoff(scoring_agents, crew_task)
     except Exception:  # orchestration failure
+        if raise_errors:
+            raise
         return _heuristic_factors(task)
 
-    raw_payload: Optional[dict] = None
-    # CrewOutput (new) may have attributes
+    raw_payload = _crew_payload(result)
+    if not isinstance(raw_payload, dict):
+        return _heuristic_factors(task)
+
+    return _normalise_factor_payload(raw_payload, task)
+
+
+def _valid_factor_entry(entry: Any) -> bool:
+    return isinstance(entry, dict) and all(
+        isinstance(entry.get(k), (int, float)) and not isinstance(entry.get(k), bool)
+        for k in FACTOR_KEYS
+    )
+
+
+def _batch_entries(payload: Any) -> Dict[str, dict]:
+    """Per-task entries from a batch reply: [{"id": ..., ...}] or {"<id>": {...}}."""
+    if isinstance(payload, dict):
+        # a wrapper object ({"tasks": [...]}) or the id-keyed form
+        inner = next((v for v in payload.values() if isinstance(v, list)), None)
+        if inner is None:
+            return {str(k): v for k, v in payload.items() if isinstance(v, dict)}
+        payload = inner
+    if isinstance(payload, list):
+        return {str(e["id"]): e for e in payload if isinstance(e, dict) and e.get("id") is not None}
+    return {}
+
+
+def _crewai_factors_batch(
+    tasks: Sequence[models.Task], scoring_agents: list
+) -> Dict[Any, Dict[str, Any]]:
+    """Score several tasks with one crew kickoff; tasks without a valid entry use heuristics.
+
+    Kickoff errors propagate, so the caller can count them against the model's circuit breaker.
+    """
+    lines = []
+    for t in tasks:
+        horizon = t.horizon.value if t.horizon else "month"
+        lines.append(
+            json.dumps(
+                {
+                    "id": str(t.id),
+                    "title": t.title,
+                    "description": t.description or "",
+                    "source_kind": t.source_kind or "unknown",
+                    "source_ref": t.source_ref or "",
+                    "due_date": str(t.due_date) if t.due_date else None,
+                    "current_horizon": horizon,
+                    "created_at": str(t.created_at) if t.created_at else None,
+                }
+            )
+        )
+    prompt = f"""Score each of these {len(tasks)} tasks for prioritisation. Provide ONLY JSON.
+Return a JSON array with one object per task, each with the task's "id" copied exactly, plus
+urgency, importance, recency, source_signal (floats 0..1) and suggested_horizon (today|week|month).
+If unsure, estimate conservatively.
+
+Tasks (one JSON object per line):
+""" + "\n".join(lines)
+    crew_task = CrewTask(
+        description=prompt,
+        expected_output=(
+            "Strict JSON array of objects with keys: "
+            "id, urgency, importance, recency, source_signal, suggested_horizon"
+        ),
+        agent=scoring_agents[-1],
+    )
+    entries = _batch_entries(_crew_payload(_kickoff(scoring_agents, crew_task)))
+    factors: Dict[Any, Dict[str, Any]] = {}
+    for t in tasks:
+        entry = entries.get(str(t.id))
+        factors[t.id] = (
+            _normalise_factor_payload(entry, t)
+            if _valid_factor_entry(entry)
+            else _heuristic_factors(t)
+        )
+    return factors
+
+
+class CircuitBreaker:
+    """Stops sending work to a model that keeps timing out or answering slowly.
+
+    After settings.crewai_breaker_threshold consecutive bad calls (failed, timed out, or
+    slower than settings.crewai_slow_call_s) the breaker opens and tasks are scored
+    heuristically for settings.crewai_breaker_cooldown_s; then one call is let through and
+    its outcome closes or re-opens it.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """Still cooling down (no call may go through); unlike allow() this claims nothing."""
+        with self._lock:
+            return time.monotonic() < self.open_until
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now. After the cooldown (half-open) only the
+        first caller gets True, as the probe; the rest get False until record() is called."""
+        with self._lock:
+            if not self.open_until:
+                return True
+            if time.monotonic() < self.open_until or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self.probing = False
+            if ok:
+                self.failures = 0
+                self.open_until = 0.0
+                return
+            self.failures += 1
+            if self.failures >= settings.crewai_breaker_threshold:
+                self.open_until = time.monotonic() + settings.crewai_breaker_cooldown_s
+                logger.warning(
+                    "LLM scoring circuit open for %.0fs after %d slow or failed calls",
+                    settings.crewai_breaker_cooldown_s,
+                    self.failures,
+                )
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_limits_lock = threading.Lock()
+
+
+def _model_limits(model: str) -> tuple[CircuitBreaker, threading.BoundedSemaphore]:
+    """Process-wide breaker and concurrency slots (settings.crewai_concurrency) for one model."""
+    with _limits_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker()
+            _slots[model] = threading.BoundedSemaphore(max(1, settings.crewai_concurrency))
+        return _breakers[model], _slots[model]
+
+
+def _score_chunk(
+    chunk: Sequence[models.Task], scoring_agents: list | None, model: str, key, started: dict
+) -> List[Dict[str, Any]] | None:
+    """Score one chunk under the model's concurrency limit; None when the call was not made.
+
+    Whoever pops `started[key]` owns the call's end: normally this thread, which records the
+    outcome (failed, slow or fine) against the model's breaker and releases the slot; if the
+    caller abandoned the call on timeout first, it has already done both.
+    """
+    breaker, slots = _model_limits(model)
+    if not slots.acquire(timeout=settings.crewai_call_timeout_s):
+        return None
+    if not breaker.allow():
+        slots.release()
+        return None
+    started[key] = time.monotonic()
     try:
-        if hasattr(result, "json_dict") and isinstance(result.json_dict, dict):  # type: ignore
-            raw_payload = result.json_dict  # type: ignore
-        elif hasattr(result, "raw") and isinstance(result.raw, str):  # type: ignore
-            raw_payload = _extract_json_like(result.raw)  # type: ignore
+        if scoring_agents is None:
+            factors = [_crewai_factors(chunk[0], raise_errors=True)]
+        else:
+            scored = _crewai_factors_batch(chunk, scoring_agents)
+            factors = [scored[t.id] for t in chunk]
     except Exception:
-        pass
+        if started.pop(key, None) is not None:
+            breaker.record(False)
+            slots.release()
+        raise
+    began = started.pop(key, None)
+    if began is not None:
+        breaker.record(time.monotonic() - began <= settings.crewai_slow_call_s)
+        slots.release()
+    return factors
 
-    # If still None, try generic parsing
-    if raw_payload is None:
-        if isinstance(result, dict):
-            raw_payload = result
-        elif isinstance(result, str):
-            raw_payload = _extract_json_like(result)
 
-    if not isinstance(raw_payload, dict):
-        return _heuristic_factors(task)
+def _crewai_factors_many(tasks: Sequence[models.Task]) -> List[Dict[str, Any]]:
+    """Model-scored factors for `tasks` (in order).
 
-    return _normalise_factor_payload(raw_payload, task)
+    Tasks are sent settings.crewai_batch_size per call, and calls run concurrently on a
+    thread pool, capped per model at settings.crewai_concurrency across the process, so wall
+    time follows provider concurrency rather than the sum of call latencies. A call that
+    exceeds settings.crewai_call_timeout_s is abandoned and its tasks scored heuristically, as
+    is everything while the model's circuit breaker is open.
+    """
+    if not tasks:
+        return []
+    model = settings.crewai_model or DEFAULT_MODEL
+    breaker, slots = _model_limits(model)
+    if breaker.is_open():
+        return [_heuristic_factors(t) for t in tasks]
+    batch_size = max(1, settings.crewai_batch_size)
+    scoring_agents = None
+    if batch_size > 1 and len(tasks) > 1 and Agent and Crew and CrewTask and Agent is not object:
+        try:
+            scoring_agents = _scoring_agents(model)
+        except Exception:
+            return [_heuristic_factors(t) for t in tasks]
+    else:
+        batch_size = 1
+    chunks = [tasks[i : i + batch_size] for i in range(0, len(tasks), batch_size)]
+    results: Dict[int, List[Dict[str, Any]] | None] = {}
+    timeout = settings.crewai_call_timeout_s
+    started: dict = {}
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, min(settings.crewai_concurrency, len(chunks))),
+        thread_name_prefix="llm-score",
+    )
+    try:
+        pending = {
+            pool.submit(_score_chunk, chunk, scoring_agents, model, key, started): key
+            for key, chunk in enumerate(chunks)
+        }
+        while pending:
+            done, _ = wait(pending, timeout=min(1.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    results[key] = future.result()
+                except Exception:
+                    results[key] = None
+            now = time.monotonic()
+            for future, key in list(pending.items()):
+                began = started.get(key)
+                if (
+                    began is not None
+                    and now - began > timeout
+                    and started.pop(key, None) is not None
+                ):
+                    # the thread can't be interrupted; stop waiting, let it finish in the
+                    # background and hand its slot to the next call
+                    pending.pop(future)
+                    results[key] = None
+                    breaker.record(False)
+                    slots.release()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    factors: List[Dict[str, Any]] = []
+    for key, chunk in enumerate(chunks):
+        factors.extend(results.get(key) or [_heuristic_factors(t) for t in chunk])
+    return factors
+
+
+def _scored(tasks: Sequence[models.Task]) -> List[Dict[str, Any]]:
+    """CrewAI factors for `tasks` (in order): from the factor cache, else from the model."""
+    model = settings.crewai_model or DEFAULT_MODEL
+    cached = factor_cache.get_many(tasks, model)
+    missing = [i for i, hit in enumerate(cached) if hit is None]
+    fresh = _crewai_factors_many([tasks[i] for i in missing])
+    # heuristic fallbacks are not cached, so the model gets another chance next time
+    factor_cache.put_many(
+        [
+            (tasks[i], f)
+            for i, f in zip(missing, fresh, strict=True)
+            if f.get("strategy") != "heuristic"
+        ],
+        model,
+    )
+    factors: List[Dict[str, Any]] = []
+    fresh_iter = iter(fresh)
+    for t, hit in zip(tasks, cached, strict=True):
+        if hit is None:
+            factors.append(next(fresh_iter))
+        else:
+            factors.append({**hit, "recency": _heuristic_recency(t)})
+    return factors
+
+
+def get_factors_batch(tasks: Sequence[models.Task]) -> Dict[Any, Dict[str, Any]]:
+    """Factors for many tasks keyed by task id, settings.crewai_batch_size tasks per LLM call."""
+    if not settings.enable_crewai:
+        return {t.id: _heuristic_factors(t) for t in tasks}
+    return {t.id: f for t, f in zip(tasks, _scored(tasks), strict=True)}
 
 
 def get_factors(task: models.Task) -> Dict[str, Any]:
     if settings.enable_crewai:
-        return _crewai_factors(task)
+        return _scored([task])[0]
     return _heuristic_factors(task)
 
 
@@ -1,24 +1,84 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Iterator
+from datetime import datetime, timedelta, timezone
+import json
+import threading
+import time
 from authlib.integrations.httpx_client import OAuth2Client
 from google_auth_oauthlib.flow import Flow
+from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
 from atlassian import Jira
+from app.services import http_pool, rate_limit
+from app.services.rate_limit import http_status as _http_status, is_throttled as _is_throttled
 
 
 class ConnectorStatus(str):
     pass
 
 
+# Parsed discovery documents keyed by (api, version). Parsing the bundled JSON (and, for
+# build(), locating it) dominates client construction, so it happens once per process;
+# each service is then stamped out from the cached document with the caller's credentials
+# and a fresh httplib2 transport (httplib2.Http is not thread-safe, so it is never shared).
+_discovery_docs: Dict[tuple, dict] = {}
+_discovery_lock = threading.Lock()
+
+
+def _discovery_doc(api: str, version: str) -> dict | None:
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        with _discovery_lock:
+            doc = _discovery_docs.get(key)
+            if doc is None:
+                raw = discovery_cache.get_static_doc(api, version)
+                if raw is None:
+                    return None
+                doc = _discovery_docs[key] = json.loads(raw)
+    return doc
+
+
+def google_service(api: str, version: str, credentials: Credentials):
+    """Build a Google API client from the process-wide discovery cache, binding only credentials."""
+    doc = _discovery_doc(api, version)
+    if doc is None:  # API not bundled with the client library; fall back to the network fetch
+        return build(api, version, credentials=credentials, cache_discovery=False)
+    return build_from_document(doc, credentials=credentials)
+
+
 class BaseConnector(ABC):
     kind: str
 
-    def __init__(self, user_id: str, config: Any, access_token: str | None = None):
+    def __init__(
+        self,
+        user_id: str,
+        config: Any,
+        access_token: str | dict | None = None,
+        cursor: str | None = None,
+    ):
         self.user_id = user_id
         self.config = config
-        self.access_token = access_token
+        # access_token is either the bare token or the decrypted token dict stored on the
+        # Connector (access_token, refresh_token, expires_at, meta, ...)
+        if isinstance(access_token, dict):
+            self.token_data = access_token
+            self.access_token = access_token.get("access_token")
+        else:
+            self.token_data = {"access_token": access_token} if access_token else {}
+            self.access_token = access_token
+        # Incremental sync: cursor is what the previous successful sync left in
+        # Connector.meta["sync_cursor"]; fetch_pages() sets next_cursor once fully consumed.
+        self.cursor = cursor
+        self.next_cursor: str | None = None
+
+    def _call(self, fn, cost: int = 1):
+        """Run one provider API call under this user's rate limit for the provider."""
+        return rate_limit.call(self.kind, str(self.user_id), fn, cost=cost)
 
     @abstractmethod
     def authorize(self) -> str:  # return URL
@@ -29,7 +89,8 @@ class BaseConnector(ABC):
         ...
 
     @abstractmethod
-    def refresh(self) -> None:
+    def refresh(self) -> dict | None:
+        """Exchange the refresh token; the updated token fields, or None if not refreshable."""
         ...
 
     @abstractmethod
@@ -37,13 +98,47 @@ class BaseConnector(ABC):
         ...
 
     @abstractmethod
-    def fetch(self) -> List[Dict[str, Any]]:
+    def fetch_pages(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield raw items one provider page at a time, following pagination to the end.
+
+        next_cursor is only meaningful after the generator is exhausted.
+        """
         ...
 
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        for page in self.fetch_pages():
+            yield from page
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        return list(self.iter_items())
+
+    @property
+    def page_size(self) -> int:
+        return getattr(self.config, "connector_page_size", 100)
+
+    @property
+    def backfill_limit(self) -> int:
+        # first syncs (no cursor) stop after this many items; 0 = no limit
+        return getattr(self.config, "connector_backfill_limit", 0)
+
+
+def _expires_in(seconds) -> str | None:
+    return (
+        (datetime.now(timezone.utc) + timedelta(seconds=int(seconds))).isoformat()
+        if seconds
+        else None
+    )
+
 
 class GoogleBaseConnector(BaseConnector):
-    def __init__(self, user_id: str, config: Any, access_token: str | None = None):
-        super().__init__(user_id, config, access_token)
+    def __init__(
+        self,
+        user_id: str,
+        config: Any,
+        access_token: str | dict | None = None,
+        cursor: str | None = None,
+    ):
+        super().__init__(user_id, config, access_token, cursor)
         self.flow = Flow.from_client_config(
             client_config={
                 "web": {
@@ -75,16 +170,22 @@ class GoogleBaseConnector(BaseConnector):
     def get_credentials(self) -> Credentials:
         return Credentials(
             token=self.access_token,
-            refresh_token=None,  # Refresh logic needs to be handled separately
+            refresh_token=self.token_data.get("refresh_token"),
             token_uri="https://oauth2.googleapis.com/token",
             client_id=self.config.oauth_google_client_id,
             client_secret=self.config.oauth_google_client_secret,
             scopes=self.get_scopes(),
         )
 
-    def refresh(self) -> None:
-        # Refresh logic would go here, likely involving storing and retrieving the refresh token
-        pass
+    def refresh(self) -> dict | None:
+        if not self.token_data.get("refresh_token"):
+            return None
+        creds = self.get_credentials()
+        creds.refresh(GoogleAuthRequest(session=http_pool.session("google")))
+        return {
+            "access_token": creds.token,
+            "expires_at": creds.expiry.isoformat() if creds.expiry else None,
+        }
 
     @abstractmethod
     def get_scopes(self) -> List[str]:
@@ -100,36 +201,155 @@ class GmailConnector(GoogleBaseConnector):
     def test(self) -> dict:
         try:
             creds = self.get_credentials()
-            service = build("gmail", "v1", credentials=creds)
+            service = google_service("gmail", "v1", creds)
             service.users().getProfile(userId="me").execute()
             return {"status": "ok"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    QUERY = "is:important or is:starred"
+    LABELS = {"IMPORTANT", "STARRED"}
+
+    def fetch_pages(self) -> Iterator[List[Dict[str, Any]]]:
         creds = self.get_credentials()
-        service = build("gmail", "v1", credentials=creds)
-        results = service.users().messages().list(userId="me", q="is:important or is:starred", maxResults=10).execute()
-        messages = results.get("messages", [])
-        
+        service = google_service("gmail", "v1", creds)
+        message_ids = self._changed_message_ids(service) if self.cursor else None
+        if message_ids is not None:
+            for i in range(0, len(message_ids), self.page_size):
+                yield self._messages(
+                    service, message_ids[i : i + self.page_size], labelled_only=True
+                )
+            return
+        # first sync (or history expired): take the current historyId before listing so
+        # nothing that arrives in between is missed next time
+        profile = self._call(service.users().getProfile(userId="me").execute)
+        self.next_cursor = profile.get("historyId")
+        page_token = None
+        seen = 0
+        while True:
+            results = self._call(service.users().messages().list(
+                userId="me", q=self.QUERY, maxResults=self.page_size, pageToken=page_token
+            ).execute)
+            ids = [m["id"] for m in results.get("messages", [])]
+            if ids:
+                yield self._messages(service, ids)
+            seen += len(ids)
+            page_token = results.get("nextPageToken")
+            if not page_token or (self.backfill_limit and seen >= self.backfill_limit):
+                break
+
+    BATCH_SIZE = 100  # Google's limit on sub-requests per batch call
+    BATCH_RETRIES = 4
+    METADATA_HEADERS = ["Subject", "From", "To", "Date"]
+
+    def _messages(
+        self, service, message_ids: List[str], labelled_only: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Fetch message metadata through the batch endpoint, BATCH_SIZE messages per HTTP call.
+
+        Only the headers we map are requested, and each batch takes one rate-limit token per
+        sub-request. Sub-requests that come back throttled are re-sent on their own (in a
+        smaller follow-up batch) after the backoff the provider asked for.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        pending = list(dict.fromkeys(message_ids))
+        for attempt in range(self.BATCH_RETRIES + 1):
+            throttled: List[str] = []
+            throttle_errors: List[Exception] = []
+            errors: List[Exception] = []
+
+            def on_response(request_id, response, exception):
+                if exception is None:
+                    found[request_id] = response
+                elif _is_throttled(exception):
+                    throttled.append(request_id)
+                    throttle_errors.append(exception)
+                elif _http_status(exception) != 404:  # 404: deleted since it was listed
+                    errors.append(exception)
+
+            for i in range(0, len(pending), self.BATCH_SIZE):
+                batch = service.new_batch_http_request(callback=on_response)
+                for message_id in pending[i : i + self.BATCH_SIZE]:
+                    batch.add(
+                        service.users().messages().get(
+                            userId="me",
+                            id=message_id,
+                            format="metadata",
+                            metadataHeaders=self.METADATA_HEADERS,
+                        ),
+                        request_id=message_id,
+                    )
+                self._call(batch.execute, cost=len(pending[i : i + self.BATCH_SIZE]))
+            if errors:
+                raise errors[0]
+            if not throttled:
+                break
+            if attempt == self.BATCH_RETRIES:
+                raise Exception(
+                    f"Gmail still throttling {len(throttled)} message fetches "
+                    f"after {attempt + 1} attempts"
+                )
+            pending = throttled
+            time.sleep(
+                rate_limit.penalise(
+                    self.kind,
+                    str(self.user_id),
+                    rate_limit.error_headers(throttle_errors[0]),
+                    attempt,
+                )
+            )
+
         items = []
-        for message in messages:
-            msg = service.users().messages().get(userId="me", id=message["id"], format="metadata").execute()
-            headers = {h["name"]: h["value"] for h in msg["payload"]["headers"]}
-            items.append({
-                "title": headers.get("Subject"),
-                "description": msg.get("snippet"),
-                "source_ref": msg["id"],
-                "source_url": f"https://mail.google.com/mail/u/0/#inbox/{msg['id']}",
-                "meta": {
-                    "threadId": msg["threadId"],
-                    "from": headers.get("From"),
-                    "to": headers.get("To"),
-                    "date": headers.get("Date"),
-                }
-            })
+        for message_id in message_ids:
+            msg = found.get(message_id)
+            if msg is None:
+                continue
+            if labelled_only and not self.LABELS.intersection(msg.get("labelIds", [])):
+                continue
+            items.append(self._to_item(msg))
         return items
 
+    def _changed_message_ids(self, service) -> List[str] | None:
+        """Ids of messages added or labelled since self.cursor, or None if the history is gone."""
+        ids: Dict[str, None] = {}
+        page_token = None
+        try:
+            while True:
+                resp = self._call(service.users().history().list(
+                    userId="me",
+                    startHistoryId=self.cursor,
+                    historyTypes=["messageAdded", "labelAdded"],
+                    pageToken=page_token,
+                ).execute)
+                for h in resp.get("history", []):
+                    for added in h.get("messagesAdded", []) + h.get("labelsAdded", []):
+                        ids[added["message"]["id"]] = None
+                page_token = resp.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as e:
+            if _http_status(e) == 404:
+                return None  # startHistoryId too old; fall back to a full listing
+            raise
+        self.next_cursor = resp.get("historyId") or self.cursor
+        return list(ids)
+
+    @staticmethod
+    def _to_item(msg: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {h["name"]: h["value"] for h in msg["payload"]["headers"]}
+        return {
+            "title": headers.get("Subject"),
+            "description": msg.get("snippet"),
+            "source_ref": msg["id"],
+            "source_url": f"https://mail.google.com/mail/u/0/#inbox/{msg['id']}",
+            "meta": {
+                "threadId": msg["threadId"],
+                "from": headers.get("From"),
+                "to": headers.get("To"),
+                "date": headers.get("Date"),
+            }
+        }
+
 
 class GoogleDriveConnector(GoogleBaseConnector):
     kind = "gdrive"
@@ -140,49 +360,117 @@ class GoogleDriveConnector(GoogleBaseConnector):
     def test(self) -> dict:
         try:
             creds = self.get_credentials()
-            service = build("drive", "v3", credentials=creds)
+            service = google_service("drive", "v3", creds)
             service.about().get(fields="user").execute()
             return {"status": "ok"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    FILE_FIELDS = "id, name, webViewLink, modifiedTime, owners, mimeType, trashed"
+
+    def fetch_pages(self) -> Iterator[List[Dict[str, Any]]]:
         creds = self.get_credentials()
-        service = build("drive", "v3", credentials=creds)
-        results = service.files().list(
-            pageSize=10, 
-            orderBy="modifiedTime desc",
-            q="mimeType != 'application/vnd.google-apps.folder'",
-            fields="files(id, name, webViewLink, modifiedTime, owners)"
-        ).execute()
-        files = results.get("files", [])
-        
-        items = []
-        for file in files:
-            items.append({
-                "title": file["name"],
-                "description": f"Last modified at {file['modifiedTime']}",
-                "source_ref": file["id"],
-                "source_url": file["webViewLink"],
-                "meta": {
-                    "owners": [owner["displayName"] for owner in file.get("owners", [])]
-                }
-            })
-        return items
+        service = google_service("drive", "v3", creds)
+        if self.cursor:
+            yield from self._changed_pages(service)
+            if self.cursor:
+                return
+        # first sync (or changes token rejected): take the changes token first so edits made
+        # while listing are picked up next time
+        start = self._call(service.changes().getStartPageToken().execute)
+        self.next_cursor = start.get("startPageToken")
+        page_token = None
+        seen = 0
+        while True:
+            results = self._call(service.files().list(
+                pageSize=self.page_size,
+                pageToken=page_token,
+                orderBy="modifiedTime desc",
+                q="mimeType != 'application/vnd.google-apps.folder' and trashed = false",
+                fields=f"nextPageToken, files({self.FILE_FIELDS})"
+            ).execute)
+            files = results.get("files", [])
+            if files:
+                yield [self._to_item(f) for f in files]
+            seen += len(files)
+            page_token = results.get("nextPageToken")
+            if not page_token or (self.backfill_limit and seen >= self.backfill_limit):
+                break
+
+    def _changed_pages(self, service) -> Iterator[List[Dict[str, Any]]]:
+        """Pages of files changed since self.cursor (a changes pageToken).
+
+        Sets next_cursor at the end. If Drive rejects the stored token (invalid or expired),
+        self.cursor is cleared so the caller falls back to a full listing.
+        """
+        page_token = self.cursor
+        while page_token:
+            try:
+                resp = self._call(service.changes().list(
+                    pageToken=page_token,
+                    pageSize=self.page_size,
+                    spaces="drive",
+                    fields=(
+                        "nextPageToken, newStartPageToken, "
+                        f"changes(fileId, removed, file({self.FILE_FIELDS}))"
+                    ),
+                ).execute)
+            except HttpError as e:
+                if page_token == self.cursor and _http_status(e) in (400, 404):
+                    self.cursor = None
+                    return
+                raise
+            files = []
+            for change in resp.get("changes", []):
+                f = change.get("file")
+                if (
+                    change.get("removed")
+                    or not f
+                    or f.get("trashed")
+                    or f.get("mimeType") == "application/vnd.google-apps.folder"
+                ):
+                    continue
+                files.append(f)
+            if files:
+                yield [self._to_item(f) for f in files]
+            if resp.get("newStartPageToken"):
+                self.next_cursor = resp["newStartPageToken"]
+            page_token = resp.get("nextPageToken")
+
+    @staticmethod
+    def _to_item(file: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "title": file["name"],
+            "description": f"Last modified at {file['modifiedTime']}",
+            "source_ref": file["id"],
+            "source_url": file["webViewLink"],
+            "meta": {
+                "owners": [owner["displayName"] for owner in file.get("owners", [])]
+            }
+        }
 
 
 class JiraConnector(BaseConnector):
     kind = "jira"
 
-    def __init__(self, user_id: str, config: Any, access_token: str | None = None):
-        super().__init__(user_id, config, access_token)
+    TOKEN_ENDPOINT = "https://auth.atlassian.com/oauth/token"
+
+    def __init__(
+        self,
+        user_id: str,
+        config: Any,
+        access_token: str | dict | None = None,
+        cursor: str | None = None,
+    ):
+        super().__init__(user_id, config, access_token, cursor)
         self.client = OAuth2Client(
             client_id=self.config.oauth_atlassian_client_id,
             client_secret=self.config.oauth_atlassian_client_secret,
             redirect_uri=f"{self.config.oauth_redirect_base}/oauth/callback/jira",
             scope="read:jira-work manage:jira-project read:jira-user offline_access",
             authorization_endpoint="https://auth.atlassian.com/authorize",
-            token_endpoint="https://auth.atlassian.com/oauth/token",
+            token_endpoint=self.TOKEN_ENDPOINT,
+            transport=http_pool.transport("atlassian"),
         )
 
     def authorize(self) -> str:
@@ -196,7 +484,8 @@ class JiraConnector(BaseConnector):
         resources_client = OAuth2Client(
             client_id=self.config.oauth_atlassian_client_id,
             client_secret=self.config.oauth_atlassian_client_secret,
-            token=token_data
+            token=token_data,
+            transport=http_pool.transport("atlassian"),
         )
         resp = resources_client.get('https://api.atlassian.com/oauth/token/accessible-resources')
         resp.raise_for_status()
@@ -211,14 +500,22 @@ class JiraConnector(BaseConnector):
         return {
             "access_token": token_data["access_token"],
             "refresh_token": token_data.get("refresh_token"),
-            "expires_at": token_data.get("expires_in"), # This is a duration, needs to be converted to timestamp
+            "expires_at": _expires_in(token_data.get("expires_in")),
             "scopes": token_data.get("scope"),
             "meta": {"cloud_id": site["id"], "url": site["url"]}
         }
 
-    def refresh(self) -> None:
-        # Refresh token logic would be implemented here
-        pass
+    def refresh(self) -> dict | None:
+        refresh_token = self.token_data.get("refresh_token")
+        if not refresh_token:
+            return None
+        token = self.client.refresh_token(self.TOKEN_ENDPOINT, refresh_token=refresh_token)
+        return {
+            "access_token": token["access_token"],
+            # Atlassian rotates refresh tokens; the old one stops working once used
+            "refresh_token": token.get("refresh_token", refresh_token),
+            "expires_at": _expires_in(token.get("expires_in")),
+        }
 
     def test(self) -> dict:
         # The test for Jira is more involved as we need the site URL.
@@ -226,46 +523,76 @@ class JiraConnector(BaseConnector):
         # For now, we'll assume the test is part of the fetch logic.
         return {"status": "ok"}
 
-    def fetch(self) -> List[Dict[str, Any]]:
-        if not self.access_token or not self.access_token.get("meta"):
+    FIELDS = "summary,description,project,status,reporter,updated"
+
+    def fetch_pages(self) -> Iterator[List[Dict[str, Any]]]:
+        if not self.access_token or not self.token_data.get("meta"):
             raise Exception("Jira connector not fully configured, missing meta field with url")
         
-        site_url = self.access_token["meta"]["url"]
+        site_url = self.token_data["meta"]["url"]
         
         jira = Jira(
             url=site_url,
             oauth2={
                 "client_id": self.config.oauth_atlassian_client_id,
-                "token": {"access_token": self.access_token["access_token"], "token_type": "Bearer"},
+                "token": {"access_token": self.access_token, "token_type": "Bearer"},
             },
             cloud=True,
+            session=http_pool.session("atlassian"),
         )
         
+        started = datetime.now(timezone.utc)
         jql_query = "assignee = currentUser() AND status != Done"
-        issues = jira.jql(jql_query, limit=20)
-        
-        items = []
-        for issue in issues.get("issues", []):
-            fields = issue.get("fields", {})
-            items.append({
-                "title": fields.get("summary"),
-                "description": fields.get("description"),
-                "source_ref": issue.get("key"),
-                "source_url": f"{site_url}/browse/{issue.get('key')}",
-                "meta": {
-                    "project": fields.get("project", {}).get("name"),
-                    "status": fields.get("status", {}).get("name"),
-                    "reporter": fields.get("reporter", {}).get("displayName"),
-                }
-            })
-        return items
+        if self.cursor:
+            # relative minutes sidestep JQL's site-timezone date parsing; +1m overlap is safe
+            # because ingest upserts by issue key
+            minutes = int((started - datetime.fromisoformat(self.cursor)).total_seconds() // 60) + 1
+            jql_query += f' AND updated >= "-{minutes}m"'
+        jql_query += " ORDER BY updated ASC"
+        start = 0
+        while True:
+            resp = self._call(
+                lambda: jira.jql(jql_query, fields=self.FIELDS, start=start, limit=self.page_size)
+            ) or {}
+            issues = resp.get("issues", [])
+            if issues:
+                yield [self._to_item(site_url, issue) for issue in issues]
+            start += len(issues)
+            if (
+                not issues
+                or start >= resp.get("total", 0)
+                or (not self.cursor and self.backfill_limit and start >= self.backfill_limit)
+            ):
+                break
+        self.next_cursor = started.isoformat()
+
+    @staticmethod
+    def _to_item(site_url: str, issue: Dict[str, Any]) -> Dict[str, Any]:
+        fields = issue.get("fields", {})
+        return {
+            "title": fields.get("summary"),
+            "description": fields.get("description"),
+            "source_ref": issue.get("key"),
+            "source_url": f"{site_url}/browse/{issue.get('key')}",
+            "meta": {
+                "project": (fields.get("project") or {}).get("name"),
+                "status": (fields.get("status") or {}).get("name"),
+                "reporter": (fields.get("reporter") or {}).get("displayName"),
+            }
+        }
 
 
 class GithubConnector(BaseConnector):
     kind = "github"
 
-    def __init__(self, user_id: str, config: Any, access_token: str | None = None):
-        super().__init__(user_id, config, access_token)
+    def __init__(
+        self,
+        user_id: str,
+        config: Any,
+        access_token: str | dict | None = None,
+        cursor: str | None = None,
+    ):
+        super().__init__(user_id, config, access_token, cursor)
         self.client = OAuth2Client(
             client_id=self.config.oauth_github_client_id,
             client_secret=self.config.oauth_github_client_secret,
@@ -273,6 +600,7 @@ class GithubConnector(BaseConnector):
             scope="repo user",
             authorization_endpoint="https://github.com/login/oauth/authorize",
             token_endpoint="https://github.com/login/oauth/access_token",
+            transport=http_pool.transport("github"),
         )
 
     def authorize(self) -> str:
@@ -286,9 +614,9 @@ class GithubConnector(BaseConnector):
             "scopes": token_data.get("scope"),
         }
 
-    def refresh(self) -> None:
+    def refresh(self) -> dict | None:
         # GitHub OAuth tokens do not expire, so no refresh logic is implemented.
-        pass
+        return None
 
     def test(self) -> dict:
         try:
@@ -298,53 +626,69 @@ class GithubConnector(BaseConnector):
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
-    def fetch(self) -> List[Dict[str, Any]]:
+    def fetch_pages(self) -> Iterator[List[Dict[str, Any]]]:
+        started = datetime.now(timezone.utc).replace(microsecond=0)
+        issue_params = {"filter": "assigned", "state": "open", "per_page": min(self.page_size, 100)}
+        pr_query = "is:pr is:open assignee:@me"
+        if self.cursor:
+            since = datetime.fromisoformat(self.cursor).strftime("%Y-%m-%dT%H:%M:%SZ")
+            issue_params["since"] = since
+            pr_query += f" updated:>={since}"
+
         # Fetch assigned issues
-        resp_issues = self.client.get(
-            "https://api.github.com/issues",
-            params={"filter": "assigned", "state": "open"},
-            token={"access_token": self.access_token, "token_type": "bearer"}
-        )
-        resp_issues.raise_for_status()
-        issues = resp_issues.json()
-        
-        items = []
-        for issue in issues:
-            items.append({
-                "title": issue["title"],
-                "description": issue["body"],
-                "source_ref": issue["number"],
-                "source_url": issue["html_url"],
-                "meta": {
-                    "repo": issue["repository"]["full_name"],
-                    "labels": [label["name"] for label in issue["labels"]],
-                    "type": "issue",
-                }
-            })
+        for issues in self._paginate("https://api.github.com/issues", issue_params):
+            if issues:
+                yield [
+                    self._to_item(issue, issue["repository"]["full_name"], "issue")
+                    for issue in issues
+                ]
 
         # Fetch assigned pull requests
-        resp_prs = self.client.get(
-            "https://api.github.com/search/issues",
-            params={"q": "is:pr is:open assignee:@me"},
-            token={"access_token": self.access_token, "token_type": "bearer"}
+        pr_params = {"q": pr_query, "per_page": min(self.page_size, 100)}
+        for resp_json in self._paginate("https://api.github.com/search/issues", pr_params):
+            prs = resp_json.get("items", [])
+            if prs:
+                yield [
+                    self._to_item(pr, pr["repository_url"].split("repos/")[1], "pull_request")
+                    for pr in prs
+                ]
+
+        self.next_cursor = started.isoformat()
+
+    def _get(self, url: str, params: dict | None):
+        resp = self.client.get(
+            url, params=params, token={"access_token": self.access_token, "token_type": "bearer"}
         )
-        resp_prs.raise_for_status()
-        prs = resp_prs.json().get("items", [])
-
-        for pr in prs:
-            items.append({
-                "title": pr["title"],
-                "description": pr["body"],
-                "source_ref": pr["number"],
-                "source_url": pr["html_url"],
-                "meta": {
-                    "repo": pr["repository_url"].split("repos/")[1],
-                    "labels": [label["name"] for label in pr["labels"]],
-                    "type": "pull_request",
-                }
-            })
-            
-        return items
+        resp.raise_for_status()
+        return resp
+
+    def _paginate(self, url: str, params: dict) -> Iterator[Any]:
+        """Follow GitHub's Link: rel="next" headers, yielding each page's JSON body."""
+        seen = 0
+        while url:
+            resp = self._call(lambda: self._get(url, params))
+            body = resp.json()
+            yield body
+            seen += len(body if isinstance(body, list) else body.get("items", []))
+            if not self.cursor and self.backfill_limit and seen >= self.backfill_limit:
+                break
+            url = (getattr(resp, "links", None) or {}).get("next", {}).get("url")
+            params = None  # the next link already carries the query string
+
+    @staticmethod
+    def _to_item(issue: Dict[str, Any], repo: str, kind: str) -> Dict[str, Any]:
+        return {
+            "title": issue["title"],
+            "description": issue["body"],
+            # issue numbers are only unique per repository
+            "source_ref": f"{repo}#{issue['number']}",
+            "source_url": issue["html_url"],
+            "meta": {
+                "repo": repo,
+                "labels": [label["name"] for label in issue["labels"]],
+                "type": kind,
+            }
+        }
 
 
 def get_connector_by_kind(kind: str) -> type[BaseConnector]:
@@ -0,0 +1,164 @@
+"""Decrypted connector credentials: a short-TTL in-process cache plus token refresh.
+
+Connector.access_token holds the whole encrypted token dict (access/refresh token,
+expires_at, scopes, meta). Decrypting it (base64 + AES-GCM + JSON) on every test, fetch
+and ingest is wasted work, so decrypted dicts are cached per connector for
+settings.credential_cache_ttl_s. A cache entry is only used while the row still holds the
+ciphertext it was decrypted from, so any write (here, the OAuth callback, another process)
+invalidates it without coordination.
+
+Tokens are refreshed ahead of Connector.expires_at, by the beat-driven
+refresh_expiring_credentials task and, as a fallback, just before a sync, so syncs never
+start with a token that is about to be rejected.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services import crypto
+from app.services.connectors.base import get_connector_by_kind
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger("mimir")
+
+_cache: Dict[Any, Tuple[str, float, dict]] = {}
+_lock = threading.Lock()
+
+
+def expires_at(token_data: dict) -> datetime | None:
+    value = token_data.get("expires_at")
+    if not isinstance(value, str):
+        return None  # unknown (older Jira rows stored expires_in seconds here)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # google-auth reports naive UTC expiries
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def load(conn: models.Connector) -> dict | None:
+    """Decrypted token dict for `conn`, from the cache while the row's ciphertext is unchanged."""
+    blob = conn.access_token
+    if not blob:
+        return None
+    now = time.monotonic()
+    hit = _cache.get(conn.id)
+    if hit and hit[0] == blob and hit[1] > now:
+        return dict(hit[2])
+    data = crypto.decrypt_token(blob)
+    with _lock:
+        _cache[conn.id] = (blob, now + settings.credential_cache_ttl_s, data)
+    return dict(data)
+
+
+def store(conn: models.Connector, token_data: dict) -> None:
+    """Encrypt `token_data` onto `conn` (caller commits) and replace the cached copy."""
+    blob = crypto.encrypt(json.dumps(token_data))
+    conn.access_token = blob
+    conn.expires_at = expires_at(token_data)
+    with _lock:
+        _cache[conn.id] = (
+            blob,
+            time.monotonic() + settings.credential_cache_ttl_s,
+            dict(token_data),
+        )
+
+
+def invalidate(conn_id=None) -> None:
+    with _lock:
+        if conn_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(conn_id, None)
+
+
+def needs_refresh(token_data: dict, within_s: float) -> bool:
+    expiry = expires_at(token_data)
+    return (
+        bool(token_data.get("refresh_token"))
+        and expiry is not None
+        and expiry - datetime.now(timezone.utc) <= timedelta(seconds=within_s)
+    )
+
+
+def _refresh_lock(conn_id):
+    """Per-connector lock across processes: refresh tokens may rotate, so one refresh at a time."""
+    try:
+        r = get_redis()
+        key = f"mimir:credrefresh:{conn_id}"
+        if not r.set(key, 1, nx=True, ex=60):
+            return None
+        return lambda: r.delete(key)
+    except Exception:
+        return lambda: None  # no Redis: fall back to refreshing in this process only
+
+
+def refresh(db: Session, conn: models.Connector) -> dict | None:
+    """Refresh `conn`'s access token now and commit it. Returns the credentials to use."""
+    token_data = load(conn)
+    if not token_data:
+        return token_data
+    release = _refresh_lock(conn.id)
+    if release is None:  # another process is refreshing this connector right now
+        return token_data
+    try:
+        connector = get_connector_by_kind(conn.kind)(
+            user_id=str(conn.user_id), config=settings, access_token=token_data
+        )
+        new = connector.refresh()
+        if not new:
+            return token_data
+        token_data = {**token_data, **new}
+        store(conn, token_data)
+        db.add(conn)
+        # commit straight away: a rotated refresh token must not be lost to a later rollback
+        db.commit()
+        return token_data
+    finally:
+        release()
+
+
+def for_connector(db: Session, conn: models.Connector) -> dict | None:
+    """Credentials for an API call, refreshed first if they expire within the refresh margin."""
+    token_data = load(conn)
+    if token_data and needs_refresh(token_data, settings.token_refresh_margin_s):
+        try:
+            token_data = refresh(db, conn)
+        except Exception as e:
+            logger.warning(f"token refresh for {conn.kind} connector {conn.id} failed: {e}")
+    return token_data
+
+
+def refresh_expiring(db: Session) -> int:
+    """Refresh every connected connector whose token expires within the lookahead window."""
+    horizon = datetime.now(timezone.utc) + timedelta(seconds=settings.token_refresh_lookahead_s)
+    expiring = (
+        db.query(models.Connector)
+        .filter(
+            models.Connector.status == "connected",
+            models.Connector.access_token.isnot(None),
+            models.Connector.expires_at.isnot(None),
+            models.Connector.expires_at <= horizon,
+        )
+        .all()
+    )
+    refreshed = 0
+    for conn in expiring:
+        try:
+            before = conn.access_token
+            refresh(db, conn)
+            refreshed += conn.access_token != before
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"token refresh for {conn.kind} connector {conn.id} failed: {e}")
+            conn.status_message = f"token refresh failed: {e}"
+            db.add(conn)
+            db.commit()
+    return refreshed
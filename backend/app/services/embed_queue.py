@@ -0,0 +1,209 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Sequence, Tuple
+from collections import defaultdict
+import json
+import logging
+import time
+import uuid
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services.embeddings import embed_batch, embed_texts
+from app.services.redis_client import get_redis, redis_available
+
+logger = logging.getLogger("mimir")
+
+# Redis list holding JSON embedding work items from every user/job, flushed by the embed_items task.
+PENDING_KEY = "mimir:embed:pending"
+# Items leased by one running flush (per claim id), and the lease expiry of every open claim.
+PROCESSING_KEY = "mimir:embed:processing:{}"
+CLAIMS_KEY = "mimir:embed:claims"
+# Items that failed settings.embed_max_attempts flushes.
+DEAD_KEY = "mimir:embed:dead"
+# Set while a deadline flush is scheduled so concurrent producers don't schedule duplicates.
+FLUSH_SCHEDULED_KEY = "mimir:embed:flush_scheduled"
+
+
+def make_item(
+    user_id,
+    kind: str,
+    task_id,
+    text: str,
+    vector: List[float] | None = None,
+    provider: str | None = None,
+) -> Dict[str, Any]:
+    return {
+        "user_id": str(user_id),
+        "kind": kind,
+        "task_id": str(task_id),
+        "text": text,
+        "vector": vector,
+        "provider": provider,
+    }
+
+
+def _schedule_flush(pending: int) -> None:
+    from app.worker import celery_app
+
+    if pending >= settings.embed_flush_size:
+        celery_app.send_task("embed_items", queue="embed")
+    elif pending and get_redis().set(
+        FLUSH_SCHEDULED_KEY, 1, nx=True, ex=max(1, int(settings.embed_flush_deadline_s * 4))
+    ):
+        celery_app.send_task(
+            "embed_items", queue="embed", countdown=settings.embed_flush_deadline_s
+        )
+
+
+def enqueue(items: List[Dict[str, Any]]) -> None:
+    """Buffer items for the embed worker; flushed when the buffer is full or at the deadline."""
+    if not items:
+        return
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.rpush(PENDING_KEY, *[json.dumps(it) for it in items])
+    pipe.llen(PENDING_KEY)
+    _, pending = pipe.execute()
+    _schedule_flush(pending)
+
+
+def claim(max_items: int) -> Tuple[str, List[bytes]]:
+    """Lease up to max_items payloads from the buffer for one flush; returns (claim_id, payloads).
+
+    The payloads move to their own PROCESSING_KEY list and the claim is recorded in CLAIMS_KEY
+    with an expiry (settings.embed_claim_lease_s). finish() releases it; if the flush dies
+    first, recover_expired() hands the payloads back to the buffer.
+    """
+    r = get_redis()
+    claim_id = uuid.uuid4().hex
+    r.zadd(CLAIMS_KEY, {claim_id: time.time() + settings.embed_claim_lease_s})
+    pipe = r.pipeline(transaction=False)
+    for _ in range(max_items):
+        pipe.lmove(PENDING_KEY, PROCESSING_KEY.format(claim_id), "LEFT", "RIGHT")
+    claimed = [raw for raw in pipe.execute() if raw is not None]
+    if not claimed:
+        r.zrem(CLAIMS_KEY, claim_id)
+    return claim_id, claimed
+
+
+def _retry_or_bury(pipe, raw: bytes) -> None:
+    # failed items go to the back of the buffer, so one bad batch can't hold up the rest;
+    # after settings.embed_max_attempts they are parked in DEAD_KEY for inspection
+    item = json.loads(raw)
+    item["attempts"] = item.get("attempts", 0) + 1
+    key = DEAD_KEY if item["attempts"] >= settings.embed_max_attempts else PENDING_KEY
+    pipe.rpush(key, json.dumps(item))
+
+
+def finish(claim_id: str, failed: Sequence[bytes] = ()) -> None:
+    """Release a claim once its rows are committed; `failed` payloads are retried or buried."""
+    pipe = get_redis().pipeline()  # MULTI/EXEC: the claim and its retries go together
+    for raw in failed:
+        _retry_or_bury(pipe, raw)
+    pipe.delete(PROCESSING_KEY.format(claim_id))
+    pipe.zrem(CLAIMS_KEY, claim_id)
+    pipe.execute()
+
+
+def recover_expired() -> int:
+    """Return payloads of claims whose lease ran out (a crashed or killed flush) to the buffer."""
+    r = get_redis()
+    recovered = 0
+    for claim_id in r.zrangebyscore(CLAIMS_KEY, "-inf", time.time()):
+        claim_id = claim_id.decode() if isinstance(claim_id, bytes) else claim_id
+        if not r.zrem(CLAIMS_KEY, claim_id):
+            continue  # another flush recovered it first
+        key = PROCESSING_KEY.format(claim_id)
+        while r.lmove(key, PENDING_KEY, "LEFT", "RIGHT") is not None:
+            recovered += 1
+    if recovered:
+        logger.warning("embed queue: recovered %d items from expired claims", recovered)
+    return recovered
+
+
+def split_by_owner(claimed: List[bytes]) -> List[List[bytes]]:
+    """Payloads grouped by (user, provider), so a failing flush can be retried part by part."""
+    groups: Dict[tuple, List[bytes]] = defaultdict(list)
+    for raw in claimed:
+        item = json.loads(raw)
+        groups[(item["user_id"], item.get("provider") or "default")].append(raw)
+    return list(groups.values())
+
+
+def reschedule() -> None:
+    """After a flush: clear the deadline marker and schedule the next flush if work remains."""
+    r = get_redis()
+    r.delete(FLUSH_SCHEDULED_KEY)
+    _schedule_flush(r.llen(PENDING_KEY))
+
+
+def _publish_pending(session: Session) -> None:
+    items = session.info.pop("embed_pending", None)
+    if not items:
+        return
+    try:
+        enqueue(items)
+    except Exception as e:  # pragma: no cover - broker went away after commit
+        print(f"Failed to enqueue {len(items)} embedding items: {e}")
+
+
+def _discard_pending(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:  # outermost rollback; savepoint rollbacks keep the rest
+        session.info.pop("embed_pending", None)
+
+
+def submit(db: Session, items: List[Dict[str, Any]]) -> None:
+    """Hand embedding work to the embed queue once db commits, or write inline without Redis."""
+    if not items:
+        return
+    if not redis_available():
+        write_embeddings(db, items)
+        return
+    # only publish work for tasks that were actually committed
+    if not db.info.get("embed_hooks"):
+        event.listen(db, "after_commit", _publish_pending)
+        event.listen(db, "after_soft_rollback", _discard_pending)
+        db.info["embed_hooks"] = True
+    db.info.setdefault("embed_pending", []).extend(items)
+
+
+def write_embeddings(db: Session, items: List[Dict[str, Any]]) -> int:
+    """Embed (if needed) and store a micro-batch that may span users and jobs.
+
+    Items without a precomputed vector are embedded in a single call; vectors go to each user's
+    Chroma collection and the Embedding rows are inserted with one executemany.
+    """
+    if not items:
+        return 0
+    missing = [it for it in items if not it.get("vector")]
+    if missing:
+        vectors, provider = embed_batch([it["text"] for it in missing])
+        for it, vec in zip(missing, vectors, strict=True):
+            it["vector"] = vec
+            it["provider"] = provider
+    groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for it in items:
+        groups[(it["user_id"], it.get("provider") or "default")].append(it)
+    for (user_id, provider), group in groups.items():
+        embed_texts(
+            [it["text"] for it in group],
+            [{"user_id": user_id, "kind": it["kind"], "task_id": it["task_id"]} for it in group],
+            [it["task_id"] for it in group],
+            vectors=[it["vector"] for it in group],
+            provider=provider,
+        )
+    db.execute(
+        insert(models.Embedding),
+        [
+            {
+                "user_id": it["user_id"],
+                "source_kind": it["kind"],
+                "source_id": it["task_id"],
+                "vector_id": it["task_id"],
+                "meta": {"task_id": it["task_id"], "provider": it.get("provider") or "default"},
+            }
+            for it in items
+        ],
+    )
+    return len(items)
@@ -1,12 +1,35 @@
 from __future__ import annotations
 from typing import List, Dict, Any
 import chromadb  # type: ignore
-from chromadb.utils import embedding_functions  # type: ignore
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2  # type: ignore
 from app.config import settings
 from litellm import embedding as litellm_embedding  # type: ignore
+from collections import Counter
+from functools import cached_property
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
 import uuid
+import numpy as np
+from prometheus_client import Counter as MetricCounter
+
+logger = logging.getLogger("mimir")
+
+CACHE_EVENTS = MetricCounter(
+    "mimir_embedding_cache_events_total", "Embedding cache lookups, evictions and errors", ["event"]
+)
 
 _client = None
+_cache = None
+_embedder = None
+_embedder_lock = threading.Lock()
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # model behind chroma's DefaultEmbeddingFunction
+# provider recorded for vectors the default model produced because Bedrock failed
+FALLBACK_PROVIDER = "fallback_default"
 
 
 def get_client():
@@ -21,13 +44,16 @@ def get_client():
     return _client
 
 
-def _collection_name(user_id: str) -> str:
-    return f"user_{user_id}".replace("-", "")
+def _collection_name(user_id: str, provider: str | None = None) -> str:
+    name = f"user_{user_id}".replace("-", "")
+    # vectors the configured provider didn't produce (Bedrock failed over to the local model)
+    # live in their own collection, so no collection or similarity query mixes vector spaces
+    return f"{name}_{FALLBACK_PROVIDER}" if provider == FALLBACK_PROVIDER else name
 
 
-def ensure_collection(user_id: str):
+def ensure_collection(user_id: str, provider: str | None = None):
     client = get_client()
-    name = _collection_name(user_id)
+    name = _collection_name(user_id, provider)
     try:
         col = client.get_collection(name)
     except Exception:
@@ -35,51 +61,308 @@ def ensure_collection(user_id: str):
     return col
 
 
+class LocalEmbedder(ONNXMiniLM_L6_V2):
+    """Chroma's default MiniLM model with tunable ONNX threads/batch size and load/throughput stats.
+
+    Built once per process (see get_embedder) so the ONNX session is not reloaded per call.
+    """
+
+    def __init__(self, intra_op_threads: int = 0, batch_size: int = 32):
+        super().__init__()
+        self.intra_op_threads = intra_op_threads
+        self.batch_size = batch_size
+        self.stats: Counter = Counter()
+
+    @cached_property
+    def model(self):  # type: ignore[override]
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads:
+            so.intra_op_num_threads = self.intra_op_threads
+        return self.ort.InferenceSession(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+            providers=self._preferred_providers or self.ort.get_available_providers(),
+            sess_options=so,
+        )
+
+    def load(self) -> float:
+        """Download (if needed) and open the tokenizer + ONNX session; returns seconds taken."""
+        start = time.perf_counter()
+        self._download_model_if_not_exists()
+        self.tokenizer, self.model  # noqa: B018 - materialise cached properties
+        elapsed = time.perf_counter() - start
+        self.stats["load_ms"] = round(elapsed * 1000)
+        logger.info(
+            f"embedding model {self.MODEL_NAME} loaded in {elapsed * 1000:.0f}ms "
+            f"(threads={self.intra_op_threads or 'auto'})"
+        )
+        return elapsed
+
+    def __call__(self, input):  # type: ignore[override]
+        start = time.perf_counter()
+        vectors = self._forward(list(input), batch_size=self.batch_size)
+        elapsed = time.perf_counter() - start
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(input)
+        self.stats["embed_ms"] += round(elapsed * 1000)
+        logger.info(
+            f"embedded {len(input)} texts in {elapsed * 1000:.0f}ms "
+            f"({len(input) / max(elapsed, 1e-6):.0f}/s)"
+        )
+        return [np.asarray(v, dtype=np.float32) for v in vectors]
+
+
+def get_embedder() -> LocalEmbedder:
+    """Process-wide local embedder, built and loaded on first use (thread-safe)."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                emb = LocalEmbedder(
+                    settings.embedding_intra_op_threads, settings.embedding_batch_size
+                )
+                emb.load()
+                _embedder = emb
+    return _embedder
+
+
+def warm_embedder() -> None:
+    """Load the local model ahead of the first ingest (called when a worker process boots)."""
+    get_embedder()([" "])
+
+
 def _default_embedding_fn():
-    return embedding_functions.DefaultEmbeddingFunction()
+    return get_embedder()
+
+
+def _bedrock_model() -> str:
+    # Expect settings.litellm_provider like "bedrock/amazon.titan-embed-text-v2"
+    return (
+        settings.litellm_provider.split("/", 1)[1]
+        if settings.litellm_provider and "/" in settings.litellm_provider
+        else "amazon.titan-embed-text-v2"
+    )
 
 
 def _bedrock_embed(texts: List[str]) -> List[List[float]]:
     # Use litellm to call bedrock embedding model; model name can be configured via litellm_provider or separate var
-    # Expect settings.litellm_provider like "bedrock/amazon.titan-embed-text-v2"
-    model = settings.litellm_provider.split("/", 1)[1] if settings.litellm_provider and "/" in settings.litellm_provider else "amazon.titan-embed-text-v2"
-    resp = litellm_embedding(model=model, input=texts)  # type: ignore
+    resp = litellm_embedding(model=_bedrock_model(), input=texts)  # type: ignore
     # litellm embedding responses unify into 'data' list with 'embedding'
     vectors: List[List[float]] = [d["embedding"] for d in resp["data"]]  # type: ignore
     return vectors
 
 
-def embed_texts(texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> list[str]:
+def _default_embed(texts: List[str]) -> List[List[float]]:
+    return _default_embedding_fn()(texts)  # type: ignore
+
+
+def _as_lists(vectors) -> List[List[float]]:
+    # DefaultEmbeddingFunction yields numpy arrays; keep plain floats so vectors stay serialisable
+    return [[float(x) for x in v] for v in vectors]
+
+
+def _normalise_text(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class EmbeddingCache:
+    """Content-addressed vector cache keyed by (provider, model, sha256(normalised text)).
+
+    Backed by SQLite so it survives worker restarts and is shared by processes on the same
+    host (settings.embedding_cache_path); falls back to an in-memory database. Entries are
+    evicted least-recently-used once the table grows past max_entries, checked every
+    max_entries / 20 writes rather than on each one. The cache fails open: SQLite errors
+    (e.g. "database is locked" under a shared path) count as misses and skipped writes.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._evict_every = max(1, max_entries // 20)
+        self._unchecked = 0
+        self._conn = sqlite3.connect(
+            path or ":memory:", check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            " key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL,"
+            " vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used ON embedding_cache (last_used)"
+        )
+
+    @staticmethod
+    def key(provider: str, model: str, text: str) -> str:
+        digest = hashlib.sha256(_normalise_text(text).encode()).hexdigest()
+        return f"{provider}:{model}:{digest}"
+
+    def get_many(self, provider: str, model: str, texts: List[str]) -> List[List[float] | None]:
+        keys = [self.key(provider, model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        try:
+            with self._lock:
+                for i in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                    chunk = unique[i : i + 500]
+                    marks = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embedding_cache WHERE key IN ({marks})", chunk
+                    ).fetchall()
+                    for k, blob in rows:
+                        found[k] = np.frombuffer(blob, dtype=np.float32).tolist()
+                    if rows:
+                        self._conn.execute(
+                            f"UPDATE embedding_cache SET last_used = ? WHERE key IN ({marks})",
+                            [time.time(), *chunk],
+                        )
+        except sqlite3.Error as e:
+            logger.warning(
+                f"embedding cache read failed, treating {len(keys)} texts as misses: {e}"
+            )
+            self._bump("errors")
+            found = {}
+        out = [found.get(k) for k in keys]
+        hits = sum(1 for v in out if v is not None)
+        self._bump("hits", hits)
+        self._bump("misses", len(out) - hits)
+        return out
+
+    def put_many(
+        self, provider: str, model: str, texts: List[str], vectors: List[List[float]]
+    ) -> None:
+        now = time.time()
+        rows = [
+            (
+                self.key(provider, model, t),
+                provider,
+                model,
+                np.asarray(v, dtype=np.float32).tobytes(),
+                now,
+            )
+            for t, v in zip(texts, vectors, strict=True)
+        ]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._unchecked += len(rows)
+                if self._unchecked >= self._evict_every:
+                    self._unchecked = 0
+                    self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"embedding cache write failed, skipping {len(rows)} vectors: {e}")
+            self._bump("errors")
+
+    def _evict(self) -> None:
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+        overflow = size - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._bump("evictions", overflow)
+
+    def _bump(self, event: str, n: int = 1) -> None:
+        """Count into self.stats and the process's Prometheus counter."""
+        self.stats[event] += n
+        CACHE_EVENTS.labels(event).inc(n)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+        self.stats.clear()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_max_entries)
+    return _cache
+
+
+def cache_stats() -> Dict[str, int]:
+    cache = get_cache()
+    counts = {event: cache.stats[event] for event in ("hits", "misses", "evictions", "errors")}
+    return {**counts, "size": cache.size()}
+
+
+def _cached_embed(provider: str, model: str, texts: List[str], embed_fn) -> List[List[float]]:
+    """Vectors for texts, calling embed_fn only for texts not already cached for this model."""
+    try:
+        cache = get_cache()
+    except sqlite3.Error as e:  # e.g. the shared cache file can't be opened
+        logger.warning(f"embedding cache unavailable: {e}")
+        return _as_lists(embed_fn(texts))
+    vectors = cache.get_many(provider, model, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors, strict=True) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _as_lists(embed_fn(missing)), strict=True))
+        cache.put_many(provider, model, missing, [fresh[t] for t in missing])
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors, strict=True)]
+    return vectors  # type: ignore[return-value]
+
+
+def embed_batch(texts: List[str]) -> tuple[List[List[float]], str]:
+    """Embed a batch of texts with the configured provider in a single call.
+
+    Vectors are served from the content-hash cache where possible; only misses reach the model.
+    Returns (vectors, provider) where provider records which backend actually produced
+    the vectors (the configured one, or FALLBACK_PROVIDER if Bedrock failed). On fallback the
+    whole batch is taken from the default model so one batch never mixes vector spaces, and
+    the provider routes its vectors to a separate collection (see _collection_name).
+    """
+    if not texts:
+        return [], settings.litellm_provider or "default"
+    provider = settings.litellm_provider or ""
+    if provider.startswith("bedrock"):
+        try:
+            return _cached_embed("bedrock", _bedrock_model(), texts, _bedrock_embed), provider
+        except Exception:
+            # fallback
+            return _cached_embed(
+                "default", DEFAULT_EMBEDDING_MODEL, texts, _default_embed
+            ), FALLBACK_PROVIDER
+    return _cached_embed(
+        "default", DEFAULT_EMBEDDING_MODEL, texts, _default_embed
+    ), provider or "default"
+
+
+def embed_texts(
+    texts: List[str],
+    metadatas: List[Dict[str, Any]],
+    ids: List[str],
+    vectors: List[List[float]] | None = None,
+    provider: str | None = None,
+) -> list[str]:
     """Embed a list of texts for a single user and source-kind context.
 
     metadatas requires: user_id, kind in each item
+    vectors/provider may be passed when the batch was already embedded (e.g. during dedupe)
+    so each text is only embedded once.
     """
     if not texts:
         return []
     user_id = metadatas[0].get("user_id")
     if not user_id:
         raise ValueError("user_id required in meta for embedding")
-    col = ensure_collection(user_id)
-    provider = settings.litellm_provider or ""
-    vectors: List[List[float]]
-    meta_provider = None
-    if provider.startswith("bedrock"):
-        try:
-            vectors = _bedrock_embed(texts)
-            meta_provider = provider
-        except Exception:
-            # fallback
-            emb_fn = _default_embedding_fn()
-            vectors = emb_fn(texts)  # type: ignore
-            meta_provider = "fallback_default"
-    else:
-        emb_fn = _default_embedding_fn()
-        vectors = emb_fn(texts)  # type: ignore
-        meta_provider = provider or "default"
-    
+    if vectors is None:
+        vectors, provider = embed_batch(texts)
+    col = ensure_collection(user_id, provider)
+
     # add provider to each metadata dict
     for m in metadatas:
-        m["provider"] = meta_provider
+        m["provider"] = provider or "default"
 
     col.add(ids=ids, documents=texts, embeddings=vectors, metadatas=metadatas)
     return ids
@@ -100,3 +383,35 @@ def find_similar(user_id: str, text: str, top_k: int = 3) -> List[Dict[str, Any]
     except Exception:
         return []
 
+
+def find_similar_batch(
+    user_id: str, vectors: List[List[float]], top_k: int = 1, provider: str | None = None
+) -> List[List[Dict[str, Any]]]:
+    """Nearest neighbours for many query vectors in one Chroma round trip.
+
+    `provider` is the one embed_batch reported for the vectors, so they are only compared
+    with vectors from the same model. Returns one result list per query vector (empty lists
+    if the query fails).
+    """
+    if not vectors:
+        return []
+    col = ensure_collection(user_id, provider)
+    try:
+        res = col.query(query_embeddings=vectors, n_results=top_k)
+    except Exception:
+        return [[] for _ in vectors]
+    ids = res.get("ids") or []
+    distances = res.get("distances") or []
+    metadatas = res.get("metadatas") or []
+    out: List[List[Dict[str, Any]]] = []
+    for q in range(len(vectors)):
+        q_ids = ids[q] if q < len(ids) else []
+        out.append([
+            {
+                "id": q_ids[i],
+                "distance": distances[q][i] if q < len(distances) else None,
+                "metadata": metadatas[q][i] if q < len(metadatas) and metadatas[q] else None,
+            }
+            for i in range(len(q_ids))
+        ])
+    return out
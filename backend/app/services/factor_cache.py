@@ -0,0 +1,77 @@
+"""Redis cache of LLM priority factors, keyed by task content and model.
+
+An entry's key is a hash of the task fields the scoring prompt is built from (title,
+description, due date, source) plus the model id, so reprioritising an unchanged task never
+goes back to the model, and changing the model or any of those fields misses naturally.
+The prompt also shows the current horizon, but it is left out of the key: the prioritiser
+writes escalated horizons back, and keying on them would make every escalation miss on
+the next refresh. Entries expire after settings.factor_cache_ttl_s. Task edits also drop the entry
+for the old content explicitly (see prioritise._collect_edited_tasks). Recency is not
+cached: it is the one factor that only depends on the clock, so hits take it from the
+heuristic. Every operation fails open: with Redis down, tasks are simply scored again.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from app.config import settings
+from app.services.redis_client import get_redis
+
+KEY = "mimir:factors:{}"
+CONTENT_FIELDS = ("title", "description", "due_date", "source_kind", "source_ref")
+
+
+def content_key(values: Dict[str, Any], model: str) -> str:
+    """Cache key for a task's prompt content (a CONTENT_FIELDS -> value mapping)."""
+    parts = [model]
+    for name in CONTENT_FIELDS:
+        value = values.get(name)
+        parts.append(str(value.value if hasattr(value, "value") else value or ""))
+    return KEY.format(hashlib.sha1("\x1f".join(parts).encode()).hexdigest())
+
+
+def task_key(task, model: str) -> str:
+    return content_key({name: getattr(task, name, None) for name in CONTENT_FIELDS}, model)
+
+
+def get_many(tasks: Sequence[Any], model: str) -> List[dict | None]:
+    """Cached factors (without recency) for each of `tasks`, None where there is no entry."""
+    if not tasks:
+        return []
+    try:
+        values = get_redis().mget([task_key(t, model) for t in tasks])
+    except Exception:
+        return [None] * len(tasks)
+    hits: List[dict | None] = []
+    for raw in values:
+        try:
+            hits.append(json.loads(raw) if raw is not None else None)
+        except ValueError:
+            hits.append(None)
+    return hits
+
+
+def put_many(scored: Iterable[Tuple[Any, dict]], model: str) -> None:
+    """Cache model-produced factors for (task, factors) pairs."""
+    scored = list(scored)
+    if not scored:
+        return
+    ttl = settings.factor_cache_ttl_s
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for task, factors in scored:
+            entry = {k: v for k, v in factors.items() if k != "recency"}
+            pipe.set(task_key(task, model), json.dumps(entry), ex=ttl)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def invalidate(keys: Iterable[str]) -> None:
+    keys = list(keys)
+    if not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception:
+        pass
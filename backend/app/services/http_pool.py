@@ -0,0 +1,185 @@
+"""Per-process keep-alive HTTP pools shared by every connector instance.
+
+Connectors are short-lived (one per fetch or OAuth callback), so giving each its own
+client meant a fresh TCP+TLS handshake per call. Instead each provider gets one pool per
+process: an httpx transport (HTTP/2 through the httpx[http2] extra, HTTP/1.1 if h2 is
+missing) for the authlib OAuth2Client users, and a urllib3-backed requests adapter for
+libraries built on requests (atlassian).
+Both pools are keyed by host internally, so one per provider covers all of its hosts.
+"""
+from __future__ import annotations
+import os
+import threading
+from typing import Dict
+import httpx
+import requests
+from prometheus_client import Counter, Gauge
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from app.config import settings
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+POOL_REQUESTS = Counter(
+    "mimir_http_pool_requests_total", "Requests sent through a shared provider pool", ["provider"]
+)
+POOL_CONNECTIONS = Counter(
+    "mimir_http_pool_connections_total",
+    "New connections opened by a shared provider pool",
+    ["provider"],
+)
+POOL_REUSE = Gauge(
+    "mimir_http_pool_reuse_ratio", "Share of pooled requests that reused a connection", ["provider"]
+)
+
+_lock = threading.Lock()
+_transports: Dict[str, "PooledTransport"] = {}
+_adapters: Dict[str, "PooledAdapter"] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _reuse_rate(stats: Dict[str, int]) -> float:
+    return round(1 - stats["connections"] / stats["requests"], 4) if stats["requests"] else 0.0
+
+
+def _count(provider: str, field: str) -> None:
+    with _lock:
+        stats = _stats.setdefault(provider, {"requests": 0, "connections": 0})
+        stats[field] += 1
+        reuse = _reuse_rate(stats)
+    (POOL_REQUESTS if field == "requests" else POOL_CONNECTIONS).labels(provider).inc()
+    POOL_REUSE.labels(provider).set(reuse)
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """Shared httpx transport; clients closing it must not tear the pool down."""
+
+    def __init__(self, provider: str):
+        super().__init__(
+            http2=settings.http_pool_http2 and _HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.http_pool_max_connections,
+                max_keepalive_connections=settings.http_pool_max_keepalive,
+                keepalive_expiry=settings.http_pool_keepalive_expiry_s,
+            ),
+        )
+        self.provider = provider
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        outer = request.extensions.get("trace")
+
+        def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.complete":
+                _count(self.provider, "connections")
+            if outer is not None:
+                outer(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        _count(self.provider, "requests")
+        return super().handle_request(request)
+
+    # httpx.Client.close() and `with Client(...)` both end up here
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+class PooledAdapter(HTTPAdapter):
+    """Shared requests adapter whose urllib3 pools report each new connection."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        super().__init__(
+            pool_connections=settings.http_pool_max_hosts,
+            pool_maxsize=settings.http_pool_max_connections,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        provider = self.provider
+
+        def counting(pool_cls):
+            def _new_conn(pool):
+                _count(provider, "connections")
+                return pool_cls._new_conn(pool)
+            return type(pool_cls.__name__, (pool_cls,), {"_new_conn": _new_conn})
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": counting(HTTPConnectionPool),
+            "https": counting(HTTPSConnectionPool),
+        }
+
+    def send(self, request, **kwargs):
+        _count(self.provider, "requests")
+        return super().send(request, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+def transport(provider: str) -> PooledTransport:
+    """Shared httpx transport for `provider`; pass as OAuth2Client(transport=...)."""
+    t = _transports.get(provider)
+    if t is None:
+        with _lock:
+            t = _transports.get(provider)
+            if t is None:
+                t = _transports[provider] = PooledTransport(provider)
+    return t
+
+
+def session(provider: str) -> requests.Session:
+    """New requests.Session (own auth/headers) whose connections come from the shared pool."""
+    adapter = _adapters.get(provider)
+    if adapter is None:
+        with _lock:
+            adapter = _adapters.get(provider)
+            if adapter is None:
+                adapter = _adapters[provider] = PooledAdapter(provider)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def pool_stats() -> Dict[str, Dict[str, float]]:
+    """Requests, new connections and connection reuse rate per provider since process start."""
+    with _lock:
+        return {provider: {**s, "reuse_rate": _reuse_rate(s)} for provider, s in _stats.items()}
+
+
+def reset() -> None:
+    """Close and drop every pool; the next use rebuilds them."""
+    with _lock:
+        pools = [*_transports.values(), *_adapters.values()]
+        _transports.clear()
+        _adapters.clear()
+    for pool in pools:
+        try:
+            pool.shutdown()
+        except Exception:
+            pass
+
+
+def _after_fork() -> None:
+    # a prefork worker child inherits the parent's sockets and maybe a held lock: start clean
+    global _lock
+    _lock = threading.Lock()
+    _transports.clear()
+    _adapters.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
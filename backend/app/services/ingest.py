@@ -1,31 +1,48 @@
 from __future__ import annotations
 from typing import List, Dict, Any
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import re
+import threading
+import time
+import uuid
+import numpy as np
 from app import models
-from app.services.embeddings import embed_texts, find_similar
+from app.services.embeddings import embed_batch, find_similar_batch
+from app.services import credentials, embed_queue, prioritise, rate_limit
 from app.config import settings
 from app.services.connectors.base import get_connector_by_kind
+from app.services.pipeline import Batch, Pipeline, PipelineRun, Stage
+
+logger = logging.getLogger("mimir")
 
 
 def normalise_items(user_id, kind: str, raw_items: List[Dict[str, Any]]):
     """Convert provider raw items to internal Task creation dicts.
 
-    Expected raw item keys (provider stubs should adapt):
-        id, title, snippet, url, due (optional ISO date)
+    Expected raw item keys (connectors emit the first form; older stubs the second):
+        title, description|snippet, source_ref|id, source_url|url, due (optional ISO date)
     """
     tasks: list[dict] = []
     for r in raw_items:
+        ref = r.get("source_ref") or r.get("id")
         tasks.append(
             {
                 "user_id": user_id,
                 "title": r.get("title") or r.get("subject") or "Untitled",
-                "description": r.get("snippet"),
+                "description": r.get("description") or r.get("snippet"),
                 "horizon": models.HorizonEnum.week,  # initial guess
                 "status": models.StatusEnum.todo,
                 "source_kind": kind,
-                "source_ref": r.get("id"),
-                "source_url": r.get("url"),
+                "source_ref": str(ref) if ref is not None else None,
+                "source_url": r.get("source_url") or r.get("url"),
                 "due_date": _parse_date(r.get("due")),
             }
         )
@@ -41,78 +58,503 @@ def _parse_date(val):
         return None
 
 
-def dedupe_new(db: Session, user_id, tasks: list[dict]):
+def _normalise_title(title: str | None) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", (title or "").lower()).strip()
+
+
+def _batch_duplicates(
+    tasks: list[dict], vectors: list[list[float]], block: int = 1024
+) -> np.ndarray:
+    """Flag candidates that repeat an earlier candidate in the same batch.
+
+    A candidate is a duplicate if an earlier one has the same (source_kind, source_ref), the same
+    normalised title, or a title embedding with cosine similarity >=
+    settings.dedupe_batch_similarity. The first member of each cluster is kept. Similarity is
+    computed as a row-blocked matrix product so the work is a fixed number of vectorised ops
+    per block of rows.
+    """
+    n = len(tasks)
+    dup = np.zeros(n, dtype=bool)
+    if n < 2:
+        return dup
+    # exact matches: anything that is not the first occurrence of its key
+    for keys in (
+        [
+            f"{t['source_kind']}\x00{t['source_ref']}" if t.get("source_ref") else f"\x01{i}"
+            for i, t in enumerate(tasks)
+        ],
+        [_normalise_title(t.get("title")) or f"\x01{i}" for i, t in enumerate(tasks)],
+    ):
+        _, first = np.unique(np.asarray(keys, dtype=object), return_index=True)
+        is_first = np.zeros(n, dtype=bool)
+        is_first[first] = True
+        dup |= ~is_first
+    # near matches: cosine similarity against earlier rows only (strict upper triangle)
+    mat = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    mat = mat / np.where(norms == 0, 1.0, norms)
+    threshold = settings.dedupe_batch_similarity
+    cols = np.arange(n)
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        sim = mat[rows] @ mat.T
+        hits = (sim >= threshold) & (cols[None, :] > rows[:, None])
+        dup |= hits.any(axis=0)
+    return dup
+
+
+def _ref_key(t: dict) -> tuple | None:
+    return (t["source_kind"], t["source_ref"]) if t.get("source_ref") else None
+
+
+def known_refs(db: Session, user_id, tasks: list[dict]) -> set[tuple]:
+    """Which of this batch's (source_kind, source_ref) keys the user already has.
+
+    Looks up only the batch's own keys through the (user_id, source_kind, source_ref) unique
+    index, so the cost follows the batch size rather than the user's whole history.
+    """
+    keys = list({k for k in map(_ref_key, tasks) if k})
+    found: set[tuple] = set()
+    for i in range(0, len(keys), 500):
+        chunk = keys[i : i + 500]
+        by_kind: dict[str, list[str]] = {}
+        for kind, ref in chunk:
+            by_kind.setdefault(kind, []).append(ref)
+        rows = (
+            db.query(models.Task.source_kind, models.Task.source_ref)
+            .filter(models.Task.user_id == user_id)
+            .filter(
+                or_(
+                    *[
+                        and_(models.Task.source_kind == k, models.Task.source_ref.in_(refs))
+                        for k, refs in by_kind.items()
+                    ]
+                )
+            )
+            .all()
+        )
+        found.update((k, r) for k, r in rows)
+    return found
+
+
+def dedupe_new(db: Session, user_id, tasks: list[dict], known: set[tuple] | None = None):
     """Remove tasks whose (user_id, source_kind, source_ref) already exist or near-duplicates via embeddings.
 
-    Embedding similarity currently heuristic: if any existing vector within top_k returns distance < 0.15 treat as duplicate.
-    (Chroma distance for default embedding function is cosine; adapt threshold later.)
+    Surviving candidate titles are embedded once as a batch. Near-duplicates inside the batch are
+    collapsed first (see _batch_duplicates), then the rest are checked against the user's
+    collection with a single multi-query; if the nearest existing vector has distance < 0.15
+    treat as duplicate. (Chroma distance for default embedding function is cosine; adapt
+    threshold later.)
+
+    known may carry the result of known_refs() when the caller already looked it up.
+    Returns (kept_tasks, kept_vectors, provider) so the caller can store the same vectors
+    without embedding the titles a second time.
     """
     if not tasks:
-        return []
-    refs = {(t["source_kind"], t["source_ref"]) for t in tasks if t.get("source_ref")}
-    if not refs:
-        return tasks
-    existing = (
-        db.query(models.Task.source_kind, models.Task.source_ref)
-        .filter(models.Task.user_id == user_id, models.Task.source_ref.isnot(None))
-        .filter(models.Task.source_kind.in_({k for k, _ in refs}))
-        .all()
-    )
-    existing_set = {(ek, ev) for ek, ev in existing}
-    filtered = []
-    for t in tasks:
-        key = (t["source_kind"], t.get("source_ref"))
-        if key in existing_set:
-            continue
-        # similarity check (simple) using title
-        similar = find_similar(user_id, t["title"], top_k=1)
+        return [], [], None
+    if known is None:
+        known = known_refs(db, user_id, tasks)
+    candidates = [t for t in tasks if _ref_key(t) not in known]
+    if not candidates:
+        return [], [], None
+    vectors, provider = embed_batch([t["title"] for t in candidates])
+    unique = ~_batch_duplicates(candidates, vectors)
+    candidates = [t for t, keep in zip(candidates, unique, strict=True) if keep]
+    vectors = [v for v, keep in zip(vectors, unique, strict=True) if keep]
+    neighbours = find_similar_batch(str(user_id), vectors, top_k=1, provider=provider)
+    kept: list[dict] = []
+    kept_vectors: list[list[float]] = []
+    for t, vec, similar in zip(candidates, vectors, neighbours, strict=True):
         if similar and similar[0].get("distance") is not None and similar[0]["distance"] < 0.15:
             continue
-        filtered.append(t)
-    return filtered
+        kept.append(t)
+        kept_vectors.append(vec)
+    return kept, kept_vectors, provider
 
 
-def persist_tasks(db: Session, tasks: list[dict]):
-    created = []
+def _upsert_statement(db: Session):
+    dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = dialect_insert(models.Task)
+    return stmt.on_conflict_do_update(
+        index_elements=[models.Task.user_id, models.Task.source_kind, models.Task.source_ref],
+        set_={
+            "title": stmt.excluded.title,
+            "description": stmt.excluded.description,
+            "due_date": stmt.excluded.due_date,
+            "source_url": stmt.excluded.source_url,
+            "updated_at": func.now(),
+        },
+    ).returning(models.Task.id, sort_by_parameter_order=True)
+
+
+def persist_tasks(db: Session, tasks: list[dict], touched: list | None = None) -> list[dict]:
+    """Upsert task rows in bulk and return the ones that were newly inserted (with "id" filled in).
+
+    One INSERT ... ON CONFLICT (user_id, source_kind, source_ref) DO UPDATE executed as an
+    executemany (batched multi-row VALUES via insertmanyvalues), so large syncs skip
+    unit-of-work and identity-map overhead. Rows that already exist get their title,
+    description, due date and url refreshed; status, horizon and priority are left alone.
+    Ids are generated client-side: a returned id equal to ours means the row was inserted.
+    `touched`, if given, is extended with the id of every row written (inserted or refreshed).
+    """
+    if not tasks:
+        return []
+    rows_by_key: dict = {}
     for data in tasks:
-        obj = models.Task(**data)
-        db.add(obj)
-        created.append(obj)
-    db.flush()
-    return created
+        # ON CONFLICT can't touch the same row twice in one statement; last occurrence wins
+        rows_by_key[_ref_key(data) or id(data)] = {**data, "id": data.get("id") or uuid.uuid4()}
+    rows = list(rows_by_key.values())
+    returned = db.execute(_upsert_statement(db), rows).scalars().all()
+    if touched is not None:
+        touched.extend(returned)
+    return [row for row, rid in zip(rows, returned, strict=True) if rid == row["id"]]
+
+
+class NormaliseStage(Stage):
+    name = "normalise"
+
+    def process(self, db: Session, batch: Batch) -> None:
+        batch.tasks = normalise_items(batch.user_id, batch.connector.kind, batch.raw)
+
+
+class DedupeStage(Stage):
+    name = "dedupe"
+
+    def process(self, db: Session, batch: Batch) -> None:
+        known = known_refs(db, batch.user_id, batch.tasks)
+        # items we already have skip dedupe and are refreshed in place by the upsert
+        batch.refresh = [t for t in batch.tasks if _ref_key(t) in known]
+        batch.new, vectors, batch.provider = dedupe_new(db, batch.user_id, batch.tasks, known=known)
+        for t, vec in zip(batch.new, vectors, strict=True):
+            t["id"] = uuid.uuid4()
+            batch.vectors[t["id"]] = vec
+
+
+class PersistStage(Stage):
+    """Write the batch inside the batch's single transaction.
+
+    The bulk upsert runs in a SAVEPOINT. If it fails (one row the database rejects), only
+    the savepoint is rolled back and the rows are retried one savepoint each, so the bad
+    rows are skipped and reported while the rest of the batch still lands in the same
+    transaction and commit.
+    """
+
+    name = "persist"
+
+    def process(self, db: Session, batch: Batch) -> None:
+        rows = batch.new + batch.refresh
+        try:
+            touched: list = []
+            with db.begin_nested():
+                batch.created = persist_tasks(db, rows, touched)
+            batch.touched = touched
+            return
+        except SQLAlchemyError:
+            pass
+        batch.created = []
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    batch.created.extend(persist_tasks(db, [row], batch.touched))
+            except SQLAlchemyError as e:
+                logger.warning(
+                    "Skipping %s item %s for connector %s (user %s): %s",
+                    row.get("source_kind"),
+                    row.get("source_ref"),
+                    batch.connector.id,
+                    batch.user_id,
+                    getattr(e, "orig", e),
+                )
+                batch.failed.append(row)
+
+
+class EmbedStage(Stage):
+    name = "embed"
+
+    def process(self, db: Session, batch: Batch) -> None:
+        if not batch.created:
+            return
+        # vectors computed during dedupe travel with the work items, so titles are not re-embedded;
+        # the embed queue writes them (and the Embedding rows) after this transaction commits
+        kind = batch.connector.kind
+        embed_queue.submit(
+            db,
+            [
+                embed_queue.make_item(
+                    batch.user_id,
+                    kind,
+                    c["id"],
+                    c["title"],
+                    batch.vectors.get(c["id"]),
+                    batch.provider,
+                )
+                for c in batch.created
+            ],
+        )
+
+
+class PrioritiseStage(Stage):
+    """Queue every written task for rescoring; hand the user to prioritisation once per run.
+
+    Inserted and refreshed rows go into the user's dirty set (the bulk upsert bypasses the
+    ORM hooks that track task edits), so the incremental rescoring only looks at them.
+    """
+
+    name = "prioritise"
+
+    def __init__(self, hook=None):
+        self.hook = hook
+
+    def process(self, db: Session, batch: Batch) -> None:
+        prioritise.mark_dirty(batch.user_id, batch.touched)
+
+    def finish(self, db: Session, run: PipelineRun) -> None:
+        if self.hook is not None and (run.created or run.touched):
+            self.hook(run.user_id)
+
+
+def build_pipeline(prioritise=None) -> Pipeline:
+    """The ingest pipeline shared by the API and Celery paths; `prioritise(user_id)` runs last."""
+    stages: List[Stage] = [
+        NormaliseStage(),
+        DedupeStage(),
+        PersistStage(),
+        EmbedStage(),
+        PrioritiseStage(prioritise),
+    ]
+    return Pipeline(stages, batch_size=settings.ingest_batch_size)
 
 
 def ingest_connector(db: Session, user_id, connector: models.Connector, raw_items: List[Dict[str, Any]]):
-    norm = normalise_items(user_id, connector.kind, raw_items)
-    new_items = dedupe_new(db, user_id, norm)
-    created = persist_tasks(db, new_items)
-    if created:
-        ids = embed_texts([c.title for c in created], {"user_id": user_id, "kind": connector.kind})
-        # record embedding rows
-        for task_obj, vec_id in zip(created, ids):
-            emb = models.Embedding(user_id=user_id, source_kind=connector.kind, source_id=str(task_obj.id), vector_id=vec_id, meta={"task_id": str(task_obj.id), "provider": "bedrock" if (getattr(settings, 'litellm_provider', '') or '').startswith('bedrock') else 'default'})
-            db.add(emb)
-    return created
-
-
-def ingest_data_for_user(db: Session, user_id):
-    """Fetch data from all of user's connected connectors and ingest."""
+    """Run one batch of raw items through the pipeline stages (caller commits); inserted rows."""
+    return build_pipeline().run_batch(db, user_id, connector, raw_items).created
+
+
+def _open_connector(db: Session, user_id, c: models.Connector):
+    connector_cls = get_connector_by_kind(c.kind)
+    # TODO: this config passing is a bit of a mess
+    return connector_cls(
+        user_id=user_id,
+        config=settings,
+        access_token=credentials.for_connector(db, c),
+        cursor=(c.meta or {}).get("sync_cursor"),
+    )
+
+
+def _mark_synced(db: Session, c: models.Connector, connector) -> None:
+    c.last_checked = datetime.now(timezone.utc)
+    meta = dict(c.meta or {})
+    if connector.next_cursor:
+        meta["sync_cursor"] = connector.next_cursor
+    if meta.pop("sync_failures", None):
+        c.status_message = None  # the transient error recorded by _mark_failed is over
+    if meta != (c.meta or {}):
+        # reassign (not mutate) so the JSON column is marked dirty
+        c.meta = meta
+    db.add(c)
+    db.commit()
+
+
+def _is_transient(error: Exception | str) -> bool:
+    """Whether a sync failure should be retried: throttling, timeouts, 5xx and local hiccups.
+
+    Only a definite client error from the provider (revoked token, missing resource) stops
+    background syncs for the connector until the user reconnects it.
+    """
+    if isinstance(error, (str, rate_limit.RateLimited)) or rate_limit.is_throttled(error):
+        return True
+    status = rate_limit.http_status(error)
+    return status is None or status >= 500 or status in (408, 409, 425)
+
+
+def _mark_failed(db: Session, c: models.Connector, error: Exception | str) -> None:
+    """Record a failed sync. Transient failures keep the connector connected and push
+    last_checked forward so the scheduler retries it after an exponential backoff
+    (settings.sync_retry_backoff_s, doubling, capped at sync_idle_stale_after_s)."""
+    message = str(error)
+    transient = _is_transient(error)
+    logger.warning(
+        "Error fetching from %s connector %s (user %s, %s): %s",
+        c.kind,
+        c.id,
+        c.user_id,
+        "will retry" if transient else "giving up",
+        message,
+    )
+    db.rollback()  # drop only the failing batch; earlier batches are already committed
+    c.status_message = message
+    if transient:
+        failures = int((c.meta or {}).get("sync_failures", 0)) + 1
+        backoff = min(
+            settings.sync_retry_backoff_s * 2 ** (failures - 1), settings.sync_idle_stale_after_s
+        )
+        # plan() picks connectors whose last_checked is sync_stale_after_s old
+        c.last_checked = datetime.now(timezone.utc) + timedelta(
+            seconds=backoff - settings.sync_stale_after_s
+        )
+        c.meta = {**(c.meta or {}), "sync_failures": failures}
+    else:
+        c.status = "error"
+    db.add(c)
+    db.commit()
+
+
+def sync_connector(
+    db: Session, user_id, c: models.Connector, pipeline: Pipeline | None = None
+) -> int:
+    """Fetch one connector and run its pages through the pipeline, committing per batch."""
+    pipeline = pipeline or build_pipeline()
+    run = pipeline.new_run(user_id)
+    try:
+        connector = _open_connector(db, user_id, c)
+        pipeline.run(db, user_id, c, connector.fetch_pages(), run)
+        _mark_synced(db, c, connector)
+    except Exception as e:
+        _mark_failed(db, c, e)
+        if run.created or run.touched:
+            pipeline.finish(db, run)  # batches committed before the failure still get prioritised
+    return len(run.created)
+
+
+def _produce_pages(key, connector, out: queue.Queue, stop: threading.Event, waiting: dict) -> None:
+    """Fetch-side worker: push (key, kind, payload) messages until the connector is done or stopped.
+
+    `waiting[key]` holds when the current provider call started and is cleared once it
+    returns, so time spent blocked handing pages to a busy consumer never counts as a hang.
+    """
+
+    def put(msg) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(msg, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        pages = iter(connector.fetch_pages())
+        while True:
+            fetch_started = time.perf_counter()
+            waiting[key] = time.monotonic()
+            page = next(pages, None)
+            waiting.pop(key, None)
+            if page is None:
+                break
+            if not put((key, "page", (page, time.perf_counter() - fetch_started))):
+                return
+        put((key, "done", None))
+    except Exception as e:
+        waiting.pop(key, None)
+        put((key, "error", e))
+
+
+def ingest_data_for_user(db: Session, user_id, pipeline: Pipeline | None = None, progress=None):
+    """Fetch data from all of user's connected connectors and ingest.
+
+    Provider fetches run concurrently on a bounded thread pool
+    (settings.connector_fetch_concurrency) and stream pages back over a queue; the pipeline's
+    normalise/dedupe/persist/embed stages stay on this thread and this session, one transaction
+    per batch. A connector whose
+    provider sends no page for settings.connector_fetch_timeout_s is marked as failed without
+    holding back the others (its thread is told to stop after the current page). Only the
+    wait on the provider counts, so a long backfill or a slow consumer is not a timeout.
+
+    `progress(stage, data)`, if given, is called as each connector finishes
+    ("connectors_fetched") and after each page is stored ("items_ingested").
+    """
     connectors = db.query(models.Connector).filter(models.Connector.user_id == user_id, models.Connector.status == "connected").all()
-    total_created = 0
+    if not connectors:
+        return 0
+    pipeline = pipeline or build_pipeline()
+    run = pipeline.new_run(user_id)
+    fetched = 0
+
+    def connector_done(c: models.Connector, error: str | None = None) -> None:
+        nonlocal fetched
+        fetched += 1
+        if progress:
+            progress(
+                "connectors_fetched",
+                {
+                    "kind": c.kind,
+                    "status": "error" if error else "ok",
+                    "message": error,
+                    "done": fetched,
+                    "total": len(connectors),
+                },
+            )
+
+    def failed(c: models.Connector, error: Exception | str) -> None:
+        _mark_failed(db, c, error)
+        connector_done(c, str(error))
+
+    pending: dict = {}
+    instances: dict = {}
     for c in connectors:
         try:
-            connector_cls = get_connector_by_kind(c.kind)
-            # TODO: this config passing is a bit of a mess
-            connector = connector_cls(user_id=user_id, config=settings, access_token=c.access_token)
-            raw_items = connector.fetch()
-            created = ingest_connector(db, user_id, c, raw_items)
-            total_created += len(created)
-            c.last_checked = datetime.now(timezone.utc)
-            db.add(c)
+            instances[c.id] = _open_connector(db, user_id, c)
+            pending[c.id] = c
         except Exception as e:
-            print(f"Error fetching from {c.kind}: {e}")
-            c.status = "error"
-            c.status_message = str(e)
-            db.add(c)
-    db.commit()
-    return total_created
+            failed(c, e)
+
+    timeout = settings.connector_fetch_timeout_s
+    pages: queue.Queue = queue.Queue(maxsize=max(2, 2 * settings.connector_fetch_concurrency))
+    stops = {key: threading.Event() for key in pending}
+    waiting: dict = {}
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, settings.connector_fetch_concurrency),
+        thread_name_prefix="connector-fetch",
+    )
+    try:
+        for key in pending:
+            pool.submit(_produce_pages, key, instances[key], pages, stops[key], waiting)
+        while pending:
+            now = time.monotonic()
+            # snapshot: producers set and clear their entries concurrently
+            waits = {k: waiting.get(k) for k in pending}
+            waits = {k: since for k, since in waits.items() if since is not None}
+            for key in [k for k, since in waits.items() if now - since > timeout]:
+                stops[key].set()
+                failed(
+                    pending.pop(key),
+                    f"fetch timed out: no page from the provider for {timeout:.0f}s",
+                )
+            if not pending:
+                break
+            deadlines = [since + timeout - now for k, since in waits.items() if k in pending]
+            try:
+                key, kind, payload = pages.get(timeout=max(0.05, min(deadlines, default=timeout)))
+            except queue.Empty:
+                continue
+            c = pending.get(key)
+            if c is None:  # already timed out; late pages are discarded
+                continue
+            try:
+                if kind == "page":
+                    # ingest page by page so memory stays flat and early pages become visible
+                    # (and reach the embed queue) before the whole provider history is fetched
+                    page, fetch_secs = payload
+                    run.timings["fetch"] += fetch_secs
+                    pipeline.run_page(db, user_id, c, page, run)
+                    if progress:
+                        progress(
+                            "items_ingested",
+                            {"kind": c.kind, "items": run.items, "created": len(run.created)},
+                        )
+                    continue
+                if kind == "error":
+                    raise payload
+                pending.pop(key)
+                _mark_synced(db, c, instances[key])
+                connector_done(c)
+            except Exception as e:
+                stops[key].set()
+                pending.pop(key, None)
+                failed(c, e)
+    finally:
+        for stop in stops.values():
+            stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    pipeline.finish(db, run)
+    return len(run.created)
@@ -0,0 +1,112 @@
+"""Progress events for background jobs, published by the worker over Redis pub/sub.
+
+The worker calls publish(job_id, stage, data) as a job moves through its stages
+(connectors_fetched, items_ingested, tasks_scored, then done or failed). Each event is also
+appended to a short-lived per-job log, so a client that connects after the job started
+(or reconnects) replays what it missed before following the live channel. Events carry a
+sequence number so the replay and the live channel can overlap without duplicates.
+
+stream() turns that into the SSE frames for GET /tasks/suggest/{job_id}/events. Publishing
+never fails a job: without Redis the events are dropped and the endpoint falls back to
+watching the job row. Because a job can also finish without its final event getting out,
+an open stream re-checks the row every settings.job_events_poll_s as well.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+import redis.asyncio as aioredis
+from app.config import settings
+from app.services.redis_client import get_redis
+from app.services.sse import sse_event
+
+CHANNEL = "mimir:job:{}:events"
+LOG_KEY = "mimir:job:{}:log"
+SEQ_KEY = "mimir:job:{}:seq"
+TERMINAL = ("done", "failed")
+
+
+def publish(job_id, stage: str, data: Dict[str, Any] | None = None) -> None:
+    job_id = str(job_id)
+    try:
+        r = get_redis()
+        seq = r.incr(SEQ_KEY.format(job_id))
+        message = json.dumps({"seq": seq, "event": stage, "data": data or {}})
+        ttl = settings.job_events_ttl_s
+        pipe = r.pipeline()
+        pipe.rpush(LOG_KEY.format(job_id), message)
+        pipe.expire(LOG_KEY.format(job_id), ttl)
+        pipe.expire(SEQ_KEY.format(job_id), ttl)
+        pipe.publish(CHANNEL.format(job_id), message)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def publisher(job_id) -> Callable[[str, Dict[str, Any]], None]:
+    """publish() bound to one job, for passing down as a progress callback."""
+    return lambda stage, data=None: publish(job_id, stage, data)
+
+
+def _frame(message) -> tuple[str, bytes, int] | None:
+    try:
+        event = json.loads(message)
+    except (TypeError, ValueError):
+        return None
+    return event["event"], sse_event(event["event"], event["data"]).encode(), event["seq"]
+
+
+async def stream(
+    job_id,
+    is_disconnected: Callable[[], Any],
+    poll_job: Callable[[], Awaitable[bytes | None]] | None = None,
+) -> AsyncIterator[bytes]:
+    """SSE frames for a job's events until it finishes, the client leaves or the timeout hits.
+
+    Frames are pre-encoded bytes so EventSourceResponse sends sse_event's output verbatim.
+    poll_job, if given, is awaited every settings.job_events_poll_s while the channel is quiet;
+    a frame from it is the job's final event, read from the job row, and ends the stream.
+    Raises redis.RedisError if Redis is unreachable before anything was sent.
+    """
+    job_id = str(job_id)
+    deadline = time.monotonic() + settings.job_events_timeout_s
+    next_poll = time.monotonic() + settings.job_events_poll_s
+    client = aioredis.Redis.from_url(settings.redis_url, socket_connect_timeout=0.5)
+    pubsub = client.pubsub()
+    try:
+        # subscribe before reading the log so nothing published in between is lost
+        await pubsub.subscribe(CHANNEL.format(job_id))
+        seen = 0
+        for message in await client.lrange(LOG_KEY.format(job_id), 0, -1):
+            frame = _frame(message)
+            if frame is None:
+                continue
+            stage, payload, seq = frame
+            seen = max(seen, seq)
+            yield payload
+            if stage in TERMINAL:
+                return
+        while time.monotonic() < deadline:
+            if await is_disconnected():
+                return
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is None:
+                if poll_job is not None and time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + settings.job_events_poll_s
+                    final = await poll_job()
+                    if final is not None:
+                        yield final
+                        return
+                await asyncio.sleep(0)
+                continue
+            frame = _frame(message.get("data"))
+            if frame is None or frame[2] <= seen:
+                continue
+            stage, payload, seen = frame
+            yield payload
+            if stage in TERMINAL:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
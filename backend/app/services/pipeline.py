@@ -0,0 +1,140 @@
+"""Staged ingest engine: fetch -> normalise -> dedupe -> persist -> embed -> prioritise.
+
+A Pipeline runs an ordered list of Stage objects over each Batch: one provider page, split
+at `batch_size` items. Stages read and fill in fields on the Batch. The engine times every
+stage (plus fetch and commit) into a PipelineRun and commits once per batch. Each stage's
+finish() runs once the source is exhausted, so per-sync work (kicking off prioritisation)
+happens once and not per page. The concrete stages live in app.services.ingest.
+"""
+from __future__ import annotations
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("mimir")
+
+
+@dataclass
+class Batch:
+    user_id: Any
+    connector: Any
+    raw: List[Dict[str, Any]]
+    tasks: List[dict] = field(default_factory=list)  # normalised rows
+    new: List[dict] = field(default_factory=list)  # rows not stored yet that survived dedupe
+    refresh: List[dict] = field(default_factory=list)  # rows already stored, refreshed in place
+    vectors: Dict[Any, List[float]] = field(default_factory=dict)  # task id -> dedupe vector
+    provider: str | None = None
+    created: List[dict] = field(default_factory=list)  # rows actually inserted
+    touched: List[Any] = field(
+        default_factory=list
+    )  # ids of every row written (inserted or refreshed)
+    failed: List[dict] = field(default_factory=list)  # rows a stage had to skip
+
+
+@dataclass
+class PipelineRun:
+    user_id: Any = None
+    timings: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    batches: int = 0
+    items: int = 0
+    failed: int = 0
+    created: List[dict] = field(default_factory=list)
+    touched: int = 0
+
+    def summary(self) -> str:
+        stages = " ".join(f"{name}={secs * 1000:.0f}ms" for name, secs in self.timings.items())
+        return (
+            f"ingest user={self.user_id} batches={self.batches} items={self.items} "
+            f"created={len(self.created)} failed={self.failed} {stages}"
+        )
+
+
+class Stage:
+    """One pipeline step. process() handles a batch; finish() runs once at the end of a run."""
+
+    name = "stage"
+
+    def process(self, db: Session, batch: Batch) -> None:
+        raise NotImplementedError
+
+    def finish(self, db: Session, run: PipelineRun) -> None:
+        pass
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], batch_size: int = 0):
+        self.stages = stages
+        self.batch_size = batch_size
+
+    def new_run(self, user_id) -> PipelineRun:
+        return PipelineRun(user_id=user_id)
+
+    def split(self, raw: List[Dict[str, Any]]) -> Iterable[List[Dict[str, Any]]]:
+        if not self.batch_size or len(raw) <= self.batch_size:
+            yield raw
+            return
+        for i in range(0, len(raw), self.batch_size):
+            yield raw[i : i + self.batch_size]
+
+    def run_batch(
+        self,
+        db: Session,
+        user_id,
+        connector,
+        raw: List[Dict[str, Any]],
+        run: PipelineRun | None = None,
+    ) -> Batch:
+        """Run every stage over one batch. Does not commit."""
+        run = run or self.new_run(user_id)
+        batch = Batch(user_id=user_id, connector=connector, raw=raw)
+        for stage in self.stages:
+            started = time.perf_counter()
+            stage.process(db, batch)
+            run.timings[stage.name] += time.perf_counter() - started
+        run.batches += 1
+        run.items += len(raw)
+        run.failed += len(batch.failed)
+        run.created.extend(batch.created)
+        run.touched += len(batch.touched)
+        return batch
+
+    def run_page(
+        self, db: Session, user_id, connector, page: List[Dict[str, Any]], run: PipelineRun
+    ) -> None:
+        """Split one fetched page into batches and commit each one as its own transaction."""
+        for raw in self.split(page):
+            self.run_batch(db, user_id, connector, raw, run)
+            started = time.perf_counter()
+            db.commit()
+            run.timings["commit"] += time.perf_counter() - started
+
+    def run(
+        self,
+        db: Session,
+        user_id,
+        connector,
+        pages: Iterable[List[Dict[str, Any]]],
+        run: PipelineRun | None = None,
+    ) -> PipelineRun:
+        """Consume a connector's pages (the fetch stage) through every stage, then finish."""
+        run = run or self.new_run(user_id)
+        pages = iter(pages)
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            run.timings["fetch"] += time.perf_counter() - started
+            if page is None:
+                break
+            self.run_page(db, user_id, connector, page, run)
+        self.finish(db, run)
+        return run
+
+    def finish(self, db: Session, run: PipelineRun) -> None:
+        for stage in self.stages:
+            started = time.perf_counter()
+            stage.finish(db, run)
+            run.timings[stage.name] += time.perf_counter() - started
+        logger.info(run.summary())
@@ -1,32 +1,335 @@
 from app import models
+from sqlalchemy import event, inspect, update
 from sqlalchemy.orm import Session
-from app.services import agents
+from datetime import datetime, timezone
+import hashlib
+import uuid
+from types import SimpleNamespace
+import numpy as np
+from app.config import settings
+from app.services import agents, factor_cache
+from app.services.redis_client import get_redis
+
+# Per-user Redis set of task ids whose factor inputs changed since they were last scored.
+DIRTY_KEY = "mimir:prioritise:dirty:{}"
+# Task attributes the factors are computed from; editing any of them makes a task dirty.
+FACTOR_INPUTS = (
+    "title",
+    "description",
+    "due_date",
+    "horizon",
+    "source_kind",
+    "source_ref",
+    "status",
+)
+FINGERPRINT_COLUMNS = (
+    models.Task.id,
+    models.Task.title,
+    models.Task.description,
+    models.Task.due_date,
+    models.Task.horizon,
+    models.Task.source_kind,
+    models.Task.source_ref,
+    models.Task.created_at,
+    models.Task.priority_fingerprint,
+    models.Task.priority,
+)
+
+
+# Weighted combination; weights may be tuned later
+FACTOR_WEIGHTS = {"urgency": 0.4, "importance": 0.3, "recency": 0.2, "source_signal": 0.1}
+HORIZON_WEIGHTS = {"today": 1.0, "week": 0.85, "month": 0.6, "past7d": 0.3}
+# horizons are only ever escalated along this order (today > week > month), never downgraded
+ESCALATION_ORDER = ["month", "week", "today"]
 
 
 def compute_priority(task: models.Task, factors: dict) -> float:
-    # Weighted combination; weights may be tuned later
-    w = {"urgency": 0.4, "importance": 0.3, "recency": 0.2, "source_signal": 0.1}
     score = 0.0
-    for k, weight in w.items():
+    for k, weight in FACTOR_WEIGHTS.items():
         score += weight * factors.get(k, 0.5)
     # horizon bias
-    horizon_weight = {"today": 1.0, "week": 0.85, "month": 0.6, "past7d": 0.3}
-    score *= horizon_weight.get(task.horizon.value if hasattr(task.horizon, 'value') else task.horizon, 0.7)
+    score *= HORIZON_WEIGHTS.get(
+        task.horizon.value if hasattr(task.horizon, "value") else task.horizon, 0.7
+    )
     return round(score, 4)
 
 
-def refresh_priorities(db: Session, user_id):
-    tasks = db.query(models.Task).filter(models.Task.user_id == user_id, models.Task.status != models.StatusEnum.done).all()
-    for t in tasks:
-        factors = agents.get_factors(t)
-        # Possibly adjust horizon based on suggestion (soft apply if lower horizon urgency)
-        suggested = factors.get("suggested_horizon")
-        if suggested and suggested != t.horizon.value:
-            # only escalate (today > week > month); never downgrade automatically
-            order = ["month", "week", "today"]
-            if order.index(suggested) > order.index(t.horizon.value):
-                t.horizon = models.HorizonEnum(suggested)
-        t.priority_factors = factors
-        t.priority = compute_priority(t, factors)
-    db.commit()
+def compute_priorities(factors: dict, horizons) -> list[float]:
+    """compute_priority over factor arrays (agents.heuristic_factor_arrays) and horizon values."""
+    score = np.zeros(len(horizons))
+    for k, weight in FACTOR_WEIGHTS.items():
+        score += weight * factors[k]
+    score *= np.array([HORIZON_WEIGHTS.get(h, 0.7) for h in horizons])
+    # Python's round, not np.round, so the results match compute_priority exactly
+    return [round(float(x), 4) for x in score]
+
+
+def escalate(current: str, suggested: str | None) -> str:
+    """The horizon to keep: `suggested` only if it is more urgent than `current`."""
+    if (
+        suggested in ESCALATION_ORDER
+        and current in ESCALATION_ORDER
+        and ESCALATION_ORDER.index(suggested) > ESCALATION_ORDER.index(current)
+    ):
+        return suggested
+    return current
+
+
+def _due_bucket(due_date, today) -> int:
+    # the thresholds agents._heuristic_urgency switches on
+    if not due_date:
+        return -1
+    days = (due_date - today).days
+    return 0 if days <= 0 else 1 if days <= 2 else 2 if days <= 7 else 3
+
+
+def _age_bucket(created_at, now: datetime) -> int:
+    # the thresholds agents._heuristic_recency switches on
+    if not created_at:
+        return -1
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    hours = (now - created_at).total_seconds() / 3600
+    return 0 if hours < 6 else 1 if hours < 24 else 2 if hours < 72 else 3
+
+
+def factor_fingerprint(
+    task, now: datetime | None = None, horizon: str | None = None, strategy: str | None = None
+) -> str:
+    """Hash of every input the priority factors depend on (a Task or a FINGERPRINT_COLUMNS row).
+
+    Time only enters through the due-date and recency buckets the heuristics switch on, so a
+    fingerprint changes when a task crosses one of those thresholds, not on every run.
+    `strategy` is the one that scored the task (default: the configured one).
+    """
+    now = now or datetime.now(timezone.utc)
+    strategy = strategy or ("crewai" if settings.enable_crewai else "heuristic")
+    if horizon is None:
+        horizon = task.horizon.value if hasattr(task.horizon, "value") else task.horizon
+    parts = (
+        strategy,
+        task.title or "",
+        task.description or "",
+        str(task.due_date or ""),
+        horizon or "",
+        task.source_kind or "",
+        task.source_ref or "",
+        str(_due_bucket(task.due_date, now.date())),
+        str(_age_bucket(task.created_at, now)),
+    )
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+
+
+def mark_dirty(user_id, task_ids) -> None:
+    """Queue tasks for the next incremental rescoring (run_agents)."""
+    ids = [str(i) for i in task_ids]
+    if not ids:
+        return
+    try:
+        key = DIRTY_KEY.format(user_id)
+        pipe = get_redis().pipeline()
+        pipe.sadd(key, *ids)
+        pipe.expire(key, 7 * 24 * 3600)
+        pipe.execute()
+    except Exception:
+        pass  # the next full refresh still finds them through their fingerprints
+
+
+def drain_dirty(user_id) -> set[str] | None:
+    """Take every queued task id for the user; None if Redis is unavailable (caller rescans)."""
+    try:
+        key = DIRTY_KEY.format(user_id)
+        pipe = get_redis().pipeline()
+        pipe.smembers(key)
+        pipe.delete(key)
+        members, _ = pipe.execute()
+    except Exception:
+        return None
+    return {m.decode() if isinstance(m, bytes) else m for m in members}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_edited_tasks(session: Session, flush_context) -> None:
+    # ORM edits (task routes, suggestions) feed the dirty set; the bulk ingest upsert marks its own
+    edited = session.info.setdefault("prioritise_dirty", {})
+    stale = session.info.setdefault("factor_cache_stale", set())
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, models.Task) or obj.user_id is None:
+            continue
+        state = inspect(obj)
+        if obj in session.new:
+            edited.setdefault(obj.user_id, set()).add(obj.id)
+            continue
+        if not any(state.attrs[name].history.has_changes() for name in FACTOR_INPUTS):
+            continue
+        edited.setdefault(obj.user_id, set()).add(obj.id)
+        if settings.enable_crewai:
+            # drop the cached model factors for the content the task had before this edit
+            before = {}
+            for name in factor_cache.CONTENT_FIELDS:
+                history = state.attrs[name].history
+                before[name] = history.deleted[0] if history.deleted else getattr(obj, name)
+            stale.add(
+                factor_cache.content_key(before, settings.crewai_model or agents.DEFAULT_MODEL)
+            )
 
+
+@event.listens_for(Session, "after_commit")
+def _publish_edited_tasks(session: Session) -> None:
+    for user_id, task_ids in session.info.pop("prioritise_dirty", {}).items():
+        mark_dirty(user_id, task_ids)
+    factor_cache.invalidate(session.info.pop("factor_cache_stale", ()))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_edited_tasks(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop("prioritise_dirty", None)
+        session.info.pop("factor_cache_stale", None)
+
+
+def _write_back(
+    db: Session,
+    rows,
+    factors: list[dict],
+    horizons: list[str],
+    priorities: list[float],
+    now: datetime,
+) -> None:
+    """One bulk UPDATE by primary key for every rescored row."""
+    values = [
+        {
+            "id": row.id,
+            "horizon": models.HorizonEnum(horizon),
+            "priority_factors": task_factors,
+            "priority": priority,
+            # taken after any horizon change so the escalation itself doesn't retrigger a rescore
+            "priority_fingerprint": factor_fingerprint(
+                row,
+                now,
+                horizon,
+                "heuristic" if task_factors.get("strategy") == "heuristic" else "crewai",
+            ),
+        }
+        for row, task_factors, horizon, priority in zip(
+            rows, factors, horizons, priorities, strict=True
+        )
+    ]
+    if values:
+        db.execute(update(models.Task), values)
+
+
+def _heuristic_scores(rows, now: datetime) -> tuple[list[dict], list[str], list[float]]:
+    """Factors, (escalated) horizons and priorities for light rows, in one vectorised pass."""
+    factors = agents.heuristic_factor_arrays(rows, now)
+    horizons = [
+        escalate(r.horizon.value, suggested)
+        for r, suggested in zip(rows, factors["suggested_horizon"], strict=True)
+    ]
+    task_factors = []
+    for i in range(len(rows)):
+        f = {k: float(factors[k][i]) for k in FACTOR_WEIGHTS}
+        f["suggested_horizon"] = str(factors["suggested_horizon"][i])
+        f["strategy"] = "heuristic"
+        task_factors.append(f)
+    return task_factors, horizons, compute_priorities(factors, horizons)
+
+
+def _model_candidates(
+    active, changed, horizons: list[str], priorities: list[float], now: datetime
+) -> tuple[list[int], list]:
+    """Which tasks are worth a model call: (indexes into `changed`, unchanged rows to promote).
+
+    A task qualifies when its heuristic priority is in the top settings.crewai_top_k of its
+    horizon, or within settings.crewai_boundary_margin of the K-th score (the cut line for
+    what the UI shows), counting every active task of the user. Unchanged tasks that were
+    only scored heuristically are promoted once they clear that line, e.g. after the tasks
+    above them are completed. crewai_top_k <= 0 sends every changed task to the model.
+    """
+    k = settings.crewai_top_k
+    if k <= 0:
+        return list(range(len(changed))), []
+    changed_ids = {row.id for row in changed}
+    unchanged = [row for row in active if row.id not in changed_ids and row.priority is not None]
+    scores: dict[str, list[float]] = {}
+    for row in unchanged:
+        scores.setdefault(row.horizon.value, []).append(row.priority)
+    for horizon, priority in zip(horizons, priorities, strict=True):
+        scores.setdefault(horizon, []).append(priority)
+    cut = {
+        h: sorted(v, reverse=True)[min(k, len(v)) - 1] - settings.crewai_boundary_margin
+        for h, v in scores.items()
+    }
+    picked = [i for i, (h, p) in enumerate(zip(horizons, priorities, strict=True)) if p >= cut[h]]
+    promoted = [
+        row
+        for row in unchanged
+        if row.priority >= cut[row.horizon.value]
+        and row.priority_fingerprint == factor_fingerprint(row, now, strategy="heuristic")
+    ]
+    return picked, promoted
+
+
+def _rescore(db: Session, changed, active, now: datetime) -> int:
+    """Heuristics for every changed row; with CrewAI, the model for the ones that matter."""
+    rows = list(changed)
+    factors, horizons, priorities = _heuristic_scores(rows, now)
+    if settings.enable_crewai:
+        picked, promoted = _model_candidates(active, rows, horizons, priorities, now)
+        start = len(rows)
+        rows.extend(promoted)
+        promoted_factors, promoted_horizons, promoted_priorities = _heuristic_scores(promoted, now)
+        factors += promoted_factors
+        horizons += promoted_horizons
+        priorities += promoted_priorities
+        picked += range(start, len(rows))
+        scored = agents.get_factors_batch([rows[i] for i in picked])
+        for i in picked:
+            f = scored[rows[i].id]
+            factors[i] = f
+            # Possibly adjust horizon based on suggestion (only ever escalated)
+            horizons[i] = escalate(rows[i].horizon.value, f.get("suggested_horizon"))
+            priorities[i] = compute_priority(SimpleNamespace(horizon=horizons[i]), f)
+    _write_back(db, rows, factors, horizons, priorities, now)
+    return len(rows)
+
+
+def _unchanged(row, now: datetime) -> bool:
+    if row.priority_fingerprint == factor_fingerprint(row, now):
+        return True
+    # heuristic-tier tasks keep a "heuristic" fingerprint in CrewAI mode too
+    return settings.enable_crewai and row.priority_fingerprint == factor_fingerprint(
+        row, now, strategy="heuristic"
+    )
+
+
+def refresh_priorities(db: Session, user_id, task_ids=None) -> int:
+    """Rescore the user's active tasks whose factor inputs changed; returns how many were rescored.
+
+    Only the FINGERPRINT_COLUMNS are loaded: they are also everything the scorers need.
+    Changed rows are scored with the heuristics in one vectorised pass; with CrewAI enabled
+    the model then rescores only the tasks near the top of each horizon (_model_candidates),
+    concurrently via agents.get_factors_batch. Results go back in a single bulk UPDATE.
+    task_ids restricts the pass to those tasks (the drained dirty set); None checks every
+    active task, which also picks up tasks that crossed a due-date or recency threshold.
+    """
+    now = datetime.now(timezone.utc)
+    q = db.query(*FINGERPRINT_COLUMNS).filter(
+        models.Task.user_id == user_id, models.Task.status != models.StatusEnum.done
+    )
+    # tiering ranks against every active task, so CrewAI mode always reads the whole (light) list
+    active = q.all() if settings.enable_crewai else None
+    if task_ids is not None:
+        ids = {uuid.UUID(str(i)) for i in task_ids}
+        if active is not None:
+            rows = [row for row in active if row.id in ids]
+        else:
+            rows = q.filter(models.Task.id.in_(ids)).all() if ids else []
+    else:
+        drain_dirty(user_id)  # this full pass covers everything queued so far
+        rows = active if active is not None else q.all()
+    changed = [row for row in rows if not _unchanged(row, now)]
+    rescored = _rescore(db, changed, active, now)
+    # the bulk UPDATE bypasses the ORM hooks, so rescoring never queues the same tasks again
+    db.commit()
+    return rescored
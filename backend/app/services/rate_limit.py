@@ -0,0 +1,218 @@
+"""Per-(provider, user) rate limiting for connector calls, shared by every process through Redis.
+
+Each (provider, user) pair has a token bucket (settings.rate_limit_per_s / rate_limit_burst)
+plus a "blocked until" key. The block key is set from the provider's own signals, either
+Retry-After or an exhausted X-RateLimit-Remaining/X-RateLimit-Reset, so one worker hitting a
+quota pauses all of them instead of each finding out with its own 429. If Redis is down the
+limiter fails open and only the local, header-driven backoff applies.
+"""
+from __future__ import annotations
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, TypeVar
+import redis
+from app.config import settings
+from app.services.redis_client import get_redis
+
+T = TypeVar("T")
+
+KEY_PREFIX = "mimir:ratelimit"
+
+# KEYS: bucket, block. ARGV: rate/s, burst, cost. Returns ms to wait (0 = tokens taken).
+# Time comes from the Redis server so workers with skewed clocks share one timeline.
+_ACQUIRE_LUA = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then return blocked end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = math.ceil((cost - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+_script = None
+_redis_down_until = 0.0
+
+
+class RateLimited(Exception):
+    """The provider's quota will not recover within settings.rate_limit_max_wait_s."""
+
+
+def http_status(e: Exception) -> int | None:
+    status = (
+        getattr(e, "status_code", None)
+        or getattr(getattr(e, "resp", None), "status", None)  # googleapiclient HttpError
+        or getattr(getattr(e, "response", None), "status_code", None)  # httpx / requests
+    )
+    return int(status) if status else None
+
+
+def error_headers(e: Exception) -> Dict[str, str]:
+    headers = getattr(e, "resp", None)
+    if headers is None:
+        headers = getattr(getattr(e, "response", None), "headers", None)
+    return {str(k).lower(): str(v) for k, v in dict(headers or {}).items()}
+
+
+def is_throttled(e: Exception) -> bool:
+    status = http_status(e)
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    # Google: 403 rateLimitExceeded; GitHub: 403 with exhausted or secondary rate limits
+    headers = error_headers(e)
+    return (
+        "ratelimitexceeded" in str(e).lower()
+        or "rate limit" in str(e).lower()
+        or headers.get("x-ratelimit-remaining") == "0"
+        or "retry-after" in headers
+    )
+
+
+def _reset_at(value: str) -> float | None:
+    """X-RateLimit-Reset as epoch seconds: GitHub sends epoch seconds, Jira an ISO timestamp."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def header_delay(headers: Mapping[str, str]) -> float | None:
+    """Seconds the provider asked us to wait, or None if the headers say nothing."""
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                until = parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)
+                return max(0.0, until.total_seconds())
+            except (TypeError, ValueError):
+                pass
+    if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+        reset = _reset_at(headers["x-ratelimit-reset"])
+        if reset is not None:
+            return max(0.0, reset - time.time()) + 1  # reset is second-granular
+    return None
+
+
+def _keys(provider: str, user_id: str) -> tuple[str, str]:
+    return f"{KEY_PREFIX}:{provider}:{user_id}", f"{KEY_PREFIX}:{provider}:{user_id}:blocked"
+
+
+def _redis():
+    global _script
+    if time.monotonic() < _redis_down_until:
+        return None
+    r = get_redis()
+    if _script is None:
+        _script = r.register_script(_ACQUIRE_LUA)
+    return r
+
+
+def _redis_failed() -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + 30
+
+
+def acquire(provider: str, user_id: str, cost: int = 1) -> None:
+    """Block until `cost` tokens are available for (provider, user); RateLimited past max wait."""
+    rate = settings.rate_limit_per_s.get(provider)
+    if not rate:
+        return
+    burst = settings.rate_limit_burst.get(provider, 1)
+    bucket, block = _keys(provider, user_id)
+    waited = 0.0
+    while True:
+        try:
+            r = _redis()
+            if r is None:
+                return
+            wait_ms = int(
+                _script(keys=[bucket, block], args=[rate, burst, min(cost, burst)], client=r)
+            )
+        except redis.RedisError:
+            _redis_failed()
+            return
+        if wait_ms <= 0:
+            return
+        if waited + wait_ms / 1000 > settings.rate_limit_max_wait_s:
+            raise RateLimited(
+                f"{provider} rate limit for user {user_id}: next slot in {wait_ms / 1000:.0f}s"
+            )
+        time.sleep(wait_ms / 1000)
+        waited += wait_ms / 1000
+
+
+def block_for(provider: str, user_id: str, seconds: float) -> None:
+    """Pause every process's calls for (provider, user) for `seconds`."""
+    if seconds <= 0:
+        return
+    try:
+        r = _redis()
+        if r is not None:
+            r.set(_keys(provider, user_id)[1], 1, px=max(1, int(seconds * 1000)))
+    except redis.RedisError:
+        _redis_failed()
+
+
+def observe(provider: str, user_id: str, headers: Mapping[str, str]) -> None:
+    """Honour quota headers on a successful response (e.g. the last call that emptied it)."""
+    headers = {str(k).lower(): str(v) for k, v in dict(headers).items()}
+    if headers.get("x-ratelimit-remaining") == "0":
+        delay = header_delay(headers)
+        if delay:
+            block_for(provider, user_id, delay)
+
+
+def penalise(provider: str, user_id: str, headers: Mapping[str, str], attempt: int) -> float:
+    """Backoff after a throttled call: the provider's requested delay or jittered exponential.
+
+    The delay is published so other workers pause too. RateLimited is raised when it
+    exceeds settings.rate_limit_max_wait_s (e.g. an hourly quota) rather than stalling a sync.
+    """
+    delay = header_delay(headers)
+    if delay is None:
+        delay = min(2 ** attempt, 32) + random.random()
+    block_for(provider, user_id, delay)
+    if delay > settings.rate_limit_max_wait_s:
+        raise RateLimited(f"{provider} rate limit for user {user_id}: retry in {delay:.0f}s")
+    return delay
+
+
+def call(provider: str, user_id: str, fn: Callable[[], T], cost: int = 1) -> T:
+    """Run a provider call under the (provider, user) limiter, retrying throttled responses."""
+    for attempt in range(settings.rate_limit_max_retries + 1):
+        acquire(provider, user_id, cost)
+        try:
+            result = fn()
+        except Exception as e:
+            if attempt == settings.rate_limit_max_retries or not is_throttled(e):
+                raise
+            time.sleep(penalise(provider, user_id, error_headers(e), attempt))
+            continue
+        headers: Any = getattr(result, "headers", None)
+        if headers is not None:
+            observe(provider, user_id, headers)
+        return result
+    raise AssertionError("unreachable")
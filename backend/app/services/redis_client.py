@@ -0,0 +1,22 @@
+from __future__ import annotations
+import redis
+from app.config import settings
+
+_redis = None
+
+
+def get_redis() -> redis.Redis:
+    """Shared Redis client (same instance the Celery broker uses)."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.redis_url, socket_connect_timeout=0.5, socket_timeout=2
+        )
+    return _redis
+
+
+def redis_available() -> bool:
+    try:
+        return bool(get_redis().ping())
+    except Exception:
+        return False
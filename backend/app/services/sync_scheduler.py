@@ -0,0 +1,168 @@
+"""Periodic background sync: pick stale connectors and fan out ingest_connector tasks.
+
+The beat-driven schedule_connector_syncs task calls fan_out() every settings.sync_interval_s.
+Connectors are ranked by how recently their user did something (suggest jobs, task events):
+- active users (settings.sync_active_window_s) are synced first;
+- recently seen users follow, one jitter window later;
+- idle users (settings.sync_idle_after_days) only sync every sync_idle_stale_after_s, last.
+Each task gets a random countdown inside its tier's window so a tick does not hit the
+providers (and their per-user quotas) all at once. A Redis marker per connector stops a
+connector from being queued again while an earlier sync is still pending, and
+acquire_slot()/release_slot() cap how many scheduled syncs run at once on one worker node.
+"""
+from __future__ import annotations
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services.redis_client import get_redis
+
+QUEUED_KEY = "mimir:sync:queued:{}"
+SLOTS_KEY = "mimir:sync:slots:{}"
+
+ACTIVE, RECENT, IDLE = 0, 1, 2
+
+
+def _aware(ts: datetime | None) -> datetime | None:
+    # SQLite hands back naive datetimes; everything here is UTC
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+
+def last_activity(db: Session, user_ids) -> Dict[Any, datetime]:
+    """Most recent sign of each user using the app: suggest jobs and task events."""
+    activity: Dict[Any, datetime] = {}
+    for column, user_col in (
+        (models.Job.created_at, models.Job.user_id),
+        (models.Event.ts, models.Event.user_id),
+    ):
+        rows = (
+            db.query(user_col, func.max(column))
+            .filter(user_col.in_(user_ids))
+            .group_by(user_col)
+            .all()
+        )
+        for user_id, ts in rows:
+            ts = _aware(ts)
+            if ts is not None and (user_id not in activity or ts > activity[user_id]):
+                activity[user_id] = ts
+    return activity
+
+
+def _tier(last_seen: datetime | None, now: datetime) -> int:
+    if last_seen is None:
+        return RECENT  # new users (no jobs yet) should have data waiting for them
+    if now - last_seen <= timedelta(seconds=settings.sync_active_window_s):
+        return ACTIVE
+    if now - last_seen <= timedelta(days=settings.sync_idle_after_days):
+        return RECENT
+    return IDLE
+
+
+def plan(db: Session, now: datetime | None = None) -> List[Dict[str, Any]]:
+    """Stale connected connectors to sync this tick, highest priority first, with countdowns."""
+    now = now or datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.sync_stale_after_s)
+    candidates = (
+        db.query(models.Connector)
+        .filter(
+            models.Connector.status == "connected",
+            models.Connector.access_token.isnot(None),
+            or_(
+                models.Connector.last_checked.is_(None),
+                models.Connector.last_checked < stale_before,
+            ),
+        )
+        .all()
+    )
+    if not candidates:
+        return []
+    activity = last_activity(db, {c.user_id for c in candidates})
+    idle_stale_before = now - timedelta(seconds=settings.sync_idle_stale_after_s)
+    ranked = []
+    for c in candidates:
+        last_seen = activity.get(c.user_id)
+        tier = _tier(last_seen, now)
+        last_checked = _aware(c.last_checked)
+        if tier == IDLE and last_checked is not None and last_checked >= idle_stale_before:
+            continue
+        # within a tier: most recently active users first, then the longest-unsynced connector
+        ranked.append(
+            (
+                tier,
+                -(last_seen or now).timestamp(),
+                (last_checked or datetime.min.replace(tzinfo=timezone.utc)).timestamp(),
+                c,
+            )
+        )
+    ranked.sort(key=lambda r: r[:3])
+    jitter = settings.sync_jitter_s
+    return [
+        {
+            "connector_id": str(c.id),
+            "kind": c.kind,
+            "user_id": str(c.user_id),
+            "tier": tier,
+            "countdown": round(tier * jitter + random.uniform(0, jitter), 3),
+        }
+        for tier, _, _, c in ranked[: settings.sync_fanout_max]
+    ]
+
+
+def fan_out(db: Session) -> int:
+    """Queue ingest_connector for each planned connector not already waiting for a sync."""
+    from app.worker import celery_app
+
+    r = get_redis()
+    queued = 0
+    for job in plan(db):
+        # the marker outlives the countdown plus a generous run; the task clears it when done
+        ttl = int(job["countdown"] + settings.sync_stale_after_s)
+        if not r.set(QUEUED_KEY.format(job["connector_id"]), 1, nx=True, ex=max(1, ttl)):
+            continue
+        celery_app.send_task(
+            "ingest_connector",
+            args=(job["kind"], job["user_id"]),
+            kwargs={"scheduled": True, "connector_id": job["connector_id"]},
+            queue="ingest",
+            countdown=job["countdown"],
+        )
+        queued += 1
+    return queued
+
+
+def acquire_slot(node: str, token: str) -> bool:
+    """Take one of settings.sync_node_concurrency scheduled-sync slots on `node`.
+
+    Slots are leased (sync_slot_lease_s) in a sorted set so a worker killed mid-sync
+    cannot leak one. Fails open when Redis is unreachable.
+    """
+    key = SLOTS_KEY.format(node)
+    now = time.time()
+    try:
+        r = get_redis()
+        pipe = r.pipeline()
+        pipe.zremrangebyscore(key, "-inf", now - settings.sync_slot_lease_s)
+        pipe.zadd(key, {token: now})
+        pipe.zrank(key, token)
+        pipe.expire(key, int(settings.sync_slot_lease_s))
+        _, _, rank, _ = pipe.execute()
+        if rank is not None and rank >= settings.sync_node_concurrency:
+            r.zrem(key, token)
+            return False
+        return True
+    except Exception:
+        return True
+
+
+def release_slot(node: str, token: str, connector_id: str | None = None) -> None:
+    try:
+        r = get_redis()
+        r.zrem(SLOTS_KEY.format(node), token)
+        if connector_id:
+            r.delete(QUEUED_KEY.format(connector_id))
+    except Exception:
+        pass
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init
 from kombu import Queue
 from app.config import settings
 
@@ -18,4 +19,49 @@ celery_app.conf.update(
         Queue("agent"),
         Queue("test"),
     ],
+    beat_schedule={
+        "refresh-expiring-credentials": {
+            "task": "refresh_expiring_credentials",
+            "schedule": settings.token_refresh_interval_s,
+        },
+        "schedule-connector-syncs": {
+            "task": "schedule_connector_syncs",
+            "schedule": settings.sync_interval_s,
+        },
+        # picks up batches left leased by a crashed flush even when nothing new is enqueued
+        "recover-embed-claims": {
+            "task": "embed_items",
+            "schedule": settings.embed_claim_lease_s,
+            "options": {"queue": "embed"},
+        },
+    },
 )
+
+
+@worker_process_init.connect
+def _prewarm_embedder(**_):
+    """Load the embedding model once per worker process instead of on the first ingest."""
+    if not settings.embedding_prewarm:
+        return
+    try:
+        from app.services.embeddings import warm_embedder
+
+        warm_embedder()
+    except Exception as e:  # pragma: no cover - model download may be unavailable
+        print(f"Embedding model pre-warm failed: {e}")
+
+
+@worker_process_init.connect
+def _serve_metrics(**_):
+    """Expose this worker process's Prometheus metrics (HTTP pools, embedding cache, ...)."""
+    if not settings.worker_metrics_port:
+        return
+    try:
+        from billiard.process import current_process
+        from prometheus_client import start_http_server
+
+        start_http_server(
+            settings.worker_metrics_port + (getattr(current_process(), "index", 0) or 0)
+        )
+    except Exception as e:  # pragma: no cover - port taken by another worker on the host
+        print(f"Worker metrics server failed to start: {e}")
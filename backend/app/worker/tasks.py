@@ -1,19 +1,22 @@
 from app.worker import celery_app
+from app.config import settings
 from app.db import session_scope
 from app import models
 from app.services import ingest as ingest_service
-from app.services.embeddings import embed_texts
-from app.services.connectors.base import get_connector_by_kind
-from app.services.crypto import decrypt_token
-from app.services import normalization
+from app.services import credentials, embed_queue, job_events, sync_scheduler
 from datetime import datetime, timezone
+import json
+import random
+import socket
+import uuid
 
 
 @celery_app.task(name="suggest_tasks_job", queue="agent")
 def suggest_tasks_job(job_id: str, user_id: str):
     """Celery job to generate suggested tasks (if needed) and recompute priorities.
 
-    Updates the jobs table with status/result.
+    Updates the jobs table with status/result and publishes stage events for the SSE
+    endpoint (app.services.job_events).
     """
     from app.services.agents import generate_suggested_tasks
     from app.services.ingest import ingest_data_for_user
@@ -31,6 +34,8 @@ def suggest_tasks_job(job_id: str, user_id: str):
         job.status = "in_progress"
         db.add(job)
         db.commit()
+        progress = job_events.publisher(job_id)
+        progress("started", {"status": "in_progress"})
         created = 0
         
         try:
@@ -39,7 +44,7 @@ def suggest_tasks_job(job_id: str, user_id: str):
             
             if connectors:
                 print("Processing with connectors - calling ingest_data_for_user")
-                created = ingest_data_for_user(db, user_id)
+                created = ingest_data_for_user(db, user_id, progress=progress)
                 print(f"Ingested {created} items from connectors")
             else:
                 print("No connectors found - generating suggested tasks")
@@ -53,19 +58,25 @@ def suggest_tasks_job(job_id: str, user_id: str):
                             db.add(t)
                         db.commit()
                         created = len(tasks)
+                        progress(
+                            "items_ingested",
+                            {"kind": "suggestion", "items": created, "created": created},
+                        )
                     else:
                         print("No suggested tasks generated")
                 else:
                     print(f"User not found: {user_id}")
             
             print(f"Refreshing priorities for user {user_id}")
-            refresh_priorities(db, user_id)
+            rescored = refresh_priorities(db, user_id)
+            progress("tasks_scored", {"rescored": rescored})
             
             job.status = "completed"
             job.result = {"created": created}
             job.updated_at = datetime.now(timezone.utc)
             db.add(job)
             db.commit()
+            progress("done", {"status": "completed", "created": created})
             print(f"Job {job_id} completed successfully with {created} items created")
             
         except Exception as e:  # pragma: no cover
@@ -76,6 +87,7 @@ def suggest_tasks_job(job_id: str, user_id: str):
             job.updated_at = datetime.now(timezone.utc)
             db.add(job)
             db.commit()
+            progress("failed", {"status": "failed", "error": str(e)})
             print(f"Job {job_id} failed and rolled back")
             
     print(f"Finished suggest_tasks_job for job_id: {job_id}")
@@ -87,15 +99,36 @@ def run_connector_test(kind: str, user_id: str):  # placeholder
     return {"status": "ok", "kind": kind}
 
 
-@celery_app.task(name="ingest_connector", queue="ingest")
-def ingest_connector(kind: str, user_id: str):
+@celery_app.task(name="schedule_connector_syncs", queue="ingest")
+def schedule_connector_syncs():
+    """Beat job: fan out background syncs for stale connectors, most active users first."""
     with session_scope() as db:
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            # TODO: proper logging
-            print(f"User not found: {user_id}")
-            return 0
+        queued = sync_scheduler.fan_out(db)
+    if queued:
+        print(f"Scheduled {queued} connector syncs")
+    return queued
+
+
+@celery_app.task(name="ingest_connector", queue="ingest", bind=True, max_retries=None)
+def ingest_connector(
+    self, kind: str, user_id: str, scheduled: bool = False, connector_id: str | None = None
+):
+    if not scheduled:
+        return _ingest_connector(kind, user_id)
+    node = self.request.hostname or socket.gethostname()
+    slot = self.request.id or f"{kind}:{user_id}"
+    if not sync_scheduler.acquire_slot(node, slot):
+        # this node is already running its share of background syncs; try again shortly
+        raise self.retry(countdown=random.uniform(1, settings.sync_jitter_s))
+    try:
+        return _ingest_connector(kind, user_id)
+    finally:
+        sync_scheduler.release_slot(node, slot, connector_id)
 
+
+def _ingest_connector(kind: str, user_id: str):
+    """Sync one connector through the same ingest pipeline the API uses, then prioritise."""
+    with session_scope() as db:
         connector_model = (
             db.query(models.Connector)
             .filter(models.Connector.user_id == user_id, models.Connector.kind == kind)
@@ -105,80 +138,58 @@ def ingest_connector(kind: str, user_id: str):
             print(f"Connector not configured for {kind} for user {user_id}")
             return 0
 
-        connector_service = get_connector_by_kind(kind)
-        if not connector_service:
-            print(f"No connector service for kind: {kind}")
-            return 0
+        pipeline = ingest_service.build_pipeline(prioritise=lambda uid: run_agents.delay(str(uid)))
+        return ingest_service.sync_connector(db, user_id, connector_model, pipeline)
 
-        try:
-            token = decrypt_token(connector_model.access_token)
-            # special handling for jira
-            if kind == "jira" and connector_model.meta:
-                token["cloud_id"] = connector_model.meta.get("cloud_id")
-            connector_instance = connector_service(token=token)
-            raw_items = connector_instance.fetch()
-        except Exception as e:
-            # TODO: proper logging
-            print(f"Failed to fetch from {kind}: {e}")
-            # can also mark connector as failed
-            return 0
 
-        created_tasks = []
-        for item in raw_items:
-            try:
-                task = normalization.normalise_and_create_task(db, user, connector_model, item)
-                created_tasks.append(task)
-            except Exception as e:
-                # TODO: proper logging
-                print(f"Failed to normalise item {item.get('id')}: {e}")
-                continue
-        
-        if created_tasks:
-            # TODO: make this async
-            texts = [c.title for c in created_tasks]
-            metadatas = [{"user_id": user_id, "kind": kind, "task_id": str(c.id)} for c in created_tasks]
-            ids = [str(c.id) for c in created_tasks]
-            embed_texts(texts, metadatas, ids)
-        
-        # Trigger agent-based prioritization
-        if created_tasks:
-            run_agents.delay(user_id)
-            
-        return len(created_tasks)
+@celery_app.task(name="refresh_expiring_credentials", queue="ingest")
+def refresh_expiring_credentials():
+    """Beat job: refresh connector tokens before they expire so no sync starts with a dead one."""
+    with session_scope() as db:
+        refreshed = credentials.refresh_expiring(db)
+    if refreshed:
+        print(f"Refreshed {refreshed} expiring connector tokens")
+    return refreshed
 
 
 @celery_app.task(name="embed_items", queue="embed")
-def embed_items(user_id: str, items: list[dict]):  # placeholder
-    return len(items)
+def embed_items():
+    """Flush one micro-batch of buffered embedding work (any mix of users/jobs) in bulk.
+
+    The batch is leased, not removed, until its rows commit. If the bulk write fails, it is
+    retried per (user, provider) so one bad item or provider only holds back its own group;
+    groups that still fail go back to the buffer (or the dead-letter list) via finish().
+    """
+    embed_queue.recover_expired()
+    claim_id, claimed = embed_queue.claim(settings.embed_flush_size)
+    if not claimed:
+        embed_queue.reschedule()
+        return 0
+    written = 0
+    failed = []
+    try:
+        with session_scope() as db:
+            written = embed_queue.write_embeddings(db, [json.loads(raw) for raw in claimed])
+    except Exception as e:
+        print(
+            f"Embedding flush of {len(claimed)} items failed ({e}); retrying per user and provider"
+        )
+        for group in embed_queue.split_by_owner(claimed):
+            try:
+                with session_scope() as db:
+                    written += embed_queue.write_embeddings(db, [json.loads(raw) for raw in group])
+            except Exception:
+                failed.extend(group)
+    embed_queue.finish(claim_id, failed)
+    embed_queue.reschedule()
+    return written
 
 
 @celery_app.task(name="run_agents", queue="agent")
 def run_agents(user_id: str):
-    from app.services import agents as agent_service
-    from app.services.prioritise import calculate_priority
-    
+    """Rescore the tasks that ingest or edits queued, or every changed one if Redis is down."""
+    from app.services import prioritise
+
+    dirty = prioritise.drain_dirty(user_id)
     with session_scope() as db:
-        tasks_to_process = db.query(models.Task).filter(
-            models.Task.user_id == user_id,
-            models.Task.status != models.StatusEnum.done,
-            # To avoid re-processing, we could add a filter here, e.g., based on a timestamp
-            # or a flag indicating that the task has been prioritized.
-            # For now, we re-prioritize all active tasks.
-        ).all()
-        
-        count = 0
-        for task in tasks_to_process:
-            try:
-                factors = agent_service.get_factors(task)
-                task.priority_factors = factors
-                task.priority = calculate_priority(factors)
-                if factors.get("suggested_horizon"):
-                    task.horizon = models.HorizonEnum(factors["suggested_horizon"])
-                db.add(task)
-                count += 1
-            except Exception as e:
-                # TODO: proper logging
-                print(f"Failed to prioritize task {task.id}: {e}")
-                continue
-        db.commit()
-    return count
+        return prioritise.refresh_priorities(db, uuid.UUID(str(user_id)), task_ids=dirty)
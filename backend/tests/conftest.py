@@ -0,0 +1,168 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+
+
+class FakePipeline:
+    """Queues commands and runs them against the FakeRedis on execute()."""
+
+    def __init__(self, r):
+        self.r = r
+        self.calls = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        out = [getattr(self.r, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return out
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for the services' keys, lists, sets, sorted sets and pub/sub."""
+
+    def __init__(self):
+        self.kv = {}
+        self.lists = {}
+        self.sets = {}
+        self.zsets = {}
+        self.ttl_ms = {}
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value.encode() if isinstance(value, str) else value
+        if ex is not None or px is not None:
+            self.ttl_ms[key] = px if px is not None else ex * 1000
+        return True
+
+    def get(self, key):
+        return self.kv.get(key)
+
+    def mget(self, keys):
+        return [self.kv.get(k) for k in keys]
+
+    def incr(self, key):
+        self.kv[key] = int(self.kv.get(key, 0)) + 1
+        return self.kv[key]
+
+    def delete(self, *keys):
+        return sum(
+            any(
+                store.pop(k, None) is not None
+                for store in (self.kv, self.lists, self.sets, self.zsets)
+            )
+            for k in keys
+        )
+
+    def expire(self, key, seconds):
+        self.ttl_ms[key] = seconds * 1000
+        return True
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    def lpush(self, key, *values):
+        self.lists[key] = list(reversed(values)) + self.lists.get(key, [])
+        return len(self.lists[key])
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start : end + 1]
+
+    def lmove(self, src, dest, wherefrom, whereto):
+        if not self.lists.get(src):
+            return None
+        value = self.lists[src].pop(0 if wherefrom == "LEFT" else -1)
+        if whereto == "LEFT":
+            self.lists.setdefault(dest, []).insert(0, value)
+        else:
+            self.lists.setdefault(dest, []).append(value)
+        return value
+
+    def lrem(self, key, count, value):
+        if value in self.lists.get(key, []):
+            self.lists[key].remove(value)
+            return 1
+        return 0
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(
+            m.encode() if isinstance(m, str) else m for m in members
+        )
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+    def zrangebyscore(self, key, lo, hi):
+        lo, hi = float(lo), float(hi)
+        return [
+            m
+            for m, score in sorted(self.zsets.get(key, {}).items(), key=lambda kv: kv[1])
+            if lo <= score <= hi
+        ]
+
+    def zrank(self, key, member):
+        ordered = sorted(self.zsets.get(key, {}).items(), key=lambda kv: kv[1])
+        return [m for m, _ in ordered].index(member) if member in self.zsets.get(key, {}) else None
+
+    def zremrangebyscore(self, key, lo, hi):
+        z = self.zsets.setdefault(key, {})
+        for member in [m for m, score in z.items() if score <= hi]:
+            del z[member]
+
+
+class FakeCelery:
+    def __init__(self):
+        self.sent = []
+
+    def send_task(self, name, **kwargs):
+        self.sent.append((name, kwargs))
+
+
+@pytest.fixture
+def fake_redis():
+    """A fresh FakeRedis; test modules patch it in where their service looks Redis up."""
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_celery(monkeypatch):
+    celery = FakeCelery()
+    monkeypatch.setattr("app.worker.celery_app", celery)
+    return celery
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -1,4 +1,8 @@
+import json
+import threading
+import time
 import types
+import pytest
 from app.services import agents
 from app import models
 from datetime import datetime, timezone, date
@@ -161,3 +165,163 @@ def test_get_factors_crewai_mock(monkeypatch):
     assert factors["strategy"] == "crewai"
     assert factors["urgency"] == 0.7
     assert factors["suggested_horizon"] == "today"
+
+
+@pytest.fixture
+def fresh_limits(monkeypatch):
+    monkeypatch.setattr(agents, "_breakers", {})
+    monkeypatch.setattr(agents, "_slots", {})
+
+
+def test_get_factors_batch_scores_many_tasks_per_call(monkeypatch, fresh_limits):
+    tasks = [DummyTask(title=f"Task {i}") for i in range(5)]
+    for i, t in enumerate(tasks):
+        t.id = f"task-{i}"
+    monkeypatch.setattr(agents.settings, "enable_crewai", True)
+    monkeypatch.setattr(agents.settings, "crewai_batch_size", 3)
+    prompts = []
+
+    class MockCrew:
+        def __init__(self, tasks, **kwargs):
+            self.prompt = tasks[0]["description"]
+
+        def kickoff(self):
+            prompts.append(self.prompt)
+            entries = [
+                {
+                    "id": "task-0",
+                    "urgency": 0.9,
+                    "importance": 0.8,
+                    "recency": 0.7,
+                    "source_signal": 0.6,
+                    "suggested_horizon": "today",
+                },
+                {"id": "task-1", "urgency": "high"},  # invalid: falls back to heuristics
+                {
+                    "id": "task-3",
+                    "urgency": 0.2,
+                    "importance": 0.2,
+                    "recency": 0.2,
+                    "source_signal": 0.2,
+                    "suggested_horizon": "month",
+                },
+            ]
+            return "```json\n" + json.dumps(entries) + "\n```"
+
+    monkeypatch.setattr(agents, "Agent", lambda **kwargs: kwargs)
+    monkeypatch.setattr(agents, "CrewTask", lambda **kwargs: kwargs)
+    monkeypatch.setattr(agents, "Crew", MockCrew)
+
+    factors = agents.get_factors_batch(tasks)
+    assert len(prompts) == 2  # 5 tasks at 3 per call
+    assert sum('"id": "task-4"' in p for p in prompts) == 1
+    assert factors["task-0"]["strategy"] == "crewai" and factors["task-0"]["urgency"] == 0.9
+    assert factors["task-3"]["suggested_horizon"] == "month"
+    # invalid and missing entries are scored heuristically, per task
+    assert factors["task-1"] == agents._heuristic_factors(tasks[1])
+    assert factors["task-2"]["strategy"] == "heuristic"
+    assert factors["task-4"]["strategy"] == "heuristic"
+
+
+def _slow_model(monkeypatch, delay, calls):
+    def fake_crewai_factors(task, raise_errors=False):
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return {
+            "urgency": 0.9,
+            "importance": 0.9,
+            "recency": 0.9,
+            "source_signal": 0.9,
+            "suggested_horizon": "today",
+            "strategy": "crewai",
+        }
+
+    monkeypatch.setattr(agents, "_crewai_factors", fake_crewai_factors)
+    monkeypatch.setattr(agents.settings, "crewai_batch_size", 1)
+
+
+def test_model_scoring_runs_calls_concurrently(monkeypatch, fresh_limits):
+    calls = []
+    _slow_model(monkeypatch, 0.2, calls)
+    monkeypatch.setattr(agents.settings, "crewai_concurrency", 4)
+    started = time.monotonic()
+    factors = agents._crewai_factors_many([DummyTask(title=f"Task {i}") for i in range(8)])
+    elapsed = time.monotonic() - started
+    assert [f["strategy"] for f in factors] == ["crewai"] * 8
+    assert elapsed < 1.0  # 8 calls of 0.2s, 4 at a time, not 1.6s in sequence
+    assert len(set(calls)) > 1
+
+
+def test_slow_model_times_out_and_opens_circuit(monkeypatch, fresh_limits):
+    calls = []
+    _slow_model(monkeypatch, 0.5, calls)
+    monkeypatch.setattr(agents.settings, "crewai_concurrency", 2)
+    monkeypatch.setattr(agents.settings, "crewai_call_timeout_s", 0.1)
+    monkeypatch.setattr(agents.settings, "crewai_breaker_threshold", 2)
+    tasks = [DummyTask(title=f"Task {i}") for i in range(2)]
+    factors = agents._crewai_factors_many(tasks)
+    assert [f["strategy"] for f in factors] == ["heuristic", "heuristic"]
+    assert len(calls) == 2
+    # the breaker is open: no more calls reach the model
+    factors = agents._crewai_factors_many(tasks)
+    assert [f["strategy"] for f in factors] == ["heuristic", "heuristic"]
+    assert len(calls) == 2
+
+
+def test_failing_model_opens_circuit(monkeypatch, fresh_limits):
+    tasks = [DummyTask(title=f"Task {i}") for i in range(6)]
+    for i, t in enumerate(tasks):
+        t.id = f"task-{i}"
+    monkeypatch.setattr(agents.settings, "crewai_batch_size", 2)
+    monkeypatch.setattr(agents.settings, "crewai_concurrency", 1)
+    monkeypatch.setattr(agents.settings, "crewai_breaker_threshold", 2)
+    calls = []
+
+    class FailingCrew:
+        def __init__(self, tasks, **kwargs):
+            pass
+
+        def kickoff(self):
+            calls.append(1)
+            raise RuntimeError("provider unavailable")
+
+    monkeypatch.setattr(agents, "Agent", lambda **kwargs: kwargs)
+    monkeypatch.setattr(agents, "CrewTask", lambda **kwargs: kwargs)
+    monkeypatch.setattr(agents, "Crew", FailingCrew)
+
+    factors = agents._crewai_factors_many(tasks)
+    assert [f["strategy"] for f in factors] == ["heuristic"] * 6
+    # two fast failures open the breaker; the third chunk never reaches the model
+    assert len(calls) == 2
+    breaker, _ = agents._model_limits(agents.settings.crewai_model or agents.DEFAULT_MODEL)
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_probe_through_after_cooldown(monkeypatch):
+    monkeypatch.setattr(agents.settings, "crewai_breaker_threshold", 1)
+    monkeypatch.setattr(agents.settings, "crewai_breaker_cooldown_s", 0.0)
+    breaker = agents.CircuitBreaker()
+    breaker.record(False)
+    assert not breaker.is_open()  # cooled down: half-open
+    assert breaker.allow() is True  # the probe
+    assert breaker.allow() is False  # everyone else waits for its outcome
+    breaker.record(False)  # failed probe re-opens
+    assert breaker.allow() is True
+    breaker.record(True)  # successful probe closes
+    assert breaker.allow() is True and breaker.allow() is True
+
+
+def test_timed_out_calls_give_their_slots_back(monkeypatch, fresh_limits):
+    calls = []
+    _slow_model(monkeypatch, 0.5, calls)
+    monkeypatch.setattr(agents.settings, "crewai_concurrency", 1)
+    monkeypatch.setattr(agents.settings, "crewai_call_timeout_s", 0.1)
+    monkeypatch.setattr(agents.settings, "crewai_breaker_threshold", 10)
+    agents._crewai_factors_many([DummyTask(title="Hangs")])
+    _, slots = agents._model_limits(agents.settings.crewai_model or agents.DEFAULT_MODEL)
+    # the abandoned thread is still sleeping, but its slot is free for the next call
+    assert slots.acquire(blocking=False)
+    slots.release()
+    time.sleep(0.5)  # the abandoned thread finishes without releasing the slot twice
+    assert slots.acquire(blocking=False)
+    slots.release()
@@ -0,0 +1,284 @@
+from types import SimpleNamespace
+import httplib2
+from googleapiclient.errors import HttpError
+from app.services.connectors import base
+
+CONFIG = SimpleNamespace(
+    oauth_google_client_id="cid",
+    oauth_google_client_secret="secret",
+    oauth_github_client_id="gid",
+    oauth_github_client_secret="gsecret",
+    oauth_atlassian_client_id="aid",
+    oauth_atlassian_client_secret="asecret",
+    oauth_redirect_base="http://localhost:8000",
+)
+
+
+class Call:
+    """Stand-in for a googleapiclient request: .execute() returns the canned response."""
+
+    def __init__(self, log, name, kwargs, response):
+        self.log, self.name, self.kwargs, self.response = log, name, kwargs, response
+
+    def execute(self):
+        self.log.append((self.name, self.kwargs))
+        return self.response(**self.kwargs) if callable(self.response) else self.response
+
+
+class FakeBatch:
+    def __init__(self, log, callback):
+        self.log, self.callback, self.requests = log, callback, []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.log.append(("batch", len(self.requests)))
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.execute(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class FakeResource:
+    def __init__(self, log, responses, prefix=""):
+        self._log, self._responses, self._prefix = log, responses, prefix
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self._log, callback)
+
+    def __getattr__(self, name):
+        path = f"{self._prefix}{name}"
+
+        def method(**kwargs):
+            if path in self._responses:
+                return Call(self._log, path, kwargs, self._responses[path])
+            return FakeResource(self._log, self._responses, path + ".")
+
+        return method
+
+
+def _msg(mid, labels=("IMPORTANT",)):
+    return {
+        "id": mid,
+        "threadId": "t" + mid,
+        "labelIds": list(labels),
+        "snippet": "snippet " + mid,
+        "payload": {"headers": [{"name": "Subject", "value": "Subject " + mid}]},
+    }
+
+
+def test_gmail_first_sync_records_history_id(monkeypatch):
+    log = []
+    messages = {"m1": _msg("m1"), "m2": _msg("m2")}
+    responses = {
+        "users.getProfile": {"historyId": "500"},
+        "users.messages.list": {"messages": [{"id": "m1"}, {"id": "m2"}]},
+        "users.messages.get": lambda userId, id, **kw: messages[id],
+    }
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    conn = base.GmailConnector("u", CONFIG, access_token="tok")
+    items = conn.fetch()
+    assert [i["source_ref"] for i in items] == ["m1", "m2"]
+    assert conn.next_cursor == "500"
+
+
+def test_gmail_incremental_sync_uses_history(monkeypatch):
+    log = []
+    messages = {"m3": _msg("m3", ("STARRED",)), "m4": _msg("m4", ("INBOX",))}
+    responses = {
+        "users.history.list": {
+            "history": [{"messagesAdded": [{"message": {"id": "m3"}}, {"message": {"id": "m4"}}]}],
+            "historyId": "650",
+        },
+        "users.messages.get": lambda userId, id, **kw: messages[id],
+    }
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    conn = base.GmailConnector("u", CONFIG, access_token="tok", cursor="500")
+    items = conn.fetch()
+    # only the important/starred message is kept; no full listing happened
+    assert [i["source_ref"] for i in items] == ["m3"]
+    assert conn.next_cursor == "650"
+    assert not any(name == "users.messages.list" for name, _ in log)
+    assert log[0][1]["startHistoryId"] == "500"
+
+
+def test_drive_incremental_sync_uses_changes(monkeypatch):
+    log = []
+    f = {
+        "id": "f1",
+        "name": "Doc",
+        "webViewLink": "http://d/f1",
+        "modifiedTime": "2026-01-01T00:00:00Z",
+        "mimeType": "text/plain",
+    }
+    pages = {
+        "tok1": {
+            "changes": [{"fileId": "f1", "file": f}, {"fileId": "f2", "removed": True}],
+            "nextPageToken": "tok2",
+        },
+        "tok2": {"changes": [], "newStartPageToken": "tok3"},
+    }
+    responses = {"changes.list": lambda pageToken, **kw: pages[pageToken]}
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    conn = base.GoogleDriveConnector("u", CONFIG, access_token="tok", cursor="tok1")
+    items = conn.fetch()
+    assert [i["source_ref"] for i in items] == ["f1"]
+    assert conn.next_cursor == "tok3"
+
+
+
+def test_drive_rejected_changes_token_falls_back_to_full_listing(monkeypatch):
+    log = []
+    f = {
+        "id": "f1",
+        "name": "Doc",
+        "webViewLink": "http://d/f1",
+        "modifiedTime": "2026-01-01T00:00:00Z",
+        "mimeType": "text/plain",
+    }
+
+    def expired(pageToken, **kw):
+        raise HttpError(
+            httplib2.Response({"status": 404}), b'{"error": {"message": "Invalid pageToken"}}'
+        )
+
+    responses = {
+        "changes.list": expired,
+        "changes.getStartPageToken": {"startPageToken": "fresh"},
+        "files.list": {"files": [f]},
+    }
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    conn = base.GoogleDriveConnector("u", CONFIG, access_token="tok", cursor="stale")
+    items = conn.fetch()
+    assert [i["source_ref"] for i in items] == ["f1"]
+    assert conn.next_cursor == "fresh"
+
+def test_github_incremental_sync_passes_since(monkeypatch):
+    seen = []
+
+    class Resp:
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def fake_get(url, params=None, token=None):
+        seen.append((url, params))
+        return Resp({"items": []} if "/search/" in url else [])
+
+    conn = base.GithubConnector("u", CONFIG, access_token="tok", cursor="2026-03-04T05:06:07+00:00")
+    monkeypatch.setattr(conn.client, "get", fake_get)
+    conn.fetch()
+    assert seen[0][1]["since"] == "2026-03-04T05:06:07Z"
+    assert "updated:>=2026-03-04T05:06:07Z" in seen[1][1]["q"]
+    assert conn.next_cursor is not None
+
+
+def test_gmail_first_sync_paginates(monkeypatch):
+    log = []
+    pages = {
+        None: {"messages": [{"id": "m1"}, {"id": "m2"}], "nextPageToken": "p2"},
+        "p2": {"messages": [{"id": "m3"}]},
+    }
+    responses = {
+        "users.getProfile": {"historyId": "9"},
+        "users.messages.list": lambda userId, q, maxResults, pageToken: pages[pageToken],
+        "users.messages.get": lambda userId, id, **kw: _msg(id),
+    }
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    conn = base.GmailConnector("u", CONFIG, access_token="tok")
+    got = [[i["source_ref"] for i in page] for page in conn.fetch_pages()]
+    assert got == [["m1", "m2"], ["m3"]]
+    assert conn.next_cursor == "9"
+
+
+def test_github_follows_link_header(monkeypatch):
+    calls = []
+
+    class Resp:
+        def __init__(self, data, next_url=None):
+            self.data = data
+            self.links = {"next": {"url": next_url}} if next_url else {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def issue(n):
+        return {
+            "title": f"t{n}",
+            "body": "",
+            "number": n,
+            "html_url": "",
+            "labels": [],
+            "repository": {"full_name": "o/r"},
+        }
+
+    def fake_get(url, params=None, token=None):
+        calls.append((url, params))
+        if url == "https://api.github.com/issues":
+            return Resp([issue(1), issue(2)], next_url="https://api.github.com/issues?page=2")
+        if url.endswith("page=2"):
+            return Resp([issue(3)])
+        return Resp({"items": []})
+
+    conn = base.GithubConnector("u", CONFIG, access_token="tok")
+    monkeypatch.setattr(conn.client, "get", fake_get)
+    pages = list(conn.fetch_pages())
+    assert [[i["source_ref"] for i in p] for p in pages] == [["o/r#1", "o/r#2"], ["o/r#3"]]
+    assert calls[1] == ("https://api.github.com/issues?page=2", None)
+
+
+def test_gmail_metadata_batched_and_throttled_retried(monkeypatch):
+    log = []
+    attempts = {}
+
+    def get(userId, id, format, metadataHeaders):
+        attempts[id] = attempts.get(id, 0) + 1
+        if id == "m7" and attempts[id] == 1:
+            raise Throttled("rateLimitExceeded")
+        return _msg(id)
+
+    ids = [f"m{i}" for i in range(150)]
+    responses = {
+        "users.getProfile": {"historyId": "1"},
+        "users.messages.list": {"messages": [{"id": i} for i in ids]},
+        "users.messages.get": get,
+    }
+    monkeypatch.setattr(base, "google_service", lambda *a, **kw: FakeResource(log, responses))
+    monkeypatch.setattr(base.time, "sleep", lambda s: None)
+    conn = base.GmailConnector("u", CONFIG, access_token="tok")
+    items = conn.fetch()
+    assert [i["source_ref"] for i in items] == ids
+    # 150 messages -> two batch calls of <=100, then one retry batch holding only the throttled one
+    assert [n for name, n in log if name == "batch"] == [100, 50, 1]
+    assert attempts["m7"] == 2 and attempts["m8"] == 1
+
+
+def test_google_service_reuses_parsed_discovery_doc(monkeypatch):
+    from google.oauth2.credentials import Credentials
+
+    base._discovery_docs.clear()
+    loads = []
+    real = base.discovery_cache.get_static_doc
+    monkeypatch.setattr(
+        base.discovery_cache, "get_static_doc", lambda *a: loads.append(a) or real(*a)
+    )
+    first = base.google_service("gmail", "v1", Credentials(token="a"))
+    second = base.google_service("gmail", "v1", Credentials(token="b"))
+    assert loads == [("gmail", "v1")]
+    assert first is not second
+    assert first._http.credentials.token == "a"
+    assert second._http.credentials.token == "b"
@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import models
+from app.services import credentials, crypto
+
+
+@pytest.fixture
+def db(db):
+    try:
+        yield db
+    finally:
+        credentials.invalidate()
+
+
+@pytest.fixture
+def decrypts(monkeypatch):
+    calls = []
+    real = crypto.decrypt_token
+    monkeypatch.setattr(crypto, "decrypt_token", lambda blob: calls.append(blob) or real(blob))
+    monkeypatch.setattr(credentials, "_refresh_lock", lambda conn_id: lambda: None)
+    return calls
+
+
+def _connector(db, token_data):
+    user = models.User(id=uuid.uuid4(), display_name="Test")
+    conn = models.Connector(user_id=user.id, kind="jira", status="connected")
+    credentials.store(conn, token_data)
+    db.add_all([user, conn])
+    db.commit()
+    credentials.invalidate()
+    return conn
+
+
+def _in(minutes):
+    return (datetime.now(timezone.utc) + timedelta(minutes=minutes)).isoformat()
+
+
+def test_load_caches_until_ciphertext_changes(db, decrypts):
+    conn = _connector(db, {"access_token": "a1", "expires_at": _in(60)})
+    assert credentials.load(conn)["access_token"] == "a1"
+    assert credentials.load(conn)["access_token"] == "a1"
+    assert len(decrypts) == 1
+
+    # another writer (e.g. the OAuth callback in a different process) replaces the row
+    conn.access_token = crypto.encrypt('{"access_token": "a2"}')
+    assert credentials.load(conn)["access_token"] == "a2"
+    assert len(decrypts) == 2
+
+
+class FakeJira:
+    refreshed = []
+
+    def __init__(self, user_id, config, access_token=None, cursor=None):
+        self.token_data = access_token
+
+    def refresh(self):
+        FakeJira.refreshed.append(self.token_data["refresh_token"])
+        return {"access_token": "new", "refresh_token": "r2", "expires_at": _in(60)}
+
+
+def test_for_connector_refreshes_near_expiry(db, decrypts, monkeypatch):
+    FakeJira.refreshed = []
+    monkeypatch.setattr(credentials, "get_connector_by_kind", lambda kind: FakeJira)
+    fresh = _connector(db, {"access_token": "ok", "refresh_token": "r0", "expires_at": _in(60)})
+    assert credentials.for_connector(db, fresh)["access_token"] == "ok"
+    assert FakeJira.refreshed == []
+
+    stale = _connector(
+        db,
+        {"access_token": "old", "refresh_token": "r1", "expires_at": _in(1), "meta": {"url": "x"}},
+    )
+    token = credentials.for_connector(db, stale)
+    assert FakeJira.refreshed == ["r1"]
+    assert token["access_token"] == "new"
+    assert token["meta"] == {"url": "x"}  # fields the provider does not return are kept
+    db.expire_all()
+    stored = crypto.decrypt_token(db.get(models.Connector, stale.id).access_token)
+    assert stored["refresh_token"] == "r2"
+
+
+def test_refresh_expiring_only_touches_expiring_rows(db, decrypts, monkeypatch):
+    FakeJira.refreshed = []
+    monkeypatch.setattr(credentials, "get_connector_by_kind", lambda kind: FakeJira)
+    _connector(db, {"access_token": "a", "refresh_token": "later", "expires_at": _in(120)})
+    soon = _connector(db, {"access_token": "b", "refresh_token": "soon", "expires_at": _in(5)})
+    assert credentials.refresh_expiring(db) == 1
+    assert FakeJira.refreshed == ["soon"]
+    db.expire_all()
+    assert credentials.load(db.get(models.Connector, soon.id))["access_token"] == "new"
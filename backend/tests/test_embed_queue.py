@@ -0,0 +1,124 @@
+import json
+import uuid
+import pytest
+from app import models
+from app.services import embed_queue
+
+
+@pytest.fixture
+def queue(monkeypatch, fake_redis, fake_celery):
+    r, celery = fake_redis, fake_celery
+    monkeypatch.setattr(embed_queue, "get_redis", lambda: r)
+    monkeypatch.setattr(embed_queue, "redis_available", lambda: True)
+    monkeypatch.setattr(embed_queue.settings, "embed_flush_size", 3)
+    monkeypatch.setattr(embed_queue.settings, "embed_flush_deadline_s", 1.5)
+    return r, celery
+
+
+def _items(n, user_id=None):
+    user_id = user_id or uuid.uuid4()
+    return [embed_queue.make_item(user_id, "gmail", uuid.uuid4(), f"title {i}") for i in range(n)]
+
+
+def test_enqueue_schedules_one_deadline_flush(queue):
+    r, celery = queue
+    embed_queue.enqueue(_items(1))
+    embed_queue.enqueue(_items(1))
+    assert r.llen(embed_queue.PENDING_KEY) == 2
+    assert celery.sent == [("embed_items", {"queue": "embed", "countdown": 1.5})]
+    # reaching the flush size triggers an immediate flush
+    embed_queue.enqueue(_items(1))
+    assert celery.sent[-1] == ("embed_items", {"queue": "embed"})
+
+
+def test_claim_finish_and_reschedule(queue):
+    r, celery = queue
+    embed_queue.enqueue(_items(2) + _items(2))  # two users in one buffer
+    claim_id, claimed = embed_queue.claim(3)
+    assert len(claimed) == 3
+    assert r.llen(embed_queue.PENDING_KEY) == 1
+    assert r.llen(embed_queue.PROCESSING_KEY.format(claim_id)) == 3
+    embed_queue.finish(claim_id)
+    assert r.llen(embed_queue.PROCESSING_KEY.format(claim_id)) == 0
+    assert r.zsets[embed_queue.CLAIMS_KEY] == {}
+    celery.sent.clear()
+    embed_queue.reschedule()
+    assert celery.sent == [("embed_items", {"queue": "embed", "countdown": 1.5})]
+
+
+def test_failed_items_go_to_the_back_then_dead_letter(queue, monkeypatch):
+    r, _ = queue
+    monkeypatch.setattr(embed_queue.settings, "embed_max_attempts", 2)
+    bad, good = _items(1), _items(2)
+    embed_queue.enqueue(bad + good)
+    claim_id, claimed = embed_queue.claim(1)
+    embed_queue.finish(claim_id, failed=claimed)
+    pending = [json.loads(x) for x in r.lists[embed_queue.PENDING_KEY]]
+    assert [it["task_id"] for it in pending] == [it["task_id"] for it in good + bad]
+    assert pending[-1]["attempts"] == 1
+
+    embed_queue.claim(2)  # the good ones
+    claim_id, claimed = embed_queue.claim(1)
+    embed_queue.finish(claim_id, failed=claimed)
+    assert r.llen(embed_queue.PENDING_KEY) == 0
+    assert json.loads(r.lists[embed_queue.DEAD_KEY][0])["task_id"] == bad[0]["task_id"]
+
+
+def test_expired_claims_are_recovered(queue, monkeypatch):
+    r, _ = queue
+    embed_queue.enqueue(_items(3))
+    monkeypatch.setattr(embed_queue.settings, "embed_claim_lease_s", -1)  # already expired
+    claim_id, _ = embed_queue.claim(2)  # the flush dies here, before finish()
+    assert embed_queue.recover_expired() == 2
+    assert r.llen(embed_queue.PENDING_KEY) == 3
+    assert embed_queue.recover_expired() == 0
+
+
+def test_split_by_owner_groups_per_user_and_provider():
+    user = uuid.uuid4()
+    items = (
+        _items(2, user)
+        + _items(1)
+        + [embed_queue.make_item(user, "gmail", uuid.uuid4(), "t", [1.0], "bedrock/titan")]
+    )
+    groups = embed_queue.split_by_owner([json.dumps(it) for it in items])
+    assert [len(g) for g in groups] == [2, 1, 1]
+
+
+def test_submit_publishes_only_after_commit(queue, db):
+    r, _ = queue
+    db.connection()  # submit always follows a flush inside an open transaction
+    embed_queue.submit(db, _items(2))
+    assert r.llen(embed_queue.PENDING_KEY) == 0
+    db.rollback()
+    db.commit()
+    assert r.llen(embed_queue.PENDING_KEY) == 0  # rolled back work is dropped
+    db.connection()
+    embed_queue.submit(db, _items(2))
+    db.commit()
+    assert r.llen(embed_queue.PENDING_KEY) == 2
+
+
+def test_write_embeddings_bulk_across_users(db, monkeypatch):
+    added = []
+    embedded = []
+
+    def fake_embed_batch(texts):
+        embedded.append(list(texts))
+        return [[1.0, 0.0] for _ in texts], "default"
+
+    monkeypatch.setattr(embed_queue, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(
+        embed_queue,
+        "embed_texts",
+        lambda texts, metas, ids, vectors=None, provider=None: (
+            added.append(metas[0]["user_id"]) or ids
+        ),
+    )
+    items = _items(2) + _items(3)
+    items[0]["vector"], items[0]["provider"] = [0.5, 0.5], "default"
+    assert embed_queue.write_embeddings(db, json.loads(json.dumps(items))) == 5
+    # one embedding call for the items without vectors, one Chroma write per user
+    assert len(embedded) == 1 and len(embedded[0]) == 4
+    assert len(added) == 2
+    assert db.query(models.Embedding).count() == 5
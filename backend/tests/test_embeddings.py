@@ -0,0 +1,155 @@
+import pytest
+from prometheus_client import REGISTRY
+from app.services import embeddings
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    c = embeddings.EmbeddingCache(None, max_entries=3)
+    monkeypatch.setattr(embeddings, "_cache", c)
+    return c
+
+
+@pytest.fixture
+def default_model(monkeypatch):
+    calls = []
+
+    def fake_default(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    monkeypatch.setattr(embeddings, "_default_embed", fake_default)
+    monkeypatch.setattr(embeddings.settings, "litellm_provider", None)
+    return calls
+
+
+def test_cache_hits_skip_model(cache, default_model):
+    vectors, provider = embeddings.embed_batch(["Weekly sync", "Budget", "Weekly sync"])
+    assert provider == "default"
+    assert vectors[0] == vectors[2]
+    # duplicates within a batch are embedded once
+    assert default_model == [["Weekly sync", "Budget"]]
+
+    again, _ = embeddings.embed_batch(["  Weekly   sync ", "Budget"])
+    assert again == vectors[:2]
+    assert len(default_model) == 1
+    stats = embeddings.cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+
+
+def test_cache_lru_eviction(cache, default_model):
+    evicted = (
+        REGISTRY.get_sample_value("mimir_embedding_cache_events_total", {"event": "evictions"}) or 0
+    )
+    for t in ["a", "b", "c"]:
+        embeddings.embed_batch([t])
+    embeddings.embed_batch(["a"])  # touch "a" so "b" is the least recently used
+    embeddings.embed_batch(["d"])
+    assert cache.size() == 3
+    assert cache.stats["evictions"] == 1
+    assert (
+        REGISTRY.get_sample_value("mimir_embedding_cache_events_total", {"event": "evictions"})
+        == evicted + 1
+    )
+    cached = cache.get_many("default", embeddings.DEFAULT_EMBEDDING_MODEL, ["a", "b", "c", "d"])
+    assert [v is not None for v in cached] == [True, False, True, True]
+
+
+def test_bedrock_fallback_does_not_mix_models(cache, default_model, monkeypatch):
+    monkeypatch.setattr(
+        embeddings.settings, "litellm_provider", "bedrock/amazon.titan-embed-text-v2"
+    )
+    monkeypatch.setattr(
+        embeddings, "_bedrock_embed", lambda texts: [[9.0, 9.0, 9.0] for _ in texts]
+    )
+    vectors, provider = embeddings.embed_batch(["cached on bedrock"])
+    assert provider.startswith("bedrock")
+
+    def boom(texts):
+        raise RuntimeError("throttled")
+
+    monkeypatch.setattr(embeddings, "_bedrock_embed", boom)
+    vectors, provider = embeddings.embed_batch(["cached on bedrock", "new title"])
+    assert provider == embeddings.FALLBACK_PROVIDER
+    # the whole batch comes from the default model, including the bedrock-cached title
+    assert all(len(v) == 2 for v in vectors)
+
+
+def test_get_embedder_is_process_singleton(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    loads = []
+
+    class FakeEmbedder:
+        def __init__(self, intra_op_threads=0, batch_size=32):
+            self.batch_size = batch_size
+
+        def load(self):
+            loads.append(1)
+            return 0.0
+
+    monkeypatch.setattr(embeddings, "LocalEmbedder", FakeEmbedder)
+    monkeypatch.setattr(embeddings, "_embedder", None)
+    monkeypatch.setattr(embeddings.settings, "embedding_batch_size", 64)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(lambda _: embeddings.get_embedder(), range(32)))
+    assert len({id(i) for i in instances}) == 1
+    assert loads == [1]
+    assert instances[0].batch_size == 64
+    assert embeddings._default_embedding_fn() is instances[0]
+
+
+def test_cache_errors_fail_open(cache, default_model):
+    embeddings.embed_batch(["Budget"])
+
+    class LockedConnection:
+        def execute(self, *args):
+            raise embeddings.sqlite3.OperationalError("database is locked")
+
+        executemany = execute
+
+    cache._conn = LockedConnection()
+    vectors, provider = embeddings.embed_batch(["Budget", "Weekly sync"])
+    assert provider == "default"
+    assert vectors == [[6.0, 0.5], [11.0, 0.5]]
+    # both texts went to the model, and the failed write was skipped rather than raised
+    assert default_model[-1] == ["Budget", "Weekly sync"]
+    assert cache.stats["errors"] == 2
+
+
+def test_fallback_vectors_get_their_own_collection(monkeypatch):
+    added = {}
+
+    class FakeCollection:
+        def __init__(self, name):
+            self.name = name
+
+        def add(self, ids, documents, embeddings, metadatas):
+            added.setdefault(self.name, []).extend(embeddings)
+
+    class FakeClient:
+        def get_collection(self, name):
+            return FakeCollection(name)
+
+    monkeypatch.setattr(embeddings, "get_client", lambda: FakeClient())
+    user_id = "0f0f0f0f-0000-0000-0000-000000000001"
+    embeddings.embed_texts(
+        ["a"],
+        [{"user_id": user_id, "kind": "gmail"}],
+        ["1"],
+        vectors=[[9.0, 9.0, 9.0]],
+        provider="bedrock/amazon.titan-embed-text-v2",
+    )
+    embeddings.embed_texts(
+        ["b"],
+        [{"user_id": user_id, "kind": "gmail"}],
+        ["2"],
+        vectors=[[1.0, 0.5]],
+        provider=embeddings.FALLBACK_PROVIDER,
+    )
+    base = embeddings._collection_name(user_id)
+    assert added == {
+        base: [[9.0, 9.0, 9.0]],
+        f"{base}_{embeddings.FALLBACK_PROVIDER}": [[1.0, 0.5]],
+    }
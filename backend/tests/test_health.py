@@ -15,3 +15,10 @@ def test_readyz():
     r = client.get("/readyz")
     assert r.status_code == 200
     assert "status" in r.json()
+
+
+def test_stats_reports_http_pools_and_embedding_cache():
+    r = client.get("/healthz/stats")
+    assert r.status_code == 200
+    assert isinstance(r.json()["http_pools"], dict)
+    assert r.json()["embedding_cache"]["size"] >= 0
@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from app.services import http_pool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{srv.server_address[1]}"
+    finally:
+        srv.shutdown()
+        srv.server_close()
+        http_pool.reset()
+
+
+def test_httpx_clients_share_one_connection(server):
+    for _ in range(3):
+        # a new client per call, as connectors do, closed after use
+        with httpx.Client(transport=http_pool.transport("test-httpx")) as client:
+            assert client.get(server).text == "ok"
+    assert http_pool.transport("test-httpx") is http_pool.transport("test-httpx")
+    stats = http_pool.pool_stats()["test-httpx"]
+    assert stats["requests"] == 3
+    assert stats["connections"] == 1
+    assert stats["reuse_rate"] == pytest.approx(2 / 3, abs=1e-3)
+    gauge = REGISTRY.get_sample_value("mimir_http_pool_reuse_ratio", {"provider": "test-httpx"})
+    assert gauge == stats["reuse_rate"]
+
+
+def test_requests_sessions_share_one_connection(server):
+    for _ in range(3):
+        s = http_pool.session("test-requests")
+        assert s.get(server).text == "ok"
+        s.close()
+    stats = http_pool.pool_stats()["test-requests"]
+    assert stats["requests"] == 3
+    assert stats["connections"] == 1
@@ -0,0 +1,319 @@
+import uuid
+import zlib
+import numpy as np
+import pytest
+from app import models
+from app.services import embed_queue, ingest
+
+
+@pytest.fixture
+def user(db):
+    u = models.User(id=uuid.uuid4(), display_name="Test")
+    db.add(u)
+    db.flush()
+    return u
+
+
+@pytest.fixture
+def fake_vectors(monkeypatch):
+    """Patch embedding + vector search so tests run without a model or Chroma."""
+    calls = {"embed": [], "query": [], "add": []}
+
+    def fake_embed_batch(texts):
+        calls["embed"].append(list(texts))
+        # deterministic, effectively orthogonal vectors per distinct title
+        return [
+            np.random.default_rng(zlib.crc32(t.encode())).normal(size=16).tolist() for t in texts
+        ], "default"
+
+    def fake_find_similar_batch(user_id, vectors, top_k=1, provider=None):
+        calls["query"].append(list(vectors))
+        return [[] for _ in vectors]
+
+    def fake_embed_texts(texts, metadatas, ids, vectors=None, provider=None):
+        calls["add"].append({"texts": list(texts), "vectors": vectors, "provider": provider})
+        return ids
+
+    monkeypatch.setattr(ingest, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingest, "find_similar_batch", fake_find_similar_batch)
+    monkeypatch.setattr(embed_queue, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(embed_queue, "redis_available", lambda: False)  # write inline
+    return calls
+
+
+def _raw(n, prefix="Item"):
+    return [{"id": f"{prefix}-{i}", "title": f"{prefix} number {i}"} for i in range(n)]
+
+
+def test_dedupe_new_embeds_batch_once(db, user, fake_vectors):
+    tasks = ingest.normalise_items(user.id, "gmail", _raw(5))
+    kept, vectors, provider = ingest.dedupe_new(db, user.id, tasks)
+    assert len(kept) == 5
+    assert len(vectors) == 5
+    assert provider == "default"
+    assert len(fake_vectors["embed"]) == 1
+    assert len(fake_vectors["query"]) == 1
+    assert len(fake_vectors["query"][0]) == 5
+
+
+def test_dedupe_new_drops_near_duplicates(db, user, fake_vectors, monkeypatch):
+    def near(user_id, vectors, top_k=1, provider=None):
+        # first candidate has a close neighbour already stored
+        return [[{"id": "x", "distance": 0.01, "metadata": {}}]] + [[] for _ in vectors[1:]]
+
+    monkeypatch.setattr(ingest, "find_similar_batch", near)
+    tasks = ingest.normalise_items(user.id, "gmail", _raw(3))
+    kept, vectors, _ = ingest.dedupe_new(db, user.id, tasks)
+    assert [t["source_ref"] for t in kept] == ["Item-1", "Item-2"]
+    assert len(vectors) == 2
+
+
+def test_ingest_connector_reuses_dedupe_vectors(db, user, fake_vectors):
+    connector = models.Connector(user_id=user.id, kind="gmail", status="connected")
+    db.add(connector)
+    db.flush()
+    created = ingest.ingest_connector(db, user.id, connector, _raw(4))
+    assert len(created) == 4
+    # titles embedded exactly once; stored vectors are the ones computed for dedupe
+    assert len(fake_vectors["embed"]) == 1
+    assert len(fake_vectors["add"]) == 1
+    assert fake_vectors["add"][0]["vectors"] is not None
+    assert len(fake_vectors["add"][0]["vectors"]) == 4
+    db.flush()
+    assert db.query(models.Embedding).count() == 4
+
+    # second sync of the same refs creates nothing and embeds nothing new
+    again = ingest.ingest_connector(db, user.id, connector, _raw(4))
+    assert again == []
+    assert len(fake_vectors["embed"]) == 1
+
+
+def test_batch_duplicates_title_ref_and_similarity():
+    tasks = [
+        {"source_kind": "github", "source_ref": "12", "title": "Fix login bug"},
+        {"source_kind": "github", "source_ref": "12", "title": "Fix login bug (PR)"},
+        {"source_kind": "gmail", "source_ref": "a", "title": "Re: Budget review"},
+        {"source_kind": "gmail", "source_ref": "b", "title": "re  budget review"},
+        {"source_kind": "gmail", "source_ref": "c", "title": "Quarterly planning"},
+        {"source_kind": "gmail", "source_ref": "d", "title": "Quarterly planning session"},
+        {"source_kind": "jira", "source_ref": "X-1", "title": "Unrelated"},
+    ]
+    vectors = [
+        [1, 0, 0],
+        [0.5, 0.5, 0],
+        [0, 1, 0],
+        [0, 0.9, 0.1],
+        [0, 0, 1],
+        [0, 0.01, 1],
+        [1, 1, 1],
+    ]
+    dup = ingest._batch_duplicates(tasks, vectors)
+    assert dup.tolist() == [False, True, False, True, False, True, False]
+
+
+def test_dedupe_new_collapses_batch_duplicates(db, user, fake_vectors):
+    raw = [
+        {"id": "m1", "title": "Re: Launch checklist"},
+        {"id": "m2", "title": "RE: launch checklist"},
+        {"id": "m3", "title": "Something else"},
+    ]
+    tasks = ingest.normalise_items(user.id, "gmail", raw)
+    kept, vectors, _ = ingest.dedupe_new(db, user.id, tasks)
+    assert [t["source_ref"] for t in kept] == ["m1", "m3"]
+    assert len(vectors) == 2
+    # only the survivors are checked against the stored vectors
+    assert len(fake_vectors["query"][0]) == 2
+
+
+def test_persist_tasks_bulk_insert_returns_ids(db, user):
+    tasks = ingest.normalise_items(user.id, "jira", _raw(50, prefix="JIRA"))
+    rows = ingest.persist_tasks(db, tasks)
+    assert len(rows) == 50
+    assert all(isinstance(r["id"], uuid.UUID) for r in rows)
+    stored = db.get(models.Task, rows[7]["id"])
+    assert stored.title == "JIRA number 7"
+    assert stored.horizon == models.HorizonEnum.week
+    assert stored.status == models.StatusEnum.todo
+
+
+def test_resync_refreshes_existing_items(db, user, fake_vectors):
+    connector = models.Connector(user_id=user.id, kind="jira", status="connected")
+    db.add(connector)
+    db.flush()
+    raw = [
+        {"source_ref": "ABC-1", "title": "Old summary", "description": "v1", "due": "2026-01-02"}
+    ]
+    created = ingest.ingest_connector(db, user.id, connector, raw)
+    assert len(created) == 1
+    task = db.get(models.Task, created[0]["id"])
+    task.status = models.StatusEnum.in_progress
+    db.flush()
+
+    raw = [
+        {"source_ref": "ABC-1", "title": "New summary", "description": "v2", "due": "2026-02-03"}
+    ]
+    assert ingest.ingest_connector(db, user.id, connector, raw) == []
+    db.expire_all()
+    tasks = db.query(models.Task).filter(models.Task.user_id == user.id).all()
+    assert len(tasks) == 1
+    assert tasks[0].title == "New summary"
+    assert tasks[0].description == "v2"
+    assert tasks[0].due_date.isoformat() == "2026-02-03"
+    assert tasks[0].status == models.StatusEnum.in_progress  # user state untouched
+    # refreshed items never reach the vector dedupe
+    assert len(fake_vectors["embed"]) == 1
+
+
+def test_known_refs_only_reads_batch_keys(db, user):
+    ingest.persist_tasks(
+        db,
+        ingest.normalise_items(
+            user.id, "github", [{"source_ref": i, "title": f"t{i}"} for i in range(20)]
+        ),
+    )
+    batch = ingest.normalise_items(
+        user.id, "github", [{"source_ref": 3, "title": "x"}, {"source_ref": 99, "title": "y"}]
+    )
+    assert ingest.known_refs(db, user.id, batch) == {("github", "3")}
+
+
+def test_ingest_data_for_user_fetches_concurrently_with_timeout(
+    db, user, fake_vectors, monkeypatch
+):
+    import threading
+    import time
+
+    release = threading.Event()
+
+    class Fake:
+        def __init__(self, user_id, config, access_token=None, cursor=None):
+            self.next_cursor = None
+
+    class Fast(Fake):
+        def fetch_pages(self):
+            yield _raw(2, prefix="Fast")
+            self.next_cursor = "fast-cursor"
+
+    class Hanging(Fake):
+        def fetch_pages(self):
+            yield _raw(1, prefix="Slow")
+            release.wait(5)  # provider never answers the second page in time
+            yield _raw(1, prefix="Late")
+
+    kinds = {"github": Fast, "jira": Hanging}
+    monkeypatch.setattr(ingest, "get_connector_by_kind", lambda kind: kinds[kind])
+    monkeypatch.setattr(ingest.settings, "connector_fetch_timeout_s", 0.3)
+    monkeypatch.setattr(ingest.settings, "connector_fetch_concurrency", 2)
+    for kind in kinds:
+        db.add(models.Connector(user_id=user.id, kind=kind, status="connected"))
+    db.commit()
+
+    started = time.monotonic()
+    try:
+        created = ingest.ingest_data_for_user(db, user.id)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert created == 3  # the page the slow connector delivered before its deadline is kept
+    by_kind = {c.kind: c for c in db.query(models.Connector).all()}
+    assert by_kind["github"].meta["sync_cursor"] == "fast-cursor"
+    assert by_kind["github"].last_checked is not None
+    assert by_kind["jira"].status == "connected"  # a timeout is retried by the next sync
+    assert "timed out" in by_kind["jira"].status_message
+    titles = {t.title for t in db.query(models.Task).all()}
+    assert not any(t.startswith("Late") for t in titles)
+
+
+def test_fetch_timeout_only_counts_the_wait_on_the_provider(db, user, fake_vectors, monkeypatch):
+    import time
+
+    class Backfill:
+        def __init__(self, user_id, config, access_token=None, cursor=None):
+            self.next_cursor = None
+
+        def fetch_pages(self):
+            for i in range(4):
+                yield _raw(1, prefix=f"Page{i}")
+
+    real_run_page = ingest.Pipeline.run_page
+
+    def slow_run_page(self, *args, **kwargs):
+        time.sleep(0.15)  # the consumer, not the provider, is slow
+        return real_run_page(self, *args, **kwargs)
+
+    monkeypatch.setattr(ingest, "get_connector_by_kind", lambda kind: Backfill)
+    monkeypatch.setattr(ingest.Pipeline, "run_page", slow_run_page)
+    monkeypatch.setattr(ingest.settings, "connector_fetch_timeout_s", 0.3)
+    monkeypatch.setattr(ingest.settings, "connector_fetch_concurrency", 1)
+    db.add(models.Connector(user_id=user.id, kind="github", status="connected"))
+    db.commit()
+
+    assert ingest.ingest_data_for_user(db, user.id) == 4  # 0.6s in total, but never 0.3s waiting
+    conn = db.query(models.Connector).one()
+    assert conn.status_message is None and conn.last_checked is not None
+
+
+def test_sync_connector_runs_staged_pipeline(db, user, fake_vectors, monkeypatch):
+    class Paged:
+        def __init__(self, user_id, config, access_token=None, cursor=None):
+            self.next_cursor = None
+
+        def fetch_pages(self):
+            yield _raw(5, prefix="A")
+            yield _raw(2, prefix="B")
+            self.next_cursor = "c1"
+
+    monkeypatch.setattr(ingest, "get_connector_by_kind", lambda kind: Paged)
+    monkeypatch.setattr(ingest.settings, "ingest_batch_size", 3)
+    conn = models.Connector(user_id=user.id, kind="jira", status="connected")
+    db.add(conn)
+    db.commit()
+    commits = []
+    monkeypatch.setattr(db, "commit", lambda real=db.commit: commits.append(1) or real())
+    prioritised = []
+
+    pipeline = ingest.build_pipeline(prioritise=prioritised.append)
+    runs = []
+    monkeypatch.setattr(
+        pipeline,
+        "finish",
+        lambda db_, run, real=pipeline.finish: runs.append(run) or real(db_, run),
+    )
+    assert ingest.sync_connector(db, user.id, conn, pipeline) == 7
+
+    run = runs[0]
+    assert run.batches == 3  # the 5-item page is split at the batch size
+    assert len(commits) == 3 + 1  # one per batch, plus the cursor update
+    assert set(run.timings) >= {
+        "fetch",
+        "normalise",
+        "dedupe",
+        "persist",
+        "embed",
+        "prioritise",
+        "commit",
+    }
+    assert prioritised == [user.id]  # once per run, not per page
+    assert conn.meta["sync_cursor"] == "c1"
+    assert db.query(models.Task).count() == 7
+
+
+def test_persist_isolates_bad_rows_with_savepoints(db, user, fake_vectors, monkeypatch):
+    conn = models.Connector(user_id=user.id, kind="gmail", status="connected")
+    db.add(conn)
+    db.commit()
+    real = ingest.normalise_items
+
+    def with_bad_row(user_id, kind, raw):
+        tasks = real(user_id, kind, raw)
+        tasks[1]["user_id"] = None  # violates NOT NULL
+        return tasks
+
+    monkeypatch.setattr(ingest, "normalise_items", with_bad_row)
+    pipeline = ingest.build_pipeline()
+    run = pipeline.new_run(user.id)
+    pipeline.run_page(db, user.id, conn, _raw(4), run)
+    assert run.failed == 1
+    assert len(run.created) == 3
+    assert db.query(models.Task).count() == 3
+    assert {t.source_ref for t in db.query(models.Task)} == {"Item-0", "Item-2", "Item-3"}
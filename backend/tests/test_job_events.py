@@ -0,0 +1,98 @@
+import asyncio
+import json
+from app.services import job_events
+
+
+class FakeAsyncPubSub:
+    def __init__(self, live):
+        self.live = list(live)
+        self.subscribed = []
+
+    async def subscribe(self, channel):
+        self.subscribed.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        return {"type": "message", "data": self.live.pop(0)} if self.live else None
+
+    async def aclose(self):
+        pass
+
+
+class FakeAsyncRedis:
+    def __init__(self, log, live):
+        self.log = log
+        self.pubsub_obj = FakeAsyncPubSub(live)
+
+    def pubsub(self):
+        return self.pubsub_obj
+
+    async def lrange(self, key, start, end):
+        return list(self.log)
+
+    async def aclose(self):
+        pass
+
+
+def test_publish_appends_to_replay_log_and_channel(monkeypatch, fake_redis):
+    r = fake_redis
+    monkeypatch.setattr(job_events, "get_redis", lambda: r)
+    progress = job_events.publisher("job-1")
+    progress("connectors_fetched", {"kind": "jira", "status": "ok"})
+    progress("done", {"status": "completed"})
+    log = [json.loads(m) for m in r.lists[job_events.LOG_KEY.format("job-1")]]
+    assert [(e["seq"], e["event"]) for e in log] == [(1, "connectors_fetched"), (2, "done")]
+    assert [c for c, _ in r.published] == [job_events.CHANNEL.format("job-1")] * 2
+
+
+def test_stream_replays_log_then_follows_channel_without_duplicates(monkeypatch):
+    def msg(seq, event, data=None):
+        return json.dumps({"seq": seq, "event": event, "data": data or {}}).encode()
+
+    log = [msg(1, "started"), msg(2, "connectors_fetched", {"kind": "jira"})]
+    # seq 2 was published after we subscribed but before the log was read: sent once only
+    live = [
+        msg(2, "connectors_fetched", {"kind": "jira"}),
+        msg(3, "tasks_scored", {"rescored": 4}),
+        msg(4, "done"),
+    ]
+    monkeypatch.setattr(
+        job_events.aioredis.Redis, "from_url", lambda *a, **k: FakeAsyncRedis(log, live)
+    )
+
+    async def connected():
+        return False
+
+    async def collect():
+        return [frame async for frame in job_events.stream("job-1", connected)]
+
+    frames = [f.decode() for f in asyncio.run(collect())]
+    assert [f.split("\n")[0] for f in frames] == [
+        "event: started",
+        "event: connectors_fetched",
+        "event: tasks_scored",
+        "event: done",
+    ]
+    assert frames[2] == 'event: tasks_scored\ndata: {"rescored": 4}\n\n'
+
+
+def test_stream_ends_from_the_job_row_when_the_final_event_is_lost(monkeypatch):
+    log = [json.dumps({"seq": 1, "event": "started", "data": {}}).encode()]
+    monkeypatch.setattr(
+        job_events.aioredis.Redis, "from_url", lambda *a, **k: FakeAsyncRedis(log, [])
+    )
+    monkeypatch.setattr(job_events.settings, "job_events_poll_s", 0.0)
+    polls = []
+
+    async def connected():
+        return False
+
+    async def poll_job():
+        polls.append(1)
+        return b"event: done\ndata: {}\n\n" if len(polls) == 2 else None
+
+    async def collect():
+        return [frame async for frame in job_events.stream("job-1", connected, poll_job)]
+
+    frames = asyncio.run(collect())
+    assert [f.split(b"\n")[0] for f in frames] == [b"event: started", b"event: done"]
+    assert len(polls) == 2
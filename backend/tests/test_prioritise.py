@@ -0,0 +1,221 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import models
+from app.config import settings
+from sqlalchemy import update
+from app.services import agents, factor_cache, prioritise
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    monkeypatch.setattr(settings, "enable_crewai", False)
+    calls = []
+    real = agents.heuristic_factor_arrays
+
+    def counting_factor_arrays(rows, now=None):
+        calls.extend(r.id for r in rows)
+        return real(rows, now)
+
+    monkeypatch.setattr(agents, "heuristic_factor_arrays", counting_factor_arrays)
+    return calls
+
+
+@pytest.fixture
+def fake_redis(fake_redis, monkeypatch):
+    r = fake_redis
+    monkeypatch.setattr(prioritise, "get_redis", lambda: r)
+    monkeypatch.setattr(factor_cache, "get_redis", lambda: r)
+    return r
+
+
+def _tasks(db, n):
+    user = models.User(id=uuid.uuid4(), display_name="Test")
+    db.add(user)
+    tasks = [
+        models.Task(
+            user_id=user.id,
+            title=f"Task {i}",
+            horizon=models.HorizonEnum.month,
+            status=models.StatusEnum.todo,
+        )
+        for i in range(n)
+    ]
+    db.add_all(tasks)
+    db.commit()
+    return user, tasks
+
+
+def test_refresh_only_rescores_changed_tasks(db, scored, fake_redis):
+    user, tasks = _tasks(db, 3)
+    assert prioritise.refresh_priorities(db, user.id) == 3
+    assert all(t.priority is not None and t.priority_fingerprint for t in tasks)
+
+    scored.clear()
+    assert prioritise.refresh_priorities(db, user.id) == 0
+    assert scored == []
+
+    tasks[1].title = "Task 1, renamed"
+    db.commit()
+    assert prioritise.refresh_priorities(db, user.id) == 1
+    assert scored == [tasks[1].id]
+
+
+def test_task_edits_feed_the_dirty_set(db, scored, fake_redis):
+    user, tasks = _tasks(db, 3)
+    prioritise.refresh_priorities(db, user.id)
+    # the full pass drained what the inserts queued, and its own writes queue nothing
+    assert prioritise.drain_dirty(user.id) == set()
+
+    tasks[0].description = "now with details"
+    tasks[2].priority = 0.1  # not a factor input
+    db.commit()
+    dirty = prioritise.drain_dirty(user.id)
+    assert dirty == {str(tasks[0].id)}
+
+    scored.clear()
+    assert prioritise.refresh_priorities(db, user.id, task_ids=dirty) == 1
+    assert scored == [tasks[0].id]
+    assert prioritise.refresh_priorities(db, user.id, task_ids=set()) == 0
+
+
+def test_vectorised_heuristics_match_scalar_path(db, scored, fake_redis):
+    user = models.User(id=uuid.uuid4(), display_name="Test")
+    db.add(user)
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    variants = []
+    for due in (
+        None,
+        today - timedelta(days=3),
+        today,
+        today + timedelta(days=2),
+        today + timedelta(days=5),
+        today + timedelta(days=30),
+    ):
+        for kind, ref in (
+            ("jira", "J-1"),
+            ("github", None),
+            ("gmail", "m1"),
+            ("gdrive", "d1"),
+            (None, None),
+        ):
+            for horizon in (
+                models.HorizonEnum.today,
+                models.HorizonEnum.week,
+                models.HorizonEnum.month,
+                models.HorizonEnum.past7d,
+            ):
+                for age_h in (1, 12, 48, 200):
+                    variants.append(
+                        models.Task(
+                            user_id=user.id,
+                            title=f"T{len(variants)}",
+                            source_kind=kind,
+                            source_ref=ref and f"{ref}-{len(variants)}",
+                            due_date=due,
+                            horizon=horizon,
+                            status=models.StatusEnum.todo,
+                            created_at=now - timedelta(hours=age_h),
+                        )
+                    )
+    db.add_all(variants)
+    db.commit()
+    expected = {}
+    for t in variants:
+        factors = agents._heuristic_factors(t)
+        horizon = prioritise.escalate(t.horizon.value, factors["suggested_horizon"])
+        priority = prioritise.compute_priority(type("T", (), {"horizon": horizon})(), factors)
+        expected[t.id] = (factors, horizon, priority)
+
+    assert prioritise.refresh_priorities(db, user.id) == len(variants)
+    for t in db.query(models.Task).filter(models.Task.user_id == user.id):
+        factors, horizon, priority = expected[t.id]
+        assert t.priority_factors == factors
+        assert t.horizon.value == horizon
+        assert t.priority == priority
+
+
+def test_model_factors_are_cached_by_content(db, monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "enable_crewai", True)
+    asked = []
+
+    def fake_model(tasks):
+        asked.extend(t.title for t in tasks)
+        return [
+            {
+                "urgency": 0.9,
+                "importance": 0.9,
+                "recency": 0.1,
+                "source_signal": 0.9,
+                "suggested_horizon": "week",
+                "strategy": "crewai",
+            }
+            for _ in tasks
+        ]
+
+    monkeypatch.setattr(agents, "_crewai_factors_many", fake_model)
+    user, tasks = _tasks(db, 3)
+    assert prioritise.refresh_priorities(db, user.id) == 3
+    assert sorted(asked) == ["Task 0", "Task 1", "Task 2"]
+    assert len(fake_redis.kv) == 3
+    assert all(db.get(models.Task, t.id).horizon == models.HorizonEnum.week for t in tasks)
+
+    # force a rescore of unchanged content: served from the cache (the escalated horizon is
+    # the scorer's own write, not new content), recency from the clock
+    asked.clear()
+    db.execute(update(models.Task).values(priority_fingerprint=None))
+    db.commit()
+    assert prioritise.refresh_priorities(db, user.id) == 3
+    assert asked == []
+    t = db.get(models.Task, tasks[0].id)
+    assert t.priority_factors["urgency"] == 0.9 and t.priority_factors["recency"] == 0.9
+
+    # editing a task drops its old entry and only that task goes back to the model
+    t.title = "Task 0, renamed"
+    db.commit()
+    assert len(fake_redis.kv) == 2
+    assert prioritise.refresh_priorities(db, user.id) == 1
+    assert asked == ["Task 0, renamed"]
+
+
+def test_tiered_scoring_sends_only_top_tasks_to_the_model(db, monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "enable_crewai", True)
+    monkeypatch.setattr(settings, "crewai_top_k", 1)
+    monkeypatch.setattr(settings, "crewai_boundary_margin", 0.0)
+    asked = []
+
+    def fake_batch(tasks):
+        asked.extend(t.source_kind for t in tasks)
+        return {t.id: {**agents._heuristic_factors(t), "strategy": "crewai"} for t in tasks}
+
+    monkeypatch.setattr(agents, "get_factors_batch", fake_batch)
+    user = models.User(id=uuid.uuid4(), display_name="Test")
+    db.add(user)
+    tasks = {
+        kind: models.Task(
+            user_id=user.id,
+            title=kind,
+            source_kind=kind,
+            horizon=models.HorizonEnum.month,
+            status=models.StatusEnum.todo,
+        )
+        for kind in ("jira", "github", "gmail", "gdrive")
+    }
+    db.add_all(tasks.values())
+    db.commit()
+
+    assert prioritise.refresh_priorities(db, user.id) == 4
+    assert asked == ["jira"]  # the heuristic ranks jira first; the rest stay heuristic
+    assert db.get(models.Task, tasks["gmail"].id).priority_factors["strategy"] == "heuristic"
+
+    asked.clear()
+    assert prioritise.refresh_priorities(db, user.id) == 0
+    assert asked == []
+
+    # once the top task is done, the next one moves up and is promoted to the model
+    tasks["jira"].status = models.StatusEnum.done
+    db.commit()
+    assert prioritise.refresh_priorities(db, user.id) == 1
+    assert asked == ["github"]
+    assert db.get(models.Task, tasks["github"].id).priority_factors["strategy"] == "crewai"
@@ -0,0 +1,88 @@
+import time
+import httpx
+import pytest
+from app.services import rate_limit
+
+
+@pytest.fixture
+def limiter(monkeypatch, fake_redis):
+    r = fake_redis
+    sleeps = []
+    monkeypatch.setattr(rate_limit, "_redis", lambda: r)
+    monkeypatch.setattr(
+        rate_limit, "acquire", lambda *a, **kw: None
+    )  # bucket itself lives in Redis/Lua
+    monkeypatch.setattr(rate_limit.time, "sleep", sleeps.append)
+    return r, sleeps
+
+
+def _status_error(status, headers):
+    request = httpx.Request("GET", "https://api.github.com/issues")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("throttled", request=request, response=response)
+
+
+def test_header_delay_variants():
+    assert rate_limit.header_delay({"retry-after": "7"}) == 7
+    reset = time.time() + 60
+    assert (
+        59
+        < rate_limit.header_delay(
+            {"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(int(reset))}
+        )
+        <= 62
+    )
+    iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(reset))
+    assert (
+        59 < rate_limit.header_delay({"x-ratelimit-remaining": "0", "x-ratelimit-reset": iso}) <= 62
+    )
+    assert (
+        rate_limit.header_delay(
+            {"x-ratelimit-remaining": "12", "x-ratelimit-reset": str(int(reset))}
+        )
+        is None
+    )
+
+
+def test_call_retries_after_retry_after_and_publishes_block(limiter):
+    r, sleeps = limiter
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _status_error(429, {"Retry-After": "2"})
+        return "ok"
+
+    assert rate_limit.call("github", "u1", fn) == "ok"
+    assert sleeps == [2.0, 2.0]
+    assert r.ttl_ms == {"mimir:ratelimit:github:u1:blocked": 2000}
+
+
+def test_call_gives_up_when_quota_resets_too_late(limiter):
+    r, sleeps = limiter
+    reset = str(int(time.time() + 3600))
+
+    def fn():
+        raise _status_error(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+
+    with pytest.raises(rate_limit.RateLimited):
+        rate_limit.call("github", "u1", fn)
+    assert sleeps == []
+    # other workers still back off until the reset
+    assert r.ttl_ms["mimir:ratelimit:github:u1:blocked"] > 3500 * 1000
+
+
+def test_call_does_not_retry_other_errors(limiter):
+    _, sleeps = limiter
+    with pytest.raises(httpx.HTTPStatusError):
+        rate_limit.call("github", "u1", lambda: (_ for _ in ()).throw(_status_error(404, {})))
+    assert sleeps == []
+
+
+def test_exhausted_quota_on_success_blocks_next_calls(limiter):
+    r, _ = limiter
+    reset = str(int(time.time() + 20))
+    resp = httpx.Response(200, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+    assert rate_limit.call("github", "u1", lambda: resp) is resp
+    assert 19000 < r.ttl_ms["mimir:ratelimit:github:u1:blocked"] <= 22000
@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from app import models
+from app.services import sync_scheduler
+
+NOW = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _user(db, name, active_ago=None, last_checked_ago=None, kind="github"):
+    user = models.User(id=uuid.uuid4(), display_name=name)
+    db.add(user)
+    if active_ago is not None:
+        db.add(
+            models.Job(
+                user_id=user.id,
+                status="done",
+                job_type="suggest_tasks",
+                created_at=NOW - active_ago,
+            )
+        )
+    conn = models.Connector(
+        user_id=user.id,
+        kind=kind,
+        status="connected",
+        access_token="x",
+        last_checked=NOW - last_checked_ago if last_checked_ago is not None else None,
+    )
+    db.add(conn)
+    db.commit()
+    return conn
+
+
+def test_plan_orders_by_activity_and_skips_fresh(db):
+    idle_recent = _user(
+        db,
+        "idle, synced 1h ago",
+        active_ago=timedelta(days=30),
+        last_checked_ago=timedelta(hours=1),
+    )
+    idle_stale = _user(
+        db, "idle, synced 1d ago", active_ago=timedelta(days=30), last_checked_ago=timedelta(days=1)
+    )
+    fresh = _user(
+        db,
+        "active, just synced",
+        active_ago=timedelta(minutes=5),
+        last_checked_ago=timedelta(minutes=1),
+    )
+    recent = _user(
+        db, "seen 3 days ago", active_ago=timedelta(days=3), last_checked_ago=timedelta(hours=2)
+    )
+    active = _user(
+        db, "active", active_ago=timedelta(minutes=10), last_checked_ago=timedelta(hours=2)
+    )
+    new = _user(db, "new, never synced")
+
+    jobs = sync_scheduler.plan(db, now=NOW)
+    ids = [j["connector_id"] for j in jobs]
+    assert str(fresh.id) not in ids
+    assert str(idle_recent.id) not in ids  # idle users sync on the longer interval
+    assert ids[0] == str(active.id)
+    assert set(ids[1:3]) == {str(recent.id), str(new.id)}
+    assert ids[3] == str(idle_stale.id)
+    jitter = sync_scheduler.settings.sync_jitter_s
+    for job in jobs:
+        assert job["tier"] * jitter <= job["countdown"] <= (job["tier"] + 1) * jitter
+
+
+def test_fan_out_does_not_requeue_pending_connectors(db, monkeypatch, fake_redis, fake_celery):
+    r, celery = fake_redis, fake_celery
+    monkeypatch.setattr(sync_scheduler, "get_redis", lambda: r)
+    conn = _user(db, "active", active_ago=timedelta(minutes=1))
+
+    assert sync_scheduler.fan_out(db) == 1
+    name, kwargs = celery.sent[0]
+    assert name == "ingest_connector"
+    assert kwargs["args"] == ("github", str(conn.user_id))
+    assert kwargs["kwargs"] == {"scheduled": True, "connector_id": str(conn.id)}
+    assert sync_scheduler.fan_out(db) == 0  # still waiting for the first one
+
+    sync_scheduler.release_slot("node", "t", str(conn.id))
+    assert sync_scheduler.fan_out(db) == 1
+
+
+def test_node_slots_cap_concurrent_syncs(monkeypatch, fake_redis):
+    r = fake_redis
+    monkeypatch.setattr(sync_scheduler, "get_redis", lambda: r)
+    monkeypatch.setattr(sync_scheduler.settings, "sync_node_concurrency", 2)
+    assert sync_scheduler.acquire_slot("node-a", "t1")
+    assert sync_scheduler.acquire_slot("node-a", "t2")
+    assert not sync_scheduler.acquire_slot("node-a", "t3")
+    assert sync_scheduler.acquire_slot("node-b", "t3")  # the cap is per node
+    sync_scheduler.release_slot("node-a", "t1")
+    assert sync_scheduler.acquire_slot("node-a", "t3")
+
+
+def test_failed_sync_backs_off_instead_of_stopping(db, monkeypatch):
+    from app.services import ingest, rate_limit
+
+    class Failing:
+        next_cursor = None
+
+        def __init__(self, error):
+            self.error = error
+
+        def fetch_pages(self):
+            raise self.error
+
+    class Unauthorized(Exception):
+        status_code = 401
+
+    monkeypatch.setattr(ingest.settings, "sync_retry_backoff_s", 600.0)
+    conn = _user(db, "active")
+    db.add(
+        models.Job(
+            user_id=conn.user_id,
+            status="done",
+            job_type="suggest_tasks",
+            created_at=datetime.now(timezone.utc),
+        )
+    )
+    error = rate_limit.RateLimited("github rate limit")
+    monkeypatch.setattr(ingest, "_open_connector", lambda db, user_id, c: Failing(error))
+    ingest.sync_connector(db, conn.user_id, conn)
+    now = datetime.now(timezone.utc)
+    assert conn.status == "connected" and conn.status_message == "github rate limit"
+    assert sync_scheduler.plan(db, now=now) == []
+    assert [
+        j["connector_id"] for j in sync_scheduler.plan(db, now=now + timedelta(seconds=601))
+    ] == [str(conn.id)]
+
+    # a second failure in a row doubles the wait
+    ingest.sync_connector(db, conn.user_id, conn)
+    assert sync_scheduler.plan(db, now=now + timedelta(seconds=601)) == []
+    assert sync_scheduler.plan(db, now=now + timedelta(seconds=1201))
+
+    # a revoked token needs the user, not a retry
+    error = Unauthorized("bad credentials")
+    ingest.sync_connector(db, conn.user_id, conn)
+    assert conn.status == "error"
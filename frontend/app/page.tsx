@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useCallback } from 'react'
 import Image from 'next/image'
-import { getTasks, completeTask as apiCompleteTask, undoTask as apiUndoTask, suggestTasks, getSuggestJobStatus } from '@/lib/api'
+import { getTasks, completeTask as apiCompleteTask, undoTask as apiUndoTask, suggestTasks, getSuggestJobStatus, streamSuggestJob } from '@/lib/api'
 import { Loader } from '@/components/loader'
 import { TaskCard } from '@/components/task-card'
 import { TaskDetail } from '@/components/task-detail'
@@ -90,6 +90,7 @@ export default function FocusPage() {
   const [lastCompletedTask, setLastCompletedTask] = useState<Task | null>(null)
   const [suggestionState, setSuggestionState] = useState<'idle' | 'loading' | 'polling' | 'error'>('idle')
   const [suggestionJobId, setSuggestionJobId] = useState<string | null>(null)
+  const [streamFailed, setStreamFailed] = useState(false)
   const [currentLoadingMessage, setCurrentLoadingMessage] = useState('')
   const [displayedMessage, setDisplayedMessage] = useState('')
   const [isInitialized, setIsInitialized] = useState(false)
@@ -259,9 +260,39 @@ export default function FocusPage() {
     localStorage.setItem('suggestionState', suggestionState)
   }, [suggestionState])
 
-  // Polling for suggestion job
+  // Follow the suggestion job over SSE; fall back to polling if the stream is unavailable
   useEffect(() => {
-    if (suggestionState !== 'polling' || !suggestionJobId) return
+    if (suggestionState !== 'polling' || !suggestionJobId || streamFailed) return
+
+    const finish = (state: 'idle' | 'error') => {
+      setSuggestionState(state)
+      setSuggestionJobId(null)
+      localStorage.removeItem('suggestionJobId')
+      localStorage.removeItem('suggestionState')
+    }
+    const close = streamSuggestJob(
+      suggestionJobId,
+      (event, data) => {
+        if (event === 'items_ingested' && data?.created) {
+          // show the first results while the rest are still being fetched and scored
+          loadTasks()
+        } else if (event === 'done') {
+          finish('idle')
+          loadTasks()
+        } else if (event === 'failed') {
+          console.error('Suggestion job failed:', data)
+          finish('error')
+        }
+      },
+      () => setStreamFailed(true),
+    )
+    if (close === null) setStreamFailed(true)
+    return () => close?.()
+  }, [suggestionState, suggestionJobId, streamFailed, loadTasks])
+
+  // Polling for suggestion job (fallback)
+  useEffect(() => {
+    if (suggestionState !== 'polling' || !suggestionJobId || !streamFailed) return
 
     const interval = setInterval(async () => {
       try {
@@ -294,12 +325,13 @@ export default function FocusPage() {
     }, 2000) // Poll every 2 seconds
 
     return () => clearInterval(interval)
-  }, [suggestionState, suggestionJobId, loadTasks])
+  }, [suggestionState, suggestionJobId, streamFailed, loadTasks])
 
   const handleGenerateSuggestions = async () => {
     setSuggestionState('loading')
     try {
       const { job_id } = await suggestTasks()
+      setStreamFailed(false)
       setSuggestionJobId(job_id)
       setSuggestionState('polling')
     } catch (error) {
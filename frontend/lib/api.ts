@@ -168,6 +168,39 @@ export async function getSuggestJobStatus(jobId: string) {
   }
 }
 
+export type SuggestJobEvent = 'started' | 'connectors_fetched' | 'items_ingested' | 'tasks_scored' | 'done' | 'failed'
+
+// Follow a suggest job's stage events over SSE. Returns a function that closes the stream,
+// or null when streaming is unavailable (mocks, no EventSource) and the caller should poll.
+// onError fires if the connection drops before the job finished.
+export function streamSuggestJob(
+  jobId: string,
+  onEvent: (event: SuggestJobEvent, data: any) => void,
+  onError: () => void,
+): (() => void) | null {
+  if (isUsingMocks() || typeof EventSource === 'undefined') return null
+  const source = new EventSource(`${API_BASE_URL}/api/tasks/suggest/${jobId}/events`)
+  let finished = false
+  const events: SuggestJobEvent[] = ['started', 'connectors_fetched', 'items_ingested', 'tasks_scored', 'done', 'failed']
+  for (const name of events) {
+    source.addEventListener(name, e => {
+      if (name === 'done' || name === 'failed') {
+        finished = true
+        source.close()
+      }
+      onEvent(name, safeParseJSON((e as MessageEvent).data))
+    })
+  }
+  source.onerror = () => {
+    source.close()
+    if (!finished) onError()
+  }
+  return () => {
+    finished = true
+    source.close()
+  }
+}
+
 // ---------------- Graph ----------------
 export interface GraphResponse { nodes: Task[]; edges: [TaskId, TaskId][] }
 export async function getGraph(window?: string) {